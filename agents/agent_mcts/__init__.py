@@ -1 +1,2 @@
 from .mcts import generate_move_mcts as generate_move
+from .batch import generate_moves_mcts as generate_moves
@@ -0,0 +1,145 @@
+from agents.common import PlayerAction, BoardPiece, SavedState, NO_PLAYER, BOARD_COLUMNS
+from agents.common import find_opponent, possible_moves
+from agents.agent_mcts.tree import MCTSTree
+from agents.agent_mcts.playouts import random_playouts, bitboards_heights
+from agents.agent_mcts.mcts import MCTSSavedState, do_selection, do_expansion, back_propagate_statistics, best_child
+from agents.agent_mcts.mcts import reuse_tree
+from agents.agent_solver.solver import generate_move_solver, SOLVER_EMPTY_CELLS
+from agents.opening_book import OpeningBook, DEFAULT_BOOK, book_move
+
+import time
+from typing import Optional, Sequence, Tuple, List, Union
+import numpy as np
+
+PLAYOUT_BATCH = 64  # the least number of simulations played at once by batch_mcts_algorithm
+
+
+def add_wins(mcts_tree: MCTSTree, node: int, gain_wins_player: BoardPiece, n_wins: int):
+    """
+    The wins half of back_propagate_statistics, for simulations whose plays were counted in advance.
+    :param mcts_tree: the MC tree
+    :param node: the node the simulations started from
+    :param gain_wins_player: the player that will have the wins statistics increased
+    :param n_wins: the number of simulations with this result
+    """
+    wins, player, parent = mcts_tree.wins, mcts_tree.player, mcts_tree.parent
+    node = int(node)
+    while node >= 0:
+        if player[node] == gain_wins_player:
+            wins[node] += n_wins
+        node = int(parent[node])
+
+
+def batch_mcts_algorithm(mcts_trees: Sequence[MCTSTree], root_players: Sequence[BoardPiece],
+                         trials: Optional[int] = 100, time_budget: Optional[float] = None,
+                         simulations_per_leaf: int = 1) -> int:
+    """
+    Runs the MCTS searches of many trees in lockstep: every round selects and expands leaves in every tree, then
+    plays the simulations of all the leaves at once with the vectorized playouts, and back-propagates the results
+    in every tree. The playouts, the expensive part of a search, are shared by all the trees.
+    The vectorized playouts only pay off for many games, so with few trees several leaves are selected in every tree
+    per round, at least PLAYOUT_BATCH simulations in all. The plays of a selected leaf are counted right away,
+    without wins (a virtual loss), so that the next selection in the same tree tends to choose another leaf;
+    the wins are added once the simulations are over.
+    :param mcts_trees: the trees, whose roots have the boards of the searches
+    :param root_players: the player that should do the next action on the root of every tree
+    :param trials: the number of simulations of every tree, None for no limit
+    :param time_budget: the time in seconds the searches may take, None for no time limit
+    :param simulations_per_leaf: the number of simulations run from every expanded node; more of them spread the
+    cost of the selection, expansion and back propagation, done tree by tree, over more simulations
+    :return: the number of simulations performed in every tree
+    """
+    if trials is None and time_budget is None:
+        raise ValueError('batch_mcts_algorithm needs a number of trials, a time budget or both')
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    opponents = [find_opponent(root_player) for root_player in root_players]
+    leaves_per_tree = max(1, -(-PLAYOUT_BATCH // (len(mcts_trees) * simulations_per_leaf)))
+
+    simulations = 0
+    while (trials is None or simulations < trials) and (deadline is None or time.monotonic() < deadline):
+        n_leaves = leaves_per_tree
+        if trials is not None:
+            n_leaves = min(n_leaves, -(-(trials - simulations) // simulations_per_leaf))
+        leaves = []
+        for mcts_tree in mcts_trees:
+            for _ in range(n_leaves):
+                leaf = do_expansion(mcts_tree, do_selection(mcts_tree))
+                back_propagate_statistics(mcts_tree, leaf, NO_PLAYER, simulations_per_leaf)
+                leaves.append(leaf)
+        trees = [mcts_tree for mcts_tree in mcts_trees for _ in range(n_leaves)]
+        player1_pieces = np.array([mcts_tree.player1_pieces[leaf] for mcts_tree, leaf in zip(trees, leaves)],
+                                  np.uint64)
+        player2_pieces = np.array([mcts_tree.player2_pieces[leaf] for mcts_tree, leaf in zip(trees, leaves)],
+                                  np.uint64)
+        players = np.array([mcts_tree.player[leaf] for mcts_tree, leaf in zip(trees, leaves)])
+        if simulations_per_leaf > 1:
+            player1_pieces = np.repeat(player1_pieces, simulations_per_leaf)
+            player2_pieces = np.repeat(player2_pieces, simulations_per_leaf)
+            players = np.repeat(players, simulations_per_leaf)
+        winners = random_playouts(player1_pieces, player2_pieces, bitboards_heights(player1_pieces | player2_pieces),
+                                  players).reshape(len(mcts_trees), n_leaves, simulations_per_leaf)
+
+        # as in mcts_algorithm: the root player gains the wins of the games it lost
+        lost = np.count_nonzero(winners == np.array(opponents)[:, None, None], axis=2).ravel().tolist()
+        for mcts_tree, leaf, root_player, opponent, n_lost in zip(
+                trees, leaves, np.repeat(root_players, n_leaves).tolist(), np.repeat(opponents, n_leaves).tolist(),
+                lost):
+            if n_lost > 0:
+                add_wins(mcts_tree, leaf, root_player, n_lost)
+            if n_lost < simulations_per_leaf:
+                add_wins(mcts_tree, leaf, opponent, simulations_per_leaf - n_lost)
+        simulations += n_leaves * simulations_per_leaf
+    return simulations
+
+
+def generate_moves_mcts(boards: np.ndarray, players: Union[BoardPiece, np.ndarray],
+                        saved_states: Optional[Sequence[Optional[SavedState]]] = None, trials: Optional[int] = 1000,
+                        time_budget: Optional[float] = None,
+                        opening_book: Union[OpeningBook, str, None] = DEFAULT_BOOK,
+                        solver_empty_cells: int = SOLVER_EMPTY_CELLS, simulations_per_leaf: int = 1
+                        ) -> Tuple[np.ndarray, List[Optional[SavedState]]]:
+    """
+    Generate the next move of many games at once for the MCTS agent (see common.GenMoves).
+    The boards found in the opening book or close enough to the end for the solver are answered one by one, as in
+    generate_move_mcts; the others are searched together by batch_mcts_algorithm. As in generate_move_mcts, a game
+    keeps its tree in its saved state, and the next search continues it.
+    :param boards: the current board states, shape (N, 6, 7)
+    :param players: the player who should make the next move on every board, shape (N,) or a single player
+    :param saved_states: the last saved state of every game, None for none of them
+    :param trials: the maximal number of simulations of every game, None for searching until the time budget runs out
+    :param time_budget: the time in seconds all the moves may take, None for running all the trials
+    :param opening_book: the book answering the first moves of the game, or the path of its file; None for no book.
+    A book move keeps the saved state unchanged.
+    :param solver_empty_cells: the perfect play solver is used instead when at most this many cells are empty
+    :param simulations_per_leaf: the number of simulations run from every expanded node (see batch_mcts_algorithm)
+    :return: the next action of every game, shape (N,), the new saved states
+    """
+    boards = np.asarray(boards)
+    players = np.broadcast_to(np.asarray(players, BoardPiece), (len(boards),))
+    saved_states = [None] * len(boards) if saved_states is None else list(saved_states)
+    actions = np.zeros(len(boards), PlayerAction)
+
+    searched, mcts_trees, mirrored = [], [], []
+    for i, (board, player) in enumerate(zip(boards, players)):
+        next_move = book_move(board, opening_book)
+        if next_move is not None:
+            actions[i] = next_move
+        elif np.count_nonzero(board == NO_PLAYER) <= solver_empty_cells:
+            actions[i], saved_states[i] = generate_move_solver(board, player, saved_states[i])
+        else:
+            mcts_tree, tree_mirrored = reuse_tree(board, player, saved_states[i])
+            searched.append(i)
+            mcts_trees.append(MCTSTree.from_array(board, player) if mcts_tree is None else mcts_tree)
+            mirrored.append(tree_mirrored)
+
+    if searched:
+        batch_mcts_algorithm(mcts_trees, players[searched].tolist(), trials, time_budget, simulations_per_leaf)
+    for i, mcts_tree, tree_mirrored in zip(searched, mcts_trees, mirrored):
+        if mcts_tree.n_children[0] == 0:  # the time budget ran out before the first simulation
+            actions[i], saved_states[i] = possible_moves(boards[i])[0], MCTSSavedState()
+            continue
+        selected_child = best_child(mcts_tree, 0)
+        next_move = mcts_tree.move[selected_child]
+        actions[i] = BOARD_COLUMNS - 1 - next_move if tree_mirrored else next_move
+        saved_states[i] = MCTSSavedState(mcts_tree, selected_child, tree_mirrored)
+    return actions, saved_states
@@ -1,27 +1,59 @@
 from agents.common import PlayerAction, BoardPiece, SavedState, GenMove, PLAYER1, PLAYER2, NO_PLAYER, GameState
 from agents.common import connected_four, apply_player_action, check_end_state, initialize_game_state
-from agents.common import pretty_print_board, find_opponent, possible_moves
+from agents.common import pretty_print_board, find_opponent, possible_moves, BOARD_COLUMNS
+from agents.bitboard import BitBoard
+from agents.agent_mcts.tree import MCTSTree
+from agents.agent_mcts.playouts import random_playouts
+from agents.agent_mcts.profiling import MCTSStats, ProfilingSink, print_stats
+from agents.agent_solver.solver import generate_move_solver, SOLVER_EMPTY_CELLS
+from agents.opening_book import OpeningBook, DEFAULT_BOOK, book_move
+from agents.position_cache import PositionCache
 
 import time
-from typing import Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional, Tuple, Union
 import math
 import numpy as np
 
 C = math.sqrt(2)  # global exploration parameter
+WARM_START_PLAYS = 10  # plays given to a move found in the position cache, per depth of the search that found it
+NEGATIVE_INF = -math.inf
 
 
-class MCTSNode(object):
-    def __init__(self, board, player, parent=None):
-        self.board = board
-        self.player = player
-        self.parent = parent  # is a MCTSNode
-        self.children = []  # is a list of MCTSNode
-        self.plays = 1
-        self.wins = 0
-        self.children_index = possible_moves(board)
+class MCTSSavedState(SavedState):
+    """
+    The MCTS agent keeps the tree of its last search and the node of the move it played, so the next search
+    can start from the statistics that are still valid after the opponent's reply.
+    The tree may have been built for the mirror image of the boards of the game (see generate_move_mcts).
+    """
+
+    def __init__(self, mcts_tree: Optional[MCTSTree] = None, node: int = 0, mirrored: bool = False):
+        self.mcts_tree = mcts_tree
+        self.node = node
+        self.mirrored = mirrored
+
 
-    def compute_ucb1(self):
-        return self.wins / self.plays + C * np.sqrt(np.log(self.parent.plays) / self.plays)
+def find_subtree(mcts_tree: MCTSTree, node: int, board: np.ndarray, player: BoardPiece, max_depth: int = 2
+                 ) -> Optional[MCTSTree]:
+    """
+    Searches the tree below `node` for the node of the given board, and copies its subtree into a new tree,
+    so that it can be the root of a new search.
+    :param mcts_tree: the tree that is searched
+    :param node: the node below which the board is searched
+    :param board: the board of the searched node
+    :param player: the player who makes the next move on the board
+    :param max_depth: the number of moves the searched node may be below `node`
+    :return: the subtree of the board's node, None if the tree doesn't contain it
+    """
+    bitboard = BitBoard.from_array(board)
+    nodes = [node]
+    for _ in range(max_depth + 1):
+        for n in nodes:
+            if (mcts_tree.player[n] == player and int(mcts_tree.player1_pieces[n]) == bitboard.player1_pieces
+                    and int(mcts_tree.player2_pieces[n]) == bitboard.player2_pieces):
+                return mcts_tree.subtree(n)
+        nodes = [c for n in nodes for c in mcts_tree.children(n)]
+    return None
 
 
 def upper_confidence_bound_1(wins, plays, parent_plays) -> float:
@@ -36,213 +68,371 @@ def upper_confidence_bound_1(wins, plays, parent_plays) -> float:
     return wins / plays + C * np.sqrt(np.log(parent_plays) / plays)
 
 
-def do_selection(root_node: MCTSNode):
+def best_child(mcts_tree: MCTSTree, node: int) -> int:
+    """
+    Returns the child of the node with the highest UCB1 score. The children's statistics are contiguous
+    in the tree, so all the scores are computed at once, with the cached log of the node's plays.
+    :param mcts_tree: the MC tree
+    :param node: a node with at least one expanded child
+    :return: the selected child
+    """
+    first_child = mcts_tree.first_child[node]
+    last_child = first_child + mcts_tree.n_children[node]
+    plays = mcts_tree.plays[first_child:last_child]
+    ucb_scores = mcts_tree.wins[first_child:last_child] / plays + C * np.sqrt(mcts_tree.log_plays[node] / plays)
+    return int(first_child + np.argmax(ucb_scores))
+
+
+def do_selection(mcts_tree: MCTSTree, node: int = 0) -> int:
     """
     The 1st part of the algorithm: starting from the root, a leaf is found. If the current node has all children
     already expanded, the algorithm selects between these children the one with highest UCB1 score and the search for
     a leaf continues.
-    :param root_node: the first node of the MCTS tree
+    :param mcts_tree: the MC tree
+    :param node: the node where the search starts, the root by default
     :return: the leaf from which a new node will be created in the current simulation
     """
-    current_node = root_node
-    while len(current_node.children) == len(current_node.children_index):
-        ucb_scores = np.array(
-            [upper_confidence_bound_1(c.wins, c.plays, c.parent.plays) for c in current_node.children])
-        # ucb_scores = np.array([c.compute_ucb1() for c in current_node.children])
-        selected_node_index = np.argmax(ucb_scores)
-        current_node = current_node.children[selected_node_index]  # we go to the next node
-    return current_node
+    while mcts_tree.untried[node] == 0 and mcts_tree.n_children[node] > 0:
+        node = best_child(mcts_tree, node)  # we go to the next node
+    return node
 
 
-def do_expansion(current_node: MCTSNode):
+def do_expansion(mcts_tree: MCTSTree, node: int) -> int:
     """
     The 2nd part of the algorithm: once a leaf was found, a new node is created (expanded).
-    :param current_node: the found leaf node.
+    The columns of a node are expanded from left to right. If the game is over on the leaf's board, or if the
+    memory budget of the tree is used up, no node is created and the simulation starts from the leaf itself.
+    :param mcts_tree: the MC tree
+    :param node: the found leaf node.
     :return: a newly created node, added to the MCTS tree. From this node the simulation will start.
     """
-    next_child_index = current_node.children_index[len(current_node.children)]
-    expanded_board = apply_player_action(current_node.board, next_child_index, current_node.player, copy=True)
-
-    expanded_node = MCTSNode(expanded_board, find_opponent(current_node.player), current_node)
-    current_node.children.append(expanded_node)
+    untried = int(mcts_tree.untried[node])
+    if untried == 0:
+        return node
+    move = (untried & -untried).bit_length() - 1
+    player = mcts_tree.player[node]
+    bitboard = mcts_tree.bitboard(node)
+    bitboard.apply_action(move, player)
+    expanded_node = mcts_tree.add_node(node, move, find_opponent(player), bitboard)
+    if expanded_node < 0:
+        return node
+    mcts_tree.untried[node] = untried & ~(1 << move)
     return expanded_node
 
 
-def run_simulation(start_node: MCTSNode, root_player: BoardPiece, print_final=False) -> (np.ndarray, GameState):
+def run_simulation(mcts_tree: MCTSTree, start_node: int, root_player: BoardPiece, print_final=False
+                   ) -> (BitBoard, GameState):
     """
     The 3rd part of the algorithm.
     This function runs a complete game with random moves from the start node board until one player wins.
     This is one simulation in the MCTS algorithm.
+    :param mcts_tree: the MC tree
     :param start_node: the expended node from which we start the simulation
-    :param root_player:
+    :param root_player: the player for whom the game result is returned
     :param print_final: flag variable for printing the final board of the game
-    :return: the final board state (np.narray), the game end state (GameState)
-    """
-    current_board = start_node.board.copy()
-    current_player = start_node.player
-    while check_end_state(current_board, current_player) == GameState.STILL_PLAYING:
-        # action = np.random.randint(0, 7)
-        possible_actions = possible_moves(current_board)
-        action = possible_actions[np.random.randint(len(possible_actions))]
-        current_board = apply_player_action(current_board, np.int8(action), current_player)
+    :return: the final board state (BitBoard), the game end state (GameState) for the root player
+    """
+    bitboard = mcts_tree.bitboard(start_node)
+    current_player = mcts_tree.player[start_node]
+    winner = None
+    if bitboard.connected_four(find_opponent(current_player)):
+        winner = find_opponent(current_player)
+    while winner is None:
+        possible_actions = bitboard.possible_moves()
+        if not possible_actions:
+            break
+        bitboard.apply_action(possible_actions[np.random.randint(len(possible_actions))], current_player)
+        if bitboard.connected_four(current_player):
+            winner = current_player
         current_player = find_opponent(current_player)
 
-    game_result = check_end_state(current_board, root_player)
+    if winner is None:
+        game_result = GameState.IS_DRAW
+    elif winner == root_player:
+        game_result = GameState.IS_WIN
+    else:
+        game_result = GameState.IS_LOST
     if print_final:
-        print(pretty_print_board(current_board))
-    return current_board, game_result
+        print(pretty_print_board(bitboard.to_array()))
+    return bitboard, game_result
 
 
-def back_propagate_statistics(expanded_node: MCTSNode, gain_wins_player: BoardPiece):
+def run_simulations(mcts_tree: MCTSTree, start_node: int, root_player: BoardPiece, n_simulations: int
+                    ) -> Tuple[int, int]:
+    """
+    The 3rd part of the algorithm, for several simulations from the same node: all the random games are
+    played at once by the vectorized playouts.
+    :param mcts_tree: the MC tree
+    :param start_node: the expended node from which we start the simulations
+    :param root_player: the player for whom the game results are counted
+    :param n_simulations: the number of simulations
+    :return: the number of games lost by the root player, the number of the other games (won or drawn)
+    """
+    bitboard = mcts_tree.bitboard(start_node)
+    winners = random_playouts(
+        np.full(n_simulations, bitboard.player1_pieces, np.uint64),
+        np.full(n_simulations, bitboard.player2_pieces, np.uint64),
+        np.tile(bitboard.heights, (n_simulations, 1)),
+        np.full(n_simulations, mcts_tree.player[start_node]),
+    )
+    lost = int(np.count_nonzero(winners == find_opponent(root_player)))
+    return lost, n_simulations - lost
+
+
+def back_propagate_statistics(mcts_tree: MCTSTree, expanded_node: int, gain_wins_player: BoardPiece,
+                              n_simulations: int = 1):
     """
     The 4th part of the algorithm: the node statistics wins and plays are updated for the current path.
     The current path contains all the nodes from the expanded and simulated node, back to the root.
+    :param mcts_tree: the MC tree
     :param expanded_node: the node that was expanded for the current trial & starting node for the simulation
     :param gain_wins_player: the player that will have the wins statistics increased
+    :param n_simulations: the number of simulations with this result
     :return: nothing; the MCTS tree itself is updated
     """
-    n = expanded_node
-    while n.parent is not None:  # this happens to be true only for the root node
-        n.plays += 1
+    plays, log_plays, wins, player, parent = (mcts_tree.plays, mcts_tree.log_plays, mcts_tree.wins,
+                                              mcts_tree.player, mcts_tree.parent)
+    n = int(expanded_node)
+    while n >= 0:  # the parent of the root is -1
+        n_plays = int(plays[n]) + n_simulations
+        plays[n] = n_plays
+        log_plays[n] = math.log(n_plays)
         # update the wins for the losing nodes
         # because they are actually useful for their children - that have the opponent player of the loser
-        if n.player == gain_wins_player:
-            n.wins += 1
-        n = n.parent
-    # update for the root node
-    n.plays += 1
-    if n.player == gain_wins_player:
-        n.wins += 1
+        if player[n] == gain_wins_player:
+            wins[n] += n_simulations
+        n = int(parent[n])
 
 
-def mcts_algorithm(board: np.ndarray, root_player: BoardPiece, trials=100, profiling=False) -> list:
+def warm_start(mcts_tree: MCTSTree, move: PlayerAction, n_plays: int):
+    """
+    Biases the search towards a move known to be good from an earlier search: the child of the root for the move
+    is expanded if needed, and gets n_plays plays that all count as wins for the root player.
+    :param mcts_tree: the MC tree
+    :param move: the good move of the root board
+    :param n_plays: the number of plays
+    :return: nothing; the MCTS tree itself is updated
+    """
+    node = mcts_tree.child(0, move)
+    while node < 0 and mcts_tree.untried[0] & (1 << move):
+        expanded_node = do_expansion(mcts_tree, 0)
+        if expanded_node == 0:  # the memory budget is used up
+            return
+        if mcts_tree.move[expanded_node] == move:
+            node = expanded_node
+    if node >= 0:
+        back_propagate_statistics(mcts_tree, node, mcts_tree.player[node], n_plays)
+
+
+def mcts_algorithm(board: np.ndarray, root_player: BoardPiece, trials: Optional[int] = 100,
+                   profiling: Union[bool, ProfilingSink, None] = False, time_budget: Optional[float] = None,
+                   mcts_tree: Optional[MCTSTree] = None, memory_bytes: int = 2 ** 28, simulations_per_leaf: int = 1
+                   ) -> Tuple[MCTSTree, int]:
     """
         The Monte Carlo Tree Search algorithm.
         Starting from a given board, when the root_player has to do a move, it runs "trials" simulations in order to find
-        which next move is the best. While doing so, it constructs a tree (data structure composed by MCTSNode objects,
-        connected by .parent and .children references).
+        which next move is the best. While doing so, it constructs a tree (MCTSTree, whose node 0 is the root).
         MCTS has 4 phases: selection, expansion, simulation and back propagation.
+        The search stops after "trials" simulations or when the time budget runs out, whichever comes first.
+        The search can continue a tree built earlier for the same board.
+        With more than one simulation per leaf, the simulations of a leaf are run at once by the vectorized playouts.
 
         :param board: the game state for which the next action has to be decided
         :param root_player: the player that should do the next action
-        :param trials: number of simulations the algorithm performs for constructing the MC tree before selecting a move
-        :return: the MC tree as a list
+        :param trials: number of simulations the algorithm performs for constructing the MC tree before selecting a move,
+        None for no limit on the number of simulations
+        :param profiling: a function receiving the profiling.MCTSStats of the search when it is over, True for
+        printing them, False or None for no profiling (which then costs nothing)
+        :param time_budget: the time in seconds the search may take, None for no time limit
+        :param mcts_tree: an earlier tree whose root has the board, None for starting a new tree
+        :param memory_bytes: the memory budget of a new tree
+        :param simulations_per_leaf: the number of simulations run from every expanded node. The vectorized playouts
+        only pay off from about 16 of them: with 8, the search runs fewer simulations per second than with 1, with 32
+        about twice as many, with 256 about ten times as many; but the tree grows by one node per leaf only.
+        :return: the MC tree, the number of simulations performed
     """
-    root_node = MCTSNode(board, root_player)
-    mcts_tree = [root_node]
+    if trials is None and time_budget is None:
+        raise ValueError('mcts_algorithm needs a number of trials, a time budget or both')
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    sink = print_stats if profiling is True else profiling or None
+    stats = None if sink is None else MCTSStats()
+    clock = time.perf_counter
+    start = clock() if stats is not None else 0.
+
+    if mcts_tree is None:
+        mcts_tree = MCTSTree.from_array(board, root_player, memory_bytes)
+
+    simulations = 0
+    while (trials is None or simulations < trials) and (deadline is None or time.monotonic() < deadline):
+        t0 = clock() if stats is not None else 0.
+        selected_node = do_selection(mcts_tree)
+        t1 = clock() if stats is not None else 0.
+
+        expanded_node = do_expansion(mcts_tree, selected_node)
+        t2 = clock() if stats is not None else 0.
+
+        if simulations_per_leaf == 1:
+            final_board, simulation_result = run_simulation(mcts_tree, expanded_node, root_player, print_final=False)
+            t3 = clock() if stats is not None else 0.
+
+            if simulation_result == GameState.IS_LOST:
+                gain_wins_player = root_player
+            else:
+                gain_wins_player = find_opponent(root_player)
+            back_propagate_statistics(mcts_tree, expanded_node, gain_wins_player)
+        else:
+            final_board = None
+            lost, not_lost = run_simulations(mcts_tree, expanded_node, root_player, simulations_per_leaf)
+            t3 = clock() if stats is not None else 0.
 
-    t = np.zeros((5, trials))
-    for i in range(trials):
-        t[0, i] = time.time()
-        selected_node = do_selection(root_node)
-        t[1, i] = time.time()
+            back_propagate_statistics(mcts_tree, expanded_node, root_player, lost)
+            back_propagate_statistics(mcts_tree, expanded_node, find_opponent(root_player), not_lost)
+        if stats is not None:
+            stats.add_iteration(mcts_tree, selected_node, expanded_node, final_board, t0, t1, t2, t3, clock())
+        simulations += simulations_per_leaf
 
-        expanded_node = do_expansion(selected_node)
-        mcts_tree.append(expanded_node)
-        t[2, i] = time.time()
+    if stats is not None:
+        stats.elapsed = clock() - start
+        stats.simulations = simulations
+        stats.tree_size = mcts_tree.size
+        sink(stats)
 
-        final_board, simulation_result = run_simulation(expanded_node, root_player, print_final=False)
-        t[3, i] = time.time()
+    return mcts_tree, simulations
 
-        if simulation_result == GameState.IS_LOST:
-            gain_wins_player = root_player
-        else:
-            gain_wins_player = find_opponent(root_player)
-        back_propagate_statistics(expanded_node, gain_wins_player)
-        t[4, i] = time.time()
-
-    if profiling:
-        print("Selection: %.3f" % (t[1, :] - t[0, :]).sum())
-        print("Expansion: %.3f" % (t[2, :] - t[1, :]).sum())
-        print("Simulation: %.3f" % (t[3, :] - t[2, :]).sum())
-        print("Back propagation: %.3f" % (t[4, :] - t[3, :]).sum())
-
-    return mcts_tree
-
-
-# first version of the algorithm
-def not_used_mcts_algorithm(board: np.ndarray, root_player: BoardPiece, trials=20) -> list:
-    root_node = MCTSNode(board, root_player)
-    mcts_tree = [root_node]
-
-    for i in range(trials):
-        current_node = root_node
-        current_player = root_player
-
-        # selection and expansion
-        extended = False
-        while not extended:
-            if len(current_node.children) != 7:  # this corresponds to expansion
-                new_child_found = False
-                child_board = None
-                while not new_child_found:
-                    action_made = False
-                    while not action_made:
-                        action = np.random.randint(0, 7)
-                        child_board = apply_player_action(current_node.board, np.int8(action), current_player,
-                                                          copy=True)
-                        if not np.all(child_board == current_node):
-                            action_made = True
-
-                    if not current_node.children:  # we cannot iterate over an empty list; this is the true leaf case
-                        new_child_found = True
-                    else:
-                        repeated_child = False
-                        for c in current_node.children:
-                            if np.all(c.board == child_board):
-                                repeated_child = True
-                        if not repeated_child:
-                            new_child_found = True
-
-                child_node = MCTSNode(child_board, find_opponent(current_player))
-                child_node.parent = current_node
-                current_node.children.append(child_node)
-                mcts_tree.append(child_node)
-                extended = True
-
-            else:  # UCB1 # this corresponds to selection
-                ucb_scores = np.array(
-                    [upper_confidence_bound_1(c.wins, c.plays, c.parent.plays) for c in current_node.children])
-                selected_node_index = np.argmax(ucb_scores)
-                # mcts_tree.append(selected_node)
-                current_node = current_node.children[selected_node_index]
-                current_player = find_opponent(current_player)
-
-        # simulation
-        # print(i)
-        # print(pretty_print_board(child_node.board))
-        final_board, simulation_result = run_simulation(child_node, print_final=False)
-        # print(simulation_result)
-
-        # back propagation
-        # go upwards from the child node to the root via parent
-        bp_node = child_node
-        while bp_node.parent is not None:
-            # print(pretty_print_board(bp_node.board))
-            bp_node.plays += 1
-            # update the wins for the losing nodes
-            # because they are actually useful for their children - that have the opponent player of the loser
-            if check_end_state(final_board, bp_node.player) == GameState.IS_LOST:
-                bp_node.wins += 1
-            bp_node = bp_node.parent
-
-    return mcts_tree
-
-
-def generate_move_mcts(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState]
+
+def root_statistics(board: np.ndarray, root_player: BoardPiece, trials: Optional[int], time_budget: Optional[float],
+                    seed: int, simulations_per_leaf: int = 1) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Runs one independent MCTS search, with its own random seed, and returns the statistics of the root's children.
+    This is the work done by every process of the root-parallel search.
+    :param board: the game state for which the next action has to be decided
+    :param root_player: the player that should do the next action
+    :param trials: the maximal number of simulations, None for no limit
+    :param time_budget: the time in seconds the search may take, None for no time limit
+    :param seed: the seed of the random playouts
+    :param simulations_per_leaf: the number of simulations run from every expanded node (see mcts_algorithm)
+    :return: the plays and the wins of the children of every column (0 if not expanded), the number of simulations
+    """
+    np.random.seed(seed)
+    mcts_tree, simulations = mcts_algorithm(board, root_player, trials, False, time_budget,
+                                            simulations_per_leaf=simulations_per_leaf)
+    children = mcts_tree.children(0)
+    plays = np.zeros(7, np.int64)
+    wins = np.zeros(7, np.int64)
+    plays[mcts_tree.move[children]] = mcts_tree.plays[children]
+    wins[mcts_tree.move[children]] = mcts_tree.wins[children]
+    return plays, wins, simulations
+
+
+def parallel_mcts_algorithm(board: np.ndarray, root_player: BoardPiece, trials: Optional[int] = 100,
+                            time_budget: Optional[float] = None, workers: int = 2, seed: Optional[int] = None,
+                            executor: Optional[Executor] = None, simulations_per_leaf: int = 1
+                            ) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Root-parallel MCTS: every worker process builds its own tree from the same board, with the same budget and
+    its own random seed, and the statistics of the root's children are summed over all the trees.
+    :param board: the game state for which the next action has to be decided
+    :param root_player: the player that should do the next action
+    :param trials: the maximal number of simulations of every worker, None for no limit
+    :param time_budget: the time in seconds the search may take, None for no time limit
+    :param workers: the number of independent searches
+    :param seed: the seed from which the seeds of the workers are derived, None for a random one
+    :param executor: the pool running the searches; a process pool of `workers` processes is started if None
+    :param simulations_per_leaf: the number of simulations run from every expanded node (see mcts_algorithm)
+    :return: the merged plays and wins of the children of every column, the total number of simulations
+    """
+    seeds = np.random.SeedSequence(seed).generate_state(workers)
+    args = [(board, root_player, trials, time_budget, int(worker_seed), simulations_per_leaf) for worker_seed in seeds]
+    if executor is None:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(root_statistics, *zip(*args)))
+    else:
+        results = list(executor.map(root_statistics, *zip(*args)))
+
+    plays = sum(result[0] for result in results)
+    wins = sum(result[1] for result in results)
+    simulations = sum(result[2] for result in results)
+    return plays, wins, simulations
+
+
+def reuse_tree(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState]
+               ) -> Tuple[Optional[MCTSTree], bool]:
+    """
+    Finds the subtree of the current board in the tree of the saved state, if the board is the opponent's reply to
+    the move played from that tree.
+    :param board: the current board state
+    :param player: the current player who should make the next move
+    :param saved_state: the last saved state
+    :return: the subtree (None if the tree doesn't contain the board), and whether it was built for the mirror
+    image of the board
+    """
+    if isinstance(saved_state, MCTSSavedState) and saved_state.mcts_tree is not None:
+        # on a symmetric board only the left half of the moves is expanded, so the opponent's reply
+        # may be in the tree as its mirror image
+        for mirrored in (saved_state.mirrored, not saved_state.mirrored):
+            mcts_tree = find_subtree(saved_state.mcts_tree, saved_state.node, board[:, ::-1] if mirrored else board,
+                                     player, 1)
+            if mcts_tree is not None:
+                return mcts_tree, mirrored
+    return None, False
+
+
+def generate_move_mcts(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState],
+                       trials: Optional[int] = 1000, time_budget: Optional[float] = None, workers: int = 1,
+                       executor: Optional[Executor] = None,
+                       opening_book: Union[OpeningBook, str, None] = DEFAULT_BOOK,
+                       solver_empty_cells: int = SOLVER_EMPTY_CELLS, position_cache: Optional[PositionCache] = None,
+                       profiling: Union[bool, ProfilingSink, None] = False, simulations_per_leaf: int = 1
                        ) -> Tuple[PlayerAction, Optional[SavedState]]:
     """
     Generate the next move for the MCTS agent.
+    The tree is kept in the saved state. If the current board is below the node of the played move (i.e. it
+    is the opponent's reply to that move), the search continues from its statistics.
+    With more than one worker, the root-parallel search is used instead, and no tree is kept.
     :param board: the current board state
     :param player: the current player who should make the next move
     :param saved_state: the last saved state
+    :param trials: the maximal number of simulations, None for searching until the time budget runs out
+    :param time_budget: the time in seconds the move may take, None for running all the trials
+    :param workers: the number of processes searching in parallel
+    :param executor: the process pool used by the parallel search, a new one is started for the move if None
+    :param opening_book: the book answering the first moves of the game, or the path of its file; None for no book.
+    A book move keeps the saved state unchanged.
+    :param solver_empty_cells: the perfect play solver is used instead when at most this many cells are empty
+    :param position_cache: the cache shared with other processes, None for not using one. A new tree is
+    warm-started with the cached move of the board (see warm_start); not used by the parallel search.
+    :param profiling: the profiling sink of the search (see mcts_algorithm); not used by the parallel search
+    :param simulations_per_leaf: the number of simulations run from every expanded node. Batches of 32 or more
+    run several times as many simulations per second, smaller ones are slower than the default 1 (see mcts_algorithm)
     :return: the next action, the new saved state
     """
-    profiling = False
-    mcts_tree = mcts_algorithm(board, player, 1000, profiling)
-    root_node = mcts_tree[0]
-    ucb_scores = np.array(
-        [upper_confidence_bound_1(c.wins, c.plays, c.parent.plays) for c in root_node.children])
-    next_move = np.argmax(ucb_scores)
-
-    return np.int8(next_move), saved_state
+    next_move = book_move(board, opening_book)
+    if next_move is not None:
+        return next_move, saved_state
+    if np.count_nonzero(board == NO_PLAYER) <= solver_empty_cells:
+        return generate_move_solver(board, player, saved_state)
+    if workers > 1:
+        plays, wins, simulations = parallel_mcts_algorithm(board, player, trials, time_budget, workers,
+                                                           executor=executor, simulations_per_leaf=simulations_per_leaf)
+        expanded = np.flatnonzero(plays)
+        if len(expanded) == 0:
+            return np.int8(possible_moves(board)[0]), MCTSSavedState()
+        ucb_scores = upper_confidence_bound_1(wins[expanded], plays[expanded], simulations + workers)
+        return np.int8(expanded[np.argmax(ucb_scores)]), MCTSSavedState()
+
+    mcts_tree, mirrored = reuse_tree(board, player, saved_state)
+    if mcts_tree is None and position_cache is not None:
+        entry = position_cache.probe(board)
+        if entry is not None and board[-1, entry[1]] == NO_PLAYER:
+            mcts_tree = MCTSTree.from_array(board, player)
+            warm_start(mcts_tree, entry[1], WARM_START_PLAYS * max(entry[2], 1))
+    mcts_tree, simulations = mcts_algorithm(board[:, ::-1] if mirrored else board, player, trials, profiling,
+                                            time_budget, mcts_tree, simulations_per_leaf=simulations_per_leaf)
+    if mcts_tree.n_children[0] == 0:  # the time budget ran out before the first simulation
+        return np.int8(possible_moves(board)[0]), MCTSSavedState()
+    selected_child = best_child(mcts_tree, 0)
+    next_move = mcts_tree.move[selected_child]
+    if mirrored:
+        next_move = BOARD_COLUMNS - 1 - next_move
+
+    return np.int8(next_move), MCTSSavedState(mcts_tree, selected_child, mirrored)
@@ -0,0 +1,75 @@
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2
+from agents.common import BOARD_ROWS, BOARD_COLUMNS, BITBOARD_COLUMN_HEIGHT, BITBOARD_DIRECTIONS
+
+import numpy as np
+
+_SHIFTS = [(np.uint64(shift), np.uint64(2 * shift)) for shift in BITBOARD_DIRECTIONS]
+_COLUMN_SHIFTS = (np.arange(BOARD_COLUMNS) * BITBOARD_COLUMN_HEIGHT).astype(np.uint64)
+_COLUMN_BITS = np.uint64((1 << BITBOARD_COLUMN_HEIGHT) - 1)
+# _COLUMN_POPCOUNT[bits] is the number of set bits of the bits of a column
+_COLUMN_POPCOUNT = np.array([bin(bits).count('1') for bits in range(1 << BITBOARD_COLUMN_HEIGHT)], np.int64)
+
+
+def bitboards_connected_four(pieces: np.ndarray) -> np.ndarray:
+    """
+    Vectorized version of bitboard_connected_four, for a whole array of bitboards.
+    :param pieces: the bitboards of one player's pieces, an array of dtype uint64
+    :return: boolean array that says for every bitboard if there are 4 connected pieces
+    """
+    connected = np.zeros(pieces.shape, bool)
+    for shift, double_shift in _SHIFTS:
+        pairs = pieces & (pieces >> shift)
+        connected |= (pairs & (pairs >> double_shift)) != 0
+    return connected
+
+
+def bitboards_heights(pieces: np.ndarray) -> np.ndarray:
+    """
+    :param pieces: the bitboards of all the pieces of N boards (both players), an array of dtype uint64
+    :return: the number of pieces in every column of every board, shape (N, 7)
+    """
+    return _COLUMN_POPCOUNT[((pieces[:, None] >> _COLUMN_SHIFTS) & _COLUMN_BITS).astype(np.intp)]
+
+
+def random_playouts(player1_pieces: np.ndarray, player2_pieces: np.ndarray, heights: np.ndarray,
+                    players: np.ndarray) -> np.ndarray:
+    """
+    Plays N independent games with random moves until they are over, all at once: every step makes one move
+    in all the games that are still running, with array operations on the bitboards.
+    :param player1_pieces: the bitboards of PLAYER1's pieces, shape (N,) and dtype uint64
+    :param player2_pieces: the bitboards of PLAYER2's pieces, shape (N,) and dtype uint64
+    :param heights: the number of pieces in every column, shape (N, 7)
+    :param players: the player making the next move in every game, shape (N,)
+    :return: the winner of every game (PLAYER1, PLAYER2 or NO_PLAYER for a draw), shape (N,) and dtype BoardPiece
+    """
+    n_games = len(players)
+    pieces = np.stack([np.asarray(player1_pieces, np.uint64), np.asarray(player2_pieces, np.uint64)])
+    heights = np.array(heights, np.int64)
+    mover = (np.asarray(players) == PLAYER2).astype(np.int64)  # the row of the player to move in `pieces`
+
+    winners = np.full(n_games, NO_PLAYER, BoardPiece)
+    winners[bitboards_connected_four(pieces[1])] = PLAYER2
+    winners[bitboards_connected_four(pieces[0])] = PLAYER1
+    running = np.flatnonzero((winners == NO_PLAYER) & (heights.sum(axis=1) < BOARD_ROWS * BOARD_COLUMNS))
+
+    while len(running) > 0:
+        # a random legal column for every game: the free column with the highest random key
+        keys = np.random.random((len(running), BOARD_COLUMNS))
+        running_heights = heights[running]
+        keys[running_heights >= BOARD_ROWS] = -1.
+        cols = np.argmax(keys, axis=1)
+        rows = running_heights[np.arange(len(running)), cols]
+        running_mover = mover[running]
+
+        bits = np.uint64(1) << (cols * BITBOARD_COLUMN_HEIGHT + rows).astype(np.uint64)
+        moved = pieces[running_mover, running] | bits
+        pieces[running_mover, running] = moved
+        heights[running, cols] += 1
+        mover[running] = 1 - running_mover
+
+        won = bitboards_connected_four(moved)
+        winners[running[won]] = np.where(running_mover[won] == 0, PLAYER1, PLAYER2)
+        full = heights[running].sum(axis=1) == BOARD_ROWS * BOARD_COLUMNS
+        running = running[~won & ~full]
+
+    return winners
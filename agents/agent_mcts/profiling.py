@@ -0,0 +1,95 @@
+from agents.agent_mcts.tree import MCTSTree
+from agents.bitboard import BitBoard
+
+from typing import Callable, Optional
+
+PHASES = ('selection', 'expansion', 'simulation', 'back_propagation')
+
+
+class MCTSStats(object):
+    """
+    The counters of one MCTS search, collected when mcts_algorithm is given a profiling sink.
+    The times are measured with time.perf_counter, in seconds:
+    phase_times[phase] is the total time spent in every phase of the algorithm (see PHASES), elapsed the time
+    of the whole search. The selection depth is the depth of the selected leaf below the root, the playout length
+    the number of random moves of a simulation (only counted with one simulation per leaf).
+    """
+
+    def __init__(self):
+        self.phase_times = dict.fromkeys(PHASES, 0.)
+        self.elapsed = 0.
+        self.iterations = 0
+        self.simulations = 0
+        self.expansions = 0
+        self.total_selection_depth = 0
+        self.max_selection_depth = 0
+        self.playouts = 0
+        self.total_playout_length = 0
+        self.tree_size = 0
+
+    def add_iteration(self, mcts_tree: MCTSTree, selected_node: int, expanded_node: int,
+                      final_board: Optional[BitBoard], t0: float, t1: float, t2: float, t3: float, t4: float):
+        """
+        Records one iteration of the search.
+        :param mcts_tree: the MC tree
+        :param selected_node: the leaf found by the selection
+        :param expanded_node: the node created by the expansion, the leaf itself if none was created
+        :param final_board: the final board of the simulation, None if several simulations were run at once
+        :param t0: the time of the start of the selection, followed by the times of the ends of the four phases
+        """
+        self.iterations += 1
+        for phase, start, end in zip(PHASES, (t0, t1, t2, t3), (t1, t2, t3, t4)):
+            self.phase_times[phase] += end - start
+        depth = 0
+        node = selected_node
+        while mcts_tree.parent[node] >= 0:
+            node = mcts_tree.parent[node]
+            depth += 1
+        self.total_selection_depth += depth
+        self.max_selection_depth = max(self.max_selection_depth, depth)
+        if expanded_node != selected_node:
+            self.expansions += 1
+        if final_board is not None:
+            start_board = mcts_tree.bitboard(expanded_node)
+            self.playouts += 1
+            self.total_playout_length += sum(final_board.heights) - sum(start_board.heights)
+
+    @property
+    def playouts_per_second(self) -> float:
+        return self.simulations / self.elapsed if self.elapsed > 0 else 0.
+
+    @property
+    def mean_selection_depth(self) -> float:
+        return self.total_selection_depth / self.iterations if self.iterations else 0.
+
+    @property
+    def mean_playout_length(self) -> float:
+        return self.total_playout_length / self.playouts if self.playouts else 0.
+
+    def as_dict(self) -> dict:
+        """
+        :return: all the counters and the derived rates, e.g. for a JSON log
+        """
+        return {'elapsed': self.elapsed, 'iterations': self.iterations, 'simulations': self.simulations,
+                'expansions': self.expansions, 'tree_size': self.tree_size,
+                'mean_selection_depth': self.mean_selection_depth, 'max_selection_depth': self.max_selection_depth,
+                'mean_playout_length': self.mean_playout_length, 'playouts_per_second': self.playouts_per_second,
+                **{f'{phase}_time': t for phase, t in self.phase_times.items()}}
+
+    def __str__(self):
+        lines = [f'Simulations: {self.simulations} ({self.playouts_per_second:.0f}/s)',
+                 f'Tree size: {self.tree_size} nodes, {self.expansions} expansions',
+                 f'Selection depth: {self.mean_selection_depth:.1f} mean, {self.max_selection_depth} max',
+                 f'Playout length: {self.mean_playout_length:.1f}']
+        lines += [f'{phase.replace("_", " ").capitalize()}: {t:.3f}' for phase, t in self.phase_times.items()]
+        return '\n'.join(lines)
+
+
+def print_stats(stats: MCTSStats):
+    """
+    The sink of `profiling=True`: prints the counters.
+    """
+    print(stats)
+
+
+ProfilingSink = Callable[[MCTSStats], None]
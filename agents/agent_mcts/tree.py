@@ -0,0 +1,184 @@
+from agents.common import BoardPiece, PlayerAction, find_opponent
+from agents.common import BOARD_COLUMNS, BITBOARD_COLUMN_HEIGHT
+from agents.bitboard import BitBoard
+
+from typing import List
+import numpy as np
+
+COLUMN_BITS = (1 << BITBOARD_COLUMN_HEIGHT) - 1
+LEFT_HALF = (1 << ((BOARD_COLUMNS + 1) // 2)) - 1  # the untried bits of the columns 0 to 3
+
+
+class MCTSTree(object):
+    """
+    The MC tree, stored as flat arrays indexed by node number instead of one object per node.
+    Node 0 is the root. When the first child of a node is expanded, a block of contiguous nodes is reserved
+    for all its legal moves, so the statistics of the children are slices of the arrays (first_child to
+    first_child + n_children) and their UCB1 scores are computed in one vectorized operation.
+    The board of every node is kept as the two bitboards of the players.
+    On a symmetric board, the moves of the right half lead to the mirror images of the boards reached by the
+    moves of the left half, which have the same statistics, so only the left half is expanded.
+    The arrays grow by doubling until the memory budget is reached; after that, no node is added.
+    """
+    NODE_BYTES = 4 + 1 + 1 + 4 + 4 + 8 + 4 + 1 + 1 + 8 + 8
+    FIELDS = ('parent', 'move', 'player', 'plays', 'wins', 'log_plays', 'first_child', 'n_children', 'untried',
+              'player1_pieces', 'player2_pieces')
+
+    def __init__(self, bitboard: BitBoard, root_player: BoardPiece, memory_bytes: int = 2 ** 28,
+                 initial_capacity: int = 1024):
+        self.max_nodes = max(1, memory_bytes // self.NODE_BYTES)
+        self.capacity = min(initial_capacity, self.max_nodes)
+        self.parent = np.empty(self.capacity, np.int32)
+        self.move = np.empty(self.capacity, np.int8)  # the column played by the parent to reach the node
+        self.player = np.empty(self.capacity, np.int8)  # the player who makes the next move on the node's board
+        self.plays = np.empty(self.capacity, np.int32)
+        self.wins = np.empty(self.capacity, np.int32)
+        self.log_plays = np.empty(self.capacity, np.float64)  # log(plays), cached for the UCB1 of the children
+        self.first_child = np.empty(self.capacity, np.int32)
+        self.n_children = np.empty(self.capacity, np.int8)
+        self.untried = np.empty(self.capacity, np.uint8)  # bit c is set if column c was not expanded yet
+        self.player1_pieces = np.empty(self.capacity, np.uint64)
+        self.player2_pieces = np.empty(self.capacity, np.uint64)
+        self.size = 0
+        self.add_node(-1, -1, root_player, bitboard)
+
+    @classmethod
+    def from_array(cls, board: np.ndarray, root_player: BoardPiece, memory_bytes: int = 2 ** 28) -> 'MCTSTree':
+        return cls(BitBoard.from_array(board), root_player, memory_bytes)
+
+    def _reserve(self, n_nodes: int) -> int:
+        """
+        Reserves n_nodes contiguous nodes at the end of the arrays, which grow if needed.
+        :param n_nodes: the number of nodes
+        :return: the first reserved node, -1 if the memory budget is used up
+        """
+        if self.size + n_nodes > self.max_nodes:
+            return -1
+        if self.size + n_nodes > self.capacity:
+            self.capacity = min(max(2 * self.capacity, self.size + n_nodes), self.max_nodes)
+            for name in self.FIELDS:
+                old = getattr(self, name)
+                new = np.empty(self.capacity, old.dtype)
+                new[:self.size] = old[:self.size]
+                setattr(self, name, new)
+        first = self.size
+        self.size += n_nodes
+        return first
+
+    def add_node(self, parent: int, move: int, player: BoardPiece, bitboard: BitBoard) -> int:
+        """
+        Adds a node as the next child of `parent`. The children of a node have to be added
+        in the order of their columns.
+        :param parent: the parent node, -1 for the root
+        :param move: the column played by the parent to reach the node's board
+        :param player: the player who makes the next move on the node's board
+        :param bitboard: the board of the node
+        :return: the new node, -1 if the memory budget is used up
+        """
+        if parent < 0:
+            node = self._reserve(1)
+        elif self.n_children[parent] == 0:
+            # the block of the children: one node for every legal move of the parent
+            node = self._reserve(bin(int(self.untried[parent])).count('1'))
+            if node >= 0:
+                self.first_child[parent] = node
+                self.parent[node:self.size] = parent
+                self.first_child[node:self.size] = -1
+                self.n_children[node:self.size] = 0
+        else:
+            node = self.first_child[parent] + self.n_children[parent]
+        if node < 0:
+            return -1
+        if parent >= 0:
+            self.n_children[parent] += 1
+        self.parent[node] = parent
+        self.move[node] = move
+        self.player[node] = player
+        self.plays[node] = 1
+        self.wins[node] = 0
+        self.log_plays[node] = 0.
+        self.first_child[node] = -1
+        self.n_children[node] = 0
+        self.player1_pieces[node] = bitboard.player1_pieces
+        self.player2_pieces[node] = bitboard.player2_pieces
+        # a finished game has nothing to expand
+        if bitboard.connected_four(find_opponent(player)):
+            self.untried[node] = 0
+        else:
+            untried = sum(1 << col for col in bitboard.possible_moves())
+            if bitboard.heights == bitboard.heights[::-1] and bitboard.key() == bitboard.mirror().key():
+                untried &= LEFT_HALF
+            self.untried[node] = untried
+        return int(node)
+
+    def bitboard(self, node: int) -> BitBoard:
+        """
+        :param node: a node of the tree
+        :return: a new BitBoard with the board of the node
+        """
+        player1_pieces = int(self.player1_pieces[node])
+        player2_pieces = int(self.player2_pieces[node])
+        pieces = player1_pieces | player2_pieces
+        heights = [((pieces >> (col * BITBOARD_COLUMN_HEIGHT)) & COLUMN_BITS).bit_length()
+                   for col in range(BOARD_COLUMNS)]
+        return BitBoard(player1_pieces, player2_pieces, heights)
+
+    def board(self, node: int) -> np.ndarray:
+        return self.bitboard(node).to_array()
+
+    def children(self, node: int) -> List[int]:
+        """
+        :param node: a node of the tree
+        :return: the children of the node, in the order they were expanded
+        """
+        first_child = int(self.first_child[node])
+        return list(range(first_child, first_child + self.n_children[node]))
+
+    def child(self, node: int, move: PlayerAction) -> int:
+        """
+        :param node: a node of the tree
+        :param move: a column
+        :return: the child reached by playing the column, -1 if it was not expanded
+        """
+        for child in self.children(node):
+            if self.move[child] == move:
+                return child
+        return -1
+
+    def is_full(self) -> bool:
+        return self.size >= self.max_nodes
+
+    def subtree(self, node: int) -> 'MCTSTree':
+        """
+        Copies the subtree of `node` into a new, compact tree whose root is `node`.
+        Children are always stored after their parent, so the subtree is found by spreading
+        the membership from parents to children, one tree level per step. The reserved nodes of
+        the children blocks have their parent set too, so the blocks stay contiguous in the copy.
+        :param node: the root of the copied subtree
+        :return: the new tree
+        """
+        parents = self.parent[:self.size]
+        has_parent = parents >= 0
+        in_subtree = np.zeros(self.size, bool)
+        in_subtree[node] = True
+        while True:
+            spread = in_subtree.copy()
+            spread[has_parent] |= in_subtree[parents[has_parent]]
+            if np.array_equal(spread, in_subtree):
+                break
+            in_subtree = spread
+        nodes = np.flatnonzero(in_subtree)
+        # the extra last entry maps the -1 of missing links to -1
+        new_index = np.full(self.size + 1, -1, np.int32)
+        new_index[nodes] = np.arange(len(nodes), dtype=np.int32)
+
+        tree = MCTSTree.__new__(MCTSTree)
+        tree.max_nodes = self.max_nodes
+        tree.capacity = len(nodes)
+        tree.size = len(nodes)
+        for name in self.FIELDS:
+            setattr(tree, name, getattr(self, name)[nodes])
+        for name in ('parent', 'first_child'):
+            setattr(tree, name, new_index[getattr(tree, name)])
+        tree.parent[0] = -1
+        return tree
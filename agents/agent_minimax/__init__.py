@@ -1 +1,2 @@
 from .minimax import generate_move_minimax as generate_move
+from .batch import generate_moves_minimax as generate_moves
@@ -0,0 +1,165 @@
+from agents.common import PlayerAction, BoardPiece, SavedState, PLAYER1, PLAYER2, NO_PLAYER
+from agents.common import BOARD_ROWS, BOARD_COLUMNS, CENTER_FIRST
+from agents.agent_minimax.evaluation import WINDOWS, WINDOW_SCORES, CELL_WINDOWS
+from agents.agent_minimax.negamax import INF, WIN_SCORE
+from agents.agent_solver.solver import generate_move_solver, SOLVER_EMPTY_CELLS
+from agents.opening_book import OpeningBook, DEFAULT_BOOK, book_move
+
+from typing import Optional, Sequence, Tuple, List, Union
+import numpy as np
+
+# the most leaves searched at once by generate_moves_minimax: batch_negamax takes about 400 bytes per leaf, and a
+# board searched to depth d has up to 7 ** d leaves, so the boards are searched in chunks of at most 50 MB
+BATCH_LEAVES = 2 ** 17
+
+# The state of a window is encoded as sum(cell * 3 ** k) over its 4 cells, so one byte per window holds the
+# pieces of both players. WINDOW_CODE_SCORES[code] is the score of the window for PLAYER1 (see WINDOW_SCORES).
+WINDOW_POWERS = 3 ** np.arange(4)
+_DIGITS = np.arange(3 ** 4)[:, None] // WINDOW_POWERS % 3
+WINDOW_CODE_SCORES = WINDOW_SCORES[np.count_nonzero(_DIGITS == PLAYER1, axis=1),
+                                   np.count_nonzero(_DIGITS == PLAYER2, axis=1)]
+# the code of a window holding 4 pieces of a player, indexed by the player
+FOUR_CODES = np.array([0, PLAYER1, PLAYER2]) * WINDOW_POWERS.sum()
+
+# CELL_WINDOW_INDICES[row * 7 + col] are the windows containing the cell, CELL_WINDOW_POWERS the power of 3 of the
+# cell in each of them. The rows are padded with a dummy window (the last column of the codes) and a power of 0.
+_MAX_CELL_WINDOWS = max(len(windows) for windows in CELL_WINDOWS)
+CELL_WINDOW_INDICES = np.full((len(CELL_WINDOWS), _MAX_CELL_WINDOWS), len(WINDOWS), np.intp)
+CELL_WINDOW_POWERS = np.zeros((len(CELL_WINDOWS), _MAX_CELL_WINDOWS), np.uint8)
+for _cell, _windows in enumerate(CELL_WINDOWS):
+    CELL_WINDOW_INDICES[_cell, :len(_windows)] = _windows
+    CELL_WINDOW_POWERS[_cell, :len(_windows)] = [WINDOW_POWERS[list(WINDOWS[w]).index(_cell)] for w in _windows]
+
+
+def window_codes(boards: np.ndarray) -> np.ndarray:
+    """
+    :param boards: the board states, shape (N, 6, 7)
+    :return: the code of every window of every board, shape (N, 70) and dtype uint8; the last column is the dummy
+    window of the padding, always 0
+    """
+    codes = np.zeros((len(boards), len(WINDOWS) + 1), np.uint8)
+    codes[:, :-1] = (boards.reshape(len(boards), -1)[:, WINDOWS] * WINDOW_POWERS).sum(axis=2)
+    return codes
+
+
+def expand(heights: np.ndarray, codes: np.ndarray, scores: np.ndarray, players: np.ndarray, with_codes: bool = True
+           ) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Plays every legal move of every board. A move only changes the windows containing its cell, so the window codes,
+    the heuristic score and the connected four of the children are all computed from these windows.
+    :param heights: the number of pieces in every column, shape (N, 7)
+    :param codes: the window codes of the boards (see window_codes), shape (N, 70)
+    :param scores: the heuristic scores of the boards for PLAYER1, shape (N,)
+    :param players: the player making the next move on every board, shape (N,)
+    :param with_codes: whether the window codes of the children are computed, which the leaves don't need
+    :return: the children's heights, window codes (None if not computed), scores for PLAYER1 and players to move,
+    the slot of every child (parent * 7 + column) and whether the move connected four
+    """
+    slots = np.flatnonzero(heights.ravel() < BOARD_ROWS)
+    parents, cols = np.divmod(slots, BOARD_COLUMNS)
+    cells = heights.ravel()[slots] * BOARD_COLUMNS + cols
+    movers = players[parents]
+    windows = CELL_WINDOW_INDICES[cells]
+    old_codes = codes[parents[:, None], windows]
+    new_codes = old_codes + movers.astype(np.uint8)[:, None] * CELL_WINDOW_POWERS[cells]
+    child_scores = scores[parents] + (WINDOW_CODE_SCORES[new_codes] - WINDOW_CODE_SCORES[old_codes]).sum(axis=1)
+    won = np.any(new_codes == FOUR_CODES[movers][:, None], axis=1)
+    child_codes = None
+    if with_codes:
+        child_codes = codes[parents]
+        child_codes[np.arange(len(slots))[:, None], windows] = new_codes
+    child_heights = heights[parents]
+    child_heights[np.arange(len(slots)), cols] += 1
+    child_players = np.where(movers == PLAYER1, PLAYER2, PLAYER1).astype(BoardPiece)
+    return child_heights, child_codes, child_scores, child_players, slots, won
+
+
+def batch_negamax(boards: np.ndarray, players: np.ndarray, depth: int) -> np.ndarray:
+    """
+    Searches N boards at once, with a full width search instead of alpha-beta: the game trees of all the boards are
+    built level by level with array operations, and the scores are backed up level by level in the negamax form.
+    The heuristic score of every node is updated from its parent's (see expand), like IncrementalEvaluator does in
+    the single board search. There is no pruning, so it searches many more nodes than negamax.NegamaxSearch, but it
+    pays the Python overhead once per level instead of once per node, which is much faster for shallow searches of
+    many boards.
+    All the nodes of a level are kept at once, about 400 bytes for each of the up to N * 7 ** depth leaves: a batch
+    larger than a few hundred boards at depth 4 takes hundreds of MB (see BATCH_LEAVES).
+    The scores are the ones of NegamaxSearch: the heuristic score of the leaves, minus WIN_SCORE * (remaining
+    depth + 1) for the player to move on a board where the opponent connected four.
+    :param boards: the board states, shape (N, 6, 7), none of them finished
+    :param players: the player making the next move on every board, shape (N,)
+    :param depth: the number of future moves to be considered, including the root moves; at least 1
+    :return: the score of every move of every board for the player to move, shape (N, 7); -INF for full columns
+    """
+    n_boards = len(boards)
+    heights = np.count_nonzero(boards != NO_PLAYER, axis=1)
+    codes = window_codes(boards)
+    scores = WINDOW_CODE_SCORES[codes].sum(axis=1)
+    # levels[k] holds, for the boards reached after k + 1 moves: the slot of every board among the moves of the
+    # previous level, its score for the player to move and the boards of running games, the only ones expanded
+    # further
+    levels = []
+    for level in range(depth):
+        remaining_depth = depth - 1 - level
+        heights, codes, scores, players, slots, won = expand(heights, codes, scores, players, remaining_depth > 0)
+        player_scores = np.where(players == PLAYER1, scores, -scores) - WIN_SCORE * (remaining_depth + 1) * won
+        running = np.flatnonzero(~won & (heights.sum(axis=1) < BOARD_ROWS * BOARD_COLUMNS))
+        levels.append((slots, player_scores, running))
+        if remaining_depth > 0:
+            heights, codes, scores, players = heights[running], codes[running], scores[running], players[running]
+
+    best_scores = None
+    for level in range(depth - 1, -1, -1):
+        slots, player_scores, running = levels[level]
+        if best_scores is not None:
+            player_scores[running] = best_scores
+        n_parents = len(levels[level - 1][2]) if level > 0 else n_boards
+        move_scores = np.full(n_parents * BOARD_COLUMNS, -INF, np.int64)
+        move_scores[slots] = -player_scores
+        move_scores = move_scores.reshape(n_parents, BOARD_COLUMNS)
+        best_scores = move_scores.max(axis=1)
+    return move_scores
+
+
+def generate_moves_minimax(boards: np.ndarray, players: Union[BoardPiece, np.ndarray],
+                           saved_states: Optional[Sequence[Optional[SavedState]]] = None, depth: int = 4,
+                           opening_book: Union[OpeningBook, str, None] = DEFAULT_BOOK,
+                           solver_empty_cells: int = SOLVER_EMPTY_CELLS
+                           ) -> Tuple[np.ndarray, List[Optional[SavedState]]]:
+    """
+    Generate the next move of many games at once for the minimax agent (see common.GenMoves).
+    The boards found in the opening book or close enough to the end for the solver are answered one by one, as in
+    generate_move_minimax; the others are searched together by batch_negamax, in chunks of at most BATCH_LEAVES
+    leaves (at least one board per chunk, so a single board deeper than depth 6 goes beyond it). Among moves of equal
+    score, the center-most one is played.
+    :param boards: the current board states, shape (N, 6, 7)
+    :param players: the player who should make the next move on every board, shape (N,) or a single player
+    :param saved_states: the last saved state of every game, None for none of them
+    :param depth: the number of future moves to be considered by the search
+    :param opening_book: the book answering the first moves of the game, or the path of its file; None for no book.
+    A book move keeps the saved state unchanged.
+    :param solver_empty_cells: the perfect play solver is used instead when at most this many cells are empty
+    :return: the next action of every game, shape (N,), the new saved states
+    """
+    boards = np.asarray(boards)
+    players = np.broadcast_to(np.asarray(players, BoardPiece), (len(boards),))
+    saved_states = [None] * len(boards) if saved_states is None else list(saved_states)
+    actions = np.zeros(len(boards), PlayerAction)
+
+    searched = []
+    for i, (board, player) in enumerate(zip(boards, players)):
+        next_move = book_move(board, opening_book)
+        if next_move is not None:
+            actions[i] = next_move
+        elif np.count_nonzero(board == NO_PLAYER) <= solver_empty_cells:
+            actions[i], saved_states[i] = generate_move_solver(board, player, saved_states[i])
+        else:
+            searched.append(i)
+
+    chunk_size = max(1, BATCH_LEAVES // BOARD_COLUMNS ** depth)
+    center_first = np.array(CENTER_FIRST)
+    for start in range(0, len(searched), chunk_size):
+        chunk = searched[start: start + chunk_size]
+        move_scores = batch_negamax(boards[chunk], players[chunk], depth)
+        actions[chunk] = center_first[np.argmax(move_scores[:, center_first], axis=1)]
+    return actions, saved_states
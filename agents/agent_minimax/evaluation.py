@@ -0,0 +1,108 @@
+from agents.common import BoardPiece, PLAYER1, PLAYER2, BOARD_ROWS, BOARD_COLUMNS
+
+from typing import Union
+import numpy as np
+
+
+def generate_windows() -> np.ndarray:
+    """
+    Generates the 69 windows of 4 cells in which a player can connect four: 24 horizontal, 21 vertical
+    and 12 on each diagonal orientation.
+    :return: array of shape (69, 4) with the indices of the windows' cells in board.ravel()
+    """
+    windows = []
+    for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        for row in range(BOARD_ROWS):
+            for col in range(BOARD_COLUMNS):
+                cells = [(row + k * d_row, col + k * d_col) for k in range(4)]
+                if all(0 <= i < BOARD_ROWS and 0 <= j < BOARD_COLUMNS for i, j in cells):
+                    windows.append([i * BOARD_COLUMNS + j for i, j in cells])
+    return np.array(windows, np.intp)
+
+
+WINDOWS = generate_windows()
+
+# WINDOW_SCORES[n1, n2] is the score of a window with n1 pieces of PLAYER1 and n2 pieces of PLAYER2, for PLAYER1.
+# A window holding pieces of both players can't be won anymore and scores 0.
+WINDOW_SCORES = np.zeros((5, 5), np.int64)
+WINDOW_SCORES[1:, 0] = [1, 10, 50, 1000]
+WINDOW_SCORES[0, 1:] = [-1, -10, -50, -1000]
+
+
+def evaluate_board(board: np.ndarray, player: BoardPiece) -> int:
+    """
+    Scores all the windows of the board in one vectorized pass, using the window table and the score lookup.
+    :param board: the board state that needs computing the score
+    :param player: the player for whom the score is computed
+    :return: the sum of the window scores
+    """
+    cells = board.ravel()[WINDOWS]
+    score = int(WINDOW_SCORES[np.count_nonzero(cells == PLAYER1, axis=1),
+                              np.count_nonzero(cells == PLAYER2, axis=1)].sum())
+    return score if player == PLAYER1 else -score
+
+
+def evaluate_boards(boards: np.ndarray, players: Union[BoardPiece, np.ndarray]) -> np.ndarray:
+    """
+    Scores a batch of boards in one call.
+    :param boards: the board states, shape (N, 6, 7)
+    :param players: the player for whom every score is computed, a single player or an array of shape (N,)
+    :return: the scores, shape (N,)
+    """
+    cells = boards.reshape(len(boards), -1)[:, WINDOWS]
+    scores = WINDOW_SCORES[np.count_nonzero(cells == PLAYER1, axis=2),
+                           np.count_nonzero(cells == PLAYER2, axis=2)].sum(axis=1)
+    return np.where(np.asarray(players) == PLAYER1, scores, -scores)
+
+
+# CELL_WINDOWS[row * 7 + col] lists the windows containing the cell (row, col), at most 13
+CELL_WINDOWS = [np.flatnonzero(np.any(WINDOWS == cell, axis=1)).tolist()
+                for cell in range(BOARD_ROWS * BOARD_COLUMNS)]
+_WINDOW_SCORES = WINDOW_SCORES.tolist()
+
+
+class IncrementalEvaluator(object):
+    """
+    Keeps the heuristic score of a board up to date while moves are made and taken back, as in a
+    search that descends and ascends the game tree. It stores the number of pieces of every player
+    in every window, so a move only updates the windows through its cell and the board is scored in O(1).
+    """
+
+    def __init__(self, board: np.ndarray):
+        cells = board.ravel()[WINDOWS]
+        self.player1_counts = np.count_nonzero(cells == PLAYER1, axis=1).tolist()
+        self.player2_counts = np.count_nonzero(cells == PLAYER2, axis=1).tolist()
+        self.score = evaluate_board(board, PLAYER1)  # the score for PLAYER1
+
+    def make(self, row: int, col: int, player: BoardPiece):
+        """
+        Updates the score for a piece of `player` placed at (row, col).
+        """
+        player1_counts, player2_counts = self.player1_counts, self.player2_counts
+        counts = player1_counts if player == PLAYER1 else player2_counts
+        delta = 0
+        for w in CELL_WINDOWS[row * BOARD_COLUMNS + col]:
+            delta -= _WINDOW_SCORES[player1_counts[w]][player2_counts[w]]
+            counts[w] += 1
+            delta += _WINDOW_SCORES[player1_counts[w]][player2_counts[w]]
+        self.score += delta
+
+    def unmake(self, row: int, col: int, player: BoardPiece):
+        """
+        Updates the score for the piece of `player` removed from (row, col).
+        """
+        player1_counts, player2_counts = self.player1_counts, self.player2_counts
+        counts = player1_counts if player == PLAYER1 else player2_counts
+        delta = 0
+        for w in CELL_WINDOWS[row * BOARD_COLUMNS + col]:
+            delta -= _WINDOW_SCORES[player1_counts[w]][player2_counts[w]]
+            counts[w] -= 1
+            delta += _WINDOW_SCORES[player1_counts[w]][player2_counts[w]]
+        self.score += delta
+
+    def evaluate(self, player: BoardPiece) -> int:
+        """
+        :param player: the player for whom the score is computed
+        :return: the same score as evaluate_board for the current board
+        """
+        return self.score if player == PLAYER1 else -self.score
@@ -1,14 +1,36 @@
 from agents.common import PlayerAction, BoardPiece, SavedState, GenMove, PLAYER1, PLAYER2, NO_PLAYER, GameState
 from agents.common import connected_four, apply_player_action, check_end_state
-from agents.common import generate_main_diagonals, generate_second_diagnals, find_opponent
+from agents.common import find_opponent, possible_moves
+from agents.agent_minimax.evaluation import evaluate_board
+from agents.transposition import TranspositionTable
+from agents.agent_minimax.ordering import MoveOrdering
+from agents.agent_minimax.negamax import NegamaxSearch, SearchTimeout, INF, WIN_SCORE
+from agents.agent_solver.solver import generate_move_solver, SOLVER_EMPTY_CELLS
+from agents.opening_book import OpeningBook, DEFAULT_BOOK, book_move
+from agents.position_cache import PositionCache
 import numpy as np
-from typing import Optional, Callable, Tuple
+from typing import Optional, Callable, Tuple, List, Union
 import math
+import time
 
 POSITIVE_INF = math.inf
 NEGATIVE_INF = -math.inf
 
 
+class MinimaxSavedState(SavedState):
+    """
+    The minimax agent keeps its transposition table and its move ordering statistics from one move to the next.
+    After every move, search_nodes holds the number of nodes searched at every remaining depth (index 0 are
+    the leaves) by every completed iteration, to measure how well the search prunes.
+    """
+
+    def __init__(self, transposition_table: Optional[TranspositionTable] = None,
+                 ordering: Optional[MoveOrdering] = None):
+        self.transposition_table = TranspositionTable() if transposition_table is None else transposition_table
+        self.ordering = MoveOrdering() if ordering is None else ordering
+        self.search_nodes = []
+
+
 def compute_score(board: np.ndarray, player: BoardPiece) -> float:
     """
     This method is a dummy heuristic in minimax.
@@ -27,79 +49,17 @@ def compute_score(board: np.ndarray, player: BoardPiece) -> float:
     return 0
 
 
-def find_line_score(line: np.ndarray, player: BoardPiece) -> int:
-    """
-    Computes the score in one possible line of the board (line = row, column or diagonal)
-    :param line: the board line whose score is computed
-    :param player: the current player making the next move
-    :return: the line score for the minimax heuristic
-    """
-    line_score = 0
-    for first_element in range(0, len(line) - 3):
-        possible_pattern = line[first_element:first_element + 4]
-        counts = np.zeros(3)
-        counts[0] = np.sum([possible_pattern == PLAYER1])
-        counts[1] = np.sum([possible_pattern == PLAYER2])
-        counts[2] = np.sum([possible_pattern == NO_PLAYER])
-        assert (np.sum(counts)) == 4
-        if player == PLAYER1:
-            if np.all(counts == np.array([4, 0, 0])):
-                line_score += 1000
-            elif np.all(counts == np.array([3, 0, 1])):
-                line_score += 50
-            elif np.all(counts == np.array([2, 0, 2])):
-                line_score += 10
-            elif np.all(counts == np.array([1, 0, 3])):
-                line_score += 1
-            elif np.all(counts == np.array([0, 4, 0])):
-                line_score += -1000
-            elif np.all(counts == np.array([0, 3, 1])):
-                line_score += -50
-            elif np.all(counts == np.array([0, 2, 2])):
-                line_score += -10
-            elif np.all(counts == np.array([0, 1, 3])):
-                line_score += -1
-        else:
-            if np.all(counts == np.array([4, 0, 0])):
-                line_score += -1000
-            elif np.all(counts == np.array([3, 0, 1])):
-                line_score += -50
-            elif np.all(counts == np.array([2, 0, 2])):
-                line_score += -10
-            elif np.all(counts == np.array([1, 0, 3])):
-                line_score += -1
-            elif np.all(counts == np.array([0, 4, 0])):
-                line_score += 1000
-            elif np.all(counts == np.array([0, 3, 1])):
-                line_score += 50
-            elif np.all(counts == np.array([0, 2, 2])):
-                line_score += 10
-            elif np.all(counts == np.array([0, 1, 3])):
-                line_score += 1
-    return line_score
-
-
 def compute_score_2(board: np.ndarray, player: BoardPiece) -> int:
     """
-    This method is a smart heuristic for minimax. It associates a score to each board state.
+    This method is a smart heuristic for minimax. It associates a score to each board state:
+    every window of 4 cells where a player can still connect four scores 1, 10, 50 or 1000 for
+    1, 2, 3 or 4 of their pieces, positive for the player and negative for the opponent.
+    All the windows are scored at once, see evaluation.evaluate_board.
     :param board: the board state that needs computing the score
     :param player: the player for whom the score is computed
     :return: the final and total score of the minimax heuristic
     """
-
-    score = 0
-    for i in range(6):
-        score += find_line_score(board[i, :], player)
-    for i in range(7):
-        score += find_line_score(board[:, i], player)
-    main_diagonals = generate_main_diagonals(board)
-    for d in main_diagonals:
-        score += find_line_score(np.ndarray(d), player)
-    second_diagonals = generate_second_diagnals(board)
-    for d in second_diagonals:
-        score += find_line_score(np.ndarray(d), player)
-
-    return score
+    return evaluate_board(board, player)
 
 
 def generate_child_boards(board: np.array, player: BoardPiece) -> [np.array]:
@@ -118,62 +78,110 @@ def generate_child_boards(board: np.array, player: BoardPiece) -> [np.array]:
     return children_boards
 
 
-def generate_move_minimax(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState], depth=4
+def generate_move_minimax(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState], depth=4,
+                          transposition_table: Optional[TranspositionTable] = None,
+                          time_budget: Optional[float] = None, ordering: Optional[MoveOrdering] = None,
+                          opening_book: Union[OpeningBook, str, None] = DEFAULT_BOOK,
+                          solver_empty_cells: int = SOLVER_EMPTY_CELLS, position_cache: Optional[PositionCache] = None,
                           ) -> Tuple[PlayerAction, Optional[SavedState]]:
     """
-    Generate the next move for the minimax agent.
+    Generate the next move for the minimax agent, searched by negamax.NegamaxSearch.
+    With a time budget, the search is iteratively deepened (depth 1, 2, 3...) until the budget runs out, and the
+    best move of the deepest completed iteration is played. The best move of every iteration is searched first in
+    the next one, the transposition table brings the rest of the principal variation to the front, and the
+    score of every iteration is the center of the aspiration window of the next one.
     :param board: the current board state
     :param player: the current player who should make the next move
     :param saved_state: the last saved state
-    :param depth: the number of future moves to be considered by the minimax search
+    :param depth: the number of future moves to be considered by the minimax search, if no time budget is given
+    :param transposition_table: the table caching the searched positions; the one of the saved state if None
+    :param time_budget: the time in seconds the move may take; None for a search with fixed depth
+    :param ordering: the move ordering of the search; the one of the saved state if None
+    :param opening_book: the book answering the first moves of the game, or the path of its file; None for no book.
+    A book move keeps the saved state unchanged.
+    :param solver_empty_cells: the perfect play solver is used instead when at most this many cells are empty
+    :param position_cache: the cache shared with other processes, None for not using one. A move cached from
+    a search at least as deep is played without searching, otherwise the cached move is searched first;
+    the result of the search is stored.
     :return: the next action, the new saved state
     """
-    children = generate_child_boards(board, player)
-    scores = np.zeros(7)
-
-    for i in range(len(children)):
-        # scores[i] = minimax_algorithm(children[i], player, find_opponent(player), depth - 1, NEGATIVE_INF, POSITIVE_INF)
-        scores[i] = minimax_algorithm(children[i], player, player, depth - 1, NEGATIVE_INF, POSITIVE_INF)
-
-    next_move = np.argmax(scores)
-
+    next_move = book_move(board, opening_book)
+    if next_move is not None:
+        return next_move, saved_state
+    if np.count_nonzero(board == NO_PLAYER) <= solver_empty_cells:
+        return generate_move_solver(board, player, saved_state)
+    if not isinstance(saved_state, MinimaxSavedState):
+        saved_state = MinimaxSavedState()
+    if transposition_table is not None:
+        saved_state.transposition_table = transposition_table
+    if ordering is not None:
+        saved_state.ordering = ordering
+    transposition_table, ordering = saved_state.transposition_table, saved_state.ordering
+    ordering.new_search()
+    saved_state.search_nodes = []
+    moves = ordering.order(possible_moves(board), np.count_nonzero(board != NO_PLAYER), player)
+    if position_cache is not None:
+        entry = position_cache.probe(board)
+        if entry is not None and entry[1] in moves:
+            _, cached_move, cached_depth = entry
+            if time_budget is None and cached_depth >= depth:
+                return np.int8(cached_move), saved_state
+            moves.remove(cached_move)
+            moves.insert(0, cached_move)
+
+    if time_budget is None:
+        nodes = [0] * depth
+        search = NegamaxSearch(board, player, transposition_table, ordering, None, nodes)
+        next_move, score = search.search_root(depth, moves)
+        saved_state.search_nodes.append(nodes)
+        if position_cache is not None:
+            position_cache.store(board, score, next_move, depth)
+        return np.int8(next_move), saved_state
+
+    deadline = time.monotonic() + time_budget
+    next_move, score = moves[0], None
+    for iteration_depth in range(1, np.count_nonzero(board == NO_PLAYER) + 1):
+        nodes = [0] * iteration_depth
+        search = NegamaxSearch(board, player, transposition_table, ordering, deadline, nodes)
+        try:
+            if score is None:
+                next_move, score = search.search_root(iteration_depth, moves)
+            else:
+                next_move, score = search.search_aspiration(iteration_depth, moves, score)
+        except SearchTimeout:
+            break
+        saved_state.search_nodes.append(nodes)
+        moves.remove(next_move)
+        moves.insert(0, next_move)
+
+    if position_cache is not None and score is not None:
+        position_cache.store(board, score, next_move, len(saved_state.search_nodes))
     return np.int8(next_move), saved_state
 
 
 def minimax_algorithm(board: np.ndarray, root_player: BoardPiece, current_player: BoardPiece,
-                      depth: int = 4, alpha=NEGATIVE_INF, beta=POSITIVE_INF) -> float:
+                      depth: int = 4, alpha=NEGATIVE_INF, beta=POSITIVE_INF,
+                      transposition_table: Optional[TranspositionTable] = None,
+                      deadline: Optional[float] = None, ordering: Optional[MoveOrdering] = None,
+                      nodes: Optional[List[int]] = None) -> float:
     """
-    The recursive minimax algorithm with alpha-beta pruning and dynamic depth.
+    The minimax algorithm with alpha-beta pruning, computing the score of a board for the root player.
+    The search itself is done in the negamax form by negamax.NegamaxSearch; the board isn't modified.
     :param board: the current board
-    :param root_player: the player who makes the move on the root board
+    :param root_player: the player for whom the score is computed
     :param current_player: the player making the move on the current board
     :param depth: the current depth
     :param alpha: alpha factor in alpha-beta pruning
     :param beta: beta factor in alpha-beta pruning
-    :return:
+    :param transposition_table: the table caching the searched positions, None for searching without it
+    :param deadline: the time.monotonic() time at which the search raises SearchTimeout, None for no deadline
+    :param ordering: the move ordering, None for searching the moves from left to right
+    (after the transposition table move)
+    :param nodes: the counts of searched nodes per remaining depth, updated by the search; None for not counting
+    :return: the score of the board for the root player
     """
-    if depth == 0 or check_end_state(board, current_player) != GameState.STILL_PLAYING:
-        # score = compute_score(board, root_player)
-        score = compute_score_2(board, root_player)
-        return score
-
-    children = generate_child_boards(board, current_player)
-
+    alpha, beta = int(max(alpha, -INF)), int(min(beta, INF))
+    search = NegamaxSearch(board, current_player, transposition_table, ordering, deadline, nodes)
     if current_player == root_player:
-        max_score = NEGATIVE_INF
-        for i in range(len(children)):
-            score = minimax_algorithm(children[i], root_player, find_opponent(current_player), depth - 1, alpha, beta)
-            max_score = np.maximum(max_score, score)
-            alpha = np.maximum(alpha, score)
-            if beta <= alpha:
-                break
-        return max_score
-    else:
-        min_score = POSITIVE_INF
-        for i in range(len(children)):
-            score = minimax_algorithm(children[i], root_player, find_opponent(current_player), depth - 1, alpha, beta)
-            min_score = np.minimum(min_score, score)
-            beta = np.minimum(beta, score)
-            if beta <= alpha:
-                break
-        return min_score
+        return search.negamax(depth, alpha, beta)
+    return -search.negamax(depth, -beta, -alpha)
@@ -0,0 +1,239 @@
+from agents.common import BoardPiece, PLAYER1, BOARD_ROWS, BOARD_COLUMNS, find_opponent
+from agents.bitboard import BitBoard
+from agents.agent_minimax.evaluation import IncrementalEvaluator
+from agents.agent_minimax.transposition import zobrist_hash, ZOBRIST_PIECES, ZOBRIST_CURRENT_PLAYER2
+from agents.transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from agents.agent_minimax.ordering import MoveOrdering
+
+from typing import Optional, Tuple, List
+import numpy as np
+import time
+
+INF = 10 ** 9  # larger than any score, kept an int so that null windows (alpha, alpha + 1) work
+WIN_SCORE = 100000  # bonus of a won game, per remaining depth
+ASPIRATION_WINDOW = 60  # half width of the first window around the score of the previous iteration
+
+_PIECE_KEYS = ZOBRIST_PIECES.tolist()
+_MIRROR_PIECE_KEYS = ZOBRIST_PIECES[:, :, ::-1].tolist()  # the keys of the cells of the mirrored board
+LEFT_HALF = range((BOARD_COLUMNS + 1) // 2)
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the minimax search when the deadline of the current move is reached.
+    """
+    pass
+
+
+class NegamaxSearch(object):
+    """
+    Alpha-beta search in the negamax form: the score of a node is always computed for the player to move on it,
+    and the score of a child is the negated score of the parent, so there is a single branch for both players.
+    The first move of every node is searched with the full window and the other moves with a null window
+    (alpha, alpha + 1), which only proves that they are not better; a move that fails high is searched again
+    with the full window (principal variation search).
+    The position is kept as a BitBoard, the heuristic score by an IncrementalEvaluator and the hash as an int,
+    and all of them are updated as moves are made and taken back. Scores and bounds are native ints.
+    The transposition table stores the scores for the player to move, so its keys don't depend on the root player.
+    A board and its mirror image have the same score, so they share their entry: the hash of the mirrored board
+    is kept too, the smaller of the two hashes is the key, and the best moves are stored in the orientation of
+    that key. On a symmetric board, the moves of the right half are mirror images of the moves of the left half,
+    and only the left half is searched.
+    After a SearchTimeout the position is left in the middle of the search, and the object must be discarded.
+    """
+
+    def __init__(self, board: np.ndarray, player: BoardPiece,
+                 transposition_table: Optional[TranspositionTable] = None, ordering: Optional[MoveOrdering] = None,
+                 deadline: Optional[float] = None, nodes: Optional[List[int]] = None):
+        """
+        :param board: the root board
+        :param player: the player making the move on the root board
+        :param transposition_table: the table caching the searched positions, None for searching without it
+        :param ordering: the move ordering, None for searching the moves from left to right
+        (after the transposition table move)
+        :param deadline: the time.monotonic() time at which the search raises SearchTimeout, None for no deadline
+        :param nodes: the counts of searched nodes per remaining depth, updated by the search; None for not counting
+        """
+        self.bitboard = BitBoard.from_array(board)
+        self.player = player
+        self.evaluator = IncrementalEvaluator(board)
+        self.key = zobrist_hash(board, PLAYER1, player)
+        self.mirror_key = zobrist_hash(board[:, ::-1], PLAYER1, player)
+        self.transposition_table = transposition_table
+        self.ordering = ordering
+        self.deadline = deadline
+        self.nodes = nodes
+
+    def make(self, move: int) -> int:
+        """
+        Plays the move for the player to move.
+        :param move: a legal column
+        :return: the row where the piece landed, needed to take the move back
+        """
+        player = self.player
+        row = self.bitboard.apply_action(move, player)
+        self.evaluator.make(row, move, player)
+        self.key ^= _PIECE_KEYS[player][row][move] ^ ZOBRIST_CURRENT_PLAYER2
+        self.mirror_key ^= _MIRROR_PIECE_KEYS[player][row][move] ^ ZOBRIST_CURRENT_PLAYER2
+        self.player = find_opponent(player)
+        return row
+
+    def unmake(self, move: int, row: int):
+        """
+        Takes back the last move, played in column `move` at `row`.
+        """
+        player = find_opponent(self.player)
+        self.bitboard.undo_action(move)
+        self.evaluator.unmake(row, move, player)
+        self.key ^= _PIECE_KEYS[player][row][move] ^ ZOBRIST_CURRENT_PLAYER2
+        self.mirror_key ^= _MIRROR_PIECE_KEYS[player][row][move] ^ ZOBRIST_CURRENT_PLAYER2
+        self.player = player
+
+    def negamax(self, depth: int, alpha: int, beta: int) -> int:
+        """
+        Searches the current position.
+        :param depth: the remaining depth
+        :param alpha: lower bound of the window
+        :param beta: upper bound of the window
+        :return: the score for the player to move; at most alpha if the search failed low,
+        at least beta if it failed high
+        """
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise SearchTimeout
+        if self.nodes is not None:
+            self.nodes[depth] += 1
+        bitboard = self.bitboard
+        player = self.player
+
+        # only the player who made the last move can have connected four
+        lost = bitboard.connected_four(find_opponent(player))
+        heights = bitboard.heights
+        ply = sum(heights)
+        if depth == 0 or lost or ply == BOARD_ROWS * BOARD_COLUMNS:
+            score = self.evaluator.evaluate(player)
+            # a finished game outweighs any heuristic score, and a win is worth more the sooner it comes
+            if lost:
+                score -= WIN_SCORE * (depth + 1)
+            return score
+
+        tt_move = -1
+        transposition_table = self.transposition_table
+        key, mirror_key = self.key, self.mirror_key
+        mirrored = mirror_key < key
+        if transposition_table is not None:
+            entry = transposition_table.probe(mirror_key if mirrored else key)
+            if entry is not None:
+                entry_depth, entry_value, entry_bound, tt_move = entry
+                if mirrored and tt_move >= 0:
+                    tt_move = BOARD_COLUMNS - 1 - tt_move
+                if entry_depth >= depth:
+                    entry_value = int(entry_value)
+                    if entry_bound == EXACT:
+                        return entry_value
+                    if entry_bound == LOWER_BOUND:
+                        alpha = max(alpha, entry_value)
+                    else:
+                        beta = min(beta, entry_value)
+                    if alpha >= beta:
+                        return entry_value
+        alpha_original, beta_original = alpha, beta
+
+        if key == mirror_key:
+            moves = [col for col in LEFT_HALF if heights[col] < BOARD_ROWS]
+        else:
+            moves = [col for col in range(BOARD_COLUMNS) if heights[col] < BOARD_ROWS]
+        ordering = self.ordering
+        if ordering is not None:
+            moves = ordering.order(moves, ply, player, tt_move)
+        elif tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        best_score, best_move = -INF, moves[0]
+        first = True
+        for move in moves:
+            row = self.make(move)
+            if first:
+                score = -self.negamax(depth - 1, -beta, -alpha)
+                first = False
+            else:
+                score = -self.negamax(depth - 1, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, -beta, -alpha)
+            self.unmake(move, row)
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if ordering is not None:
+                            ordering.update(move, ply, player, depth)
+                        break
+
+        if transposition_table is not None:
+            if best_score <= alpha_original:
+                bound = UPPER_BOUND
+            elif best_score >= beta_original:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            if mirrored:
+                transposition_table.store(mirror_key, depth, best_score, bound, BOARD_COLUMNS - 1 - best_move)
+            else:
+                transposition_table.store(key, depth, best_score, bound, best_move)
+        return best_score
+
+    def search_root(self, depth: int, moves: List[int], alpha: int = -INF, beta: int = INF) -> Tuple[int, int]:
+        """
+        Searches every legal move of the root position, in the given order, and returns the best one.
+        On a symmetric board, the moves of the right half are skipped.
+        :param depth: the number of future moves to be considered, including the root move
+        :param moves: the legal moves of the root board, in the order they are searched
+        :param alpha: lower bound of the window
+        :param beta: upper bound of the window
+        :return: the best move, its score for the player to move (at most alpha or at least beta if the search
+        failed low or high, in which case the move isn't reliable)
+        """
+        if self.key == self.mirror_key:
+            moves = [move for move in moves if move in LEFT_HALF]
+        best_move, best_score = moves[0], -INF
+        first = True
+        for move in moves:
+            row = self.make(move)
+            if first:
+                score = -self.negamax(depth - 1, -beta, -alpha)
+                first = False
+            else:
+                score = -self.negamax(depth - 1, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, -beta, -alpha)
+            self.unmake(move, row)
+            if score > best_score:
+                best_move, best_score = move, score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_move, best_score
+
+    def search_aspiration(self, depth: int, moves: List[int], guess: int,
+                          window: int = ASPIRATION_WINDOW) -> Tuple[int, int]:
+        """
+        Searches the root position with a narrow window around the expected score, usually the score of the
+        previous iteration of iterative deepening. A narrow window prunes more; if the score falls outside of it,
+        the failing side of the window is opened and the root searched again.
+        :param depth: the number of future moves to be considered, including the root move
+        :param moves: the legal moves of the root board, in the order they are searched
+        :param guess: the expected score
+        :param window: the half width of the first window
+        :return: the best move, its exact score
+        """
+        alpha, beta = guess - window, guess + window
+        while True:
+            best_move, best_score = self.search_root(depth, moves, alpha, beta)
+            if best_score <= alpha:
+                alpha = -INF
+            elif best_score >= beta:
+                beta = INF
+            else:
+                return best_move, best_score
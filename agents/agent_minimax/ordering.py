@@ -0,0 +1,67 @@
+from agents.common import BoardPiece, PLAYER1, BOARD_ROWS, BOARD_COLUMNS, CENTER_FIRST
+
+from typing import List, Sequence
+
+
+class MoveOrdering(object):
+    """
+    Orders the moves of a node for alpha-beta, so that the moves likely to cause a cut-off are searched first:
+    the best move stored in the transposition table, then the killer moves (the last moves that caused a
+    cut-off at the same ply), then the other moves by their history score (the moves that often caused a
+    cut-off anywhere in the search), and finally by a static order, center first by default.
+    Killer moves and the history heuristic can be switched off, and subclasses can plug in other orderings.
+    """
+
+    def __init__(self, killers: bool = True, history: bool = True, static_order: Sequence[int] = CENTER_FIRST):
+        self.use_killers = killers
+        self.use_history = history
+        self.static_rank = [0] * BOARD_COLUMNS
+        for rank, col in enumerate(static_order):
+            self.static_rank[col] = rank
+        self.killers = [[] for _ in range(BOARD_ROWS * BOARD_COLUMNS + 1)]  # two killer moves per ply
+        self.history = [[0] * BOARD_COLUMNS for _ in range(2)]  # history score per player and column
+
+    def order(self, moves: List[int], ply: int, player: BoardPiece, tt_move: int = -1) -> List[int]:
+        """
+        :param moves: the legal moves of the node
+        :param ply: the number of pieces on the node's board
+        :param player: the player making the move on the node's board
+        :param tt_move: the best move stored in the transposition table, -1 if there is none
+        :return: the moves in the order they should be searched
+        """
+        history = self.history[0 if player == PLAYER1 else 1]
+        killers = self.killers[ply] if self.use_killers else []
+        static_rank = self.static_rank
+
+        def rank(move):
+            return (move != tt_move, move not in killers, -history[move] if self.use_history else 0,
+                    static_rank[move])
+
+        return sorted(moves, key=rank)
+
+    def update(self, move: int, ply: int, player: BoardPiece, depth: int):
+        """
+        Records a move that caused a beta cut-off.
+        :param move: the move that caused the cut-off
+        :param ply: the number of pieces on the board of the node
+        :param player: the player making the move
+        :param depth: the remaining depth of the node; deeper cut-offs prune more and weigh more
+        """
+        if self.use_killers:
+            killers = self.killers[ply]
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[2:]
+        if self.use_history:
+            self.history[0 if player == PLAYER1 else 1][move] += depth * depth
+
+    def new_search(self):
+        """
+        Called before the search of a new move: the killer moves are forgotten and the history scores
+        are halved, so that the statistics of older positions fade out.
+        """
+        for killers in self.killers:
+            killers.clear()
+        for history in self.history:
+            for col in range(BOARD_COLUMNS):
+                history[col] //= 2
@@ -0,0 +1,29 @@
+from agents.common import BoardPiece, PLAYER2, BOARD_ROWS, BOARD_COLUMNS
+
+import numpy as np
+
+# Zobrist keys: one random 63 bit number per (piece, row, col); the keys of NO_PLAYER are 0 so empty cells don't count
+_zobrist_random = np.random.RandomState(2021)
+ZOBRIST_PIECES = _zobrist_random.randint(np.iinfo(np.int64).max, size=(3, BOARD_ROWS, BOARD_COLUMNS),
+                                         dtype=np.int64).astype(np.uint64)
+ZOBRIST_PIECES[0] = 0
+ZOBRIST_CURRENT_PLAYER2 = int(_zobrist_random.randint(np.iinfo(np.int64).max, dtype=np.int64))
+ZOBRIST_ROOT_PLAYER2 = int(_zobrist_random.randint(np.iinfo(np.int64).max, dtype=np.int64))
+_ROWS, _COLUMNS = np.indices((BOARD_ROWS, BOARD_COLUMNS))
+
+
+def zobrist_hash(board: np.ndarray, root_player: BoardPiece, current_player: BoardPiece) -> int:
+    """
+    Computes the Zobrist hash of a minimax search node: the XOR of the keys of all the pieces on the board,
+    plus the keys of the player to move and of the player the scores are computed for.
+    :param board: the board state
+    :param root_player: the player for whom the scores of the search are computed
+    :param current_player: the player making the move on the board
+    :return: the 63 bit hash of the search node
+    """
+    key = int(np.bitwise_xor.reduce(ZOBRIST_PIECES[board, _ROWS, _COLUMNS], axis=None))
+    if current_player == PLAYER2:
+        key ^= ZOBRIST_CURRENT_PLAYER2
+    if root_player == PLAYER2:
+        key ^= ZOBRIST_ROOT_PLAYER2
+    return key
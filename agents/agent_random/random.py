@@ -1,5 +1,5 @@
 from agents.common import PlayerAction, BoardPiece, SavedState, GenMove
-from typing import Optional, Callable, Tuple
+from typing import Optional, Callable, Tuple, Sequence, List
 import random
 import numpy as np
 
@@ -16,3 +16,17 @@ def generate_move_random(
     """
     action = PlayerAction(random.randint(0, 6))
     return action, saved_state
+
+
+def generate_moves_random(
+        boards: np.ndarray, players: np.ndarray, saved_states: Optional[Sequence[Optional[SavedState]]] = None
+) -> Tuple[np.ndarray, List[Optional[SavedState]]]:
+    """
+    Generate the next move of many games at once for the random agent (see common.GenMoves).
+    :param boards: the current boards, shape (N, 6, 7)
+    :param players: the player making the next move on every board
+    :param saved_states: the last saved state of every game, None for none of them
+    :return: the column of the next move of every game, shape (N,), the new saved states
+    """
+    actions = np.random.randint(0, 7, len(boards)).astype(PlayerAction)
+    return actions, [None] * len(boards) if saved_states is None else list(saved_states)
@@ -0,0 +1,237 @@
+from agents.common import PlayerAction, BoardPiece, SavedState, GameState, NO_PLAYER, PLAYER1, PLAYER2
+from agents.common import BOARD_ROWS, BOARD_COLUMNS, BITBOARD_COLUMN_HEIGHT, BITBOARD_DIRECTIONS
+from agents.common import board_to_bitboard, find_opponent, CENTER_FIRST
+from agents.transposition import TranspositionTable, LOWER_BOUND, UPPER_BOUND
+
+from typing import Optional, Tuple
+import numpy as np
+
+BOARD_CELLS = BOARD_ROWS * BOARD_COLUMNS
+SOLVER_EMPTY_CELLS = 16  # the agents switch to the solver when at most this many cells are empty
+# the memory of the default transposition table: solving a position with SOLVER_EMPTY_CELLS empty cells stores a few
+# thousand entries, and every game gets its own solver (see SolverSavedState)
+SOLVER_TABLE_BYTES = 2 ** 20
+
+# the bitboards use the layout of common.BITBOARD_CELLS: bit (col * 7 + row), with an empty sentinel row on top
+BOTTOM_MASK = sum(1 << (col * BITBOARD_COLUMN_HEIGHT) for col in range(BOARD_COLUMNS))
+BOARD_MASK = BOTTOM_MASK * ((1 << BOARD_ROWS) - 1)
+COLUMN_MASKS = [((1 << BOARD_ROWS) - 1) << (col * BITBOARD_COLUMN_HEIGHT) for col in range(BOARD_COLUMNS)]
+TOP_MASKS = [1 << (BOARD_ROWS - 1 + col * BITBOARD_COLUMN_HEIGHT) for col in range(BOARD_COLUMNS)]
+
+
+def winning_cells(pieces: int, mask: int) -> int:
+    """
+    Finds the empty cells that would connect four for the player owning `pieces`, whether they can be
+    played right now or not.
+    :param pieces: the bitboard of the player's pieces
+    :param mask: the bitboard of all the pieces on the board
+    :return: the bitboard of the winning cells
+    """
+    # vertical: three pieces below the cell
+    cells = (pieces << 1) & (pieces << 2) & (pieces << 3)
+    for shift in BITBOARD_DIRECTIONS[1:]:
+        pairs = (pieces << shift) & (pieces << (2 * shift))
+        cells |= pairs & (pieces << (3 * shift))  # three pieces on one side
+        cells |= pairs & (pieces >> shift)  # two on one side, one on the other
+        pairs = (pieces >> shift) & (pieces >> (2 * shift))
+        cells |= pairs & (pieces >> (3 * shift))
+        cells |= pairs & (pieces << shift)
+    return cells & (BOARD_MASK ^ mask)
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count('1')
+
+
+class Solver(object):
+    """
+    Computes the exact game-theoretic value of Connect 4 positions, assuming perfect play by both players.
+    The score of a position is given for the player to move: positive if they win, 0 for a draw, negative
+    if they lose, and the sooner the game ends, the larger its absolute value: a player winning with their
+    k-th piece scores (BOARD_CELLS + 2) // 2 - k.
+    The solver searches with alpha-beta and null windows (alpha, alpha + 1) only, narrowing the possible
+    scores by bisection. It never plays a move that lets the opponent win immediately, looks at the moves
+    that create the most threats first, and stores the bounds found in a transposition table, which is kept
+    between searches.
+    Positions are two bitboards: the pieces of the player to move and all the pieces; their sum is a unique key.
+    """
+
+    def __init__(self, transposition_table: Optional[TranspositionTable] = None):
+        """
+        :param transposition_table: the table of the solver, one of SOLVER_TABLE_BYTES if None; solving positions with
+        many more empty cells than SOLVER_EMPTY_CELLS needs a larger one
+        """
+        if transposition_table is None:
+            transposition_table = TranspositionTable(SOLVER_TABLE_BYTES)
+        self.transposition_table = transposition_table
+        self.nodes = 0
+
+    def solve(self, board: np.ndarray, player: BoardPiece) -> int:
+        """
+        :param board: a board on which the game isn't over yet
+        :param player: the player to move
+        :return: the score of the board for `player`
+        """
+        pieces = board_to_bitboard(board, player)
+        mask = pieces | board_to_bitboard(board, find_opponent(player))
+        return self.solve_bitboards(pieces, mask, int(np.count_nonzero(board != NO_PLAYER)))
+
+    def solve_bitboards(self, pieces: int, mask: int, moves: int) -> int:
+        """
+        :param pieces: the bitboard of the pieces of the player to move
+        :param mask: the bitboard of all the pieces
+        :param moves: the number of pieces on the board
+        :return: the score of the position for the player to move
+        """
+        if winning_cells(pieces, mask) & (mask + BOTTOM_MASK) & BOARD_MASK:
+            return (BOARD_CELLS + 1 - moves) // 2
+        low, high = -((BOARD_CELLS - moves) // 2), (BOARD_CELLS + 1 - moves) // 2
+        while low < high:
+            # bisection, biased towards 0 as the bounds near 0 are the cheapest to prove
+            middle = low + (high - low) // 2
+            if middle <= 0 and low // 2 < middle:
+                middle = low // 2
+            elif middle >= 0 and high // 2 > middle:
+                middle = high // 2
+            score = self.negamax(pieces, mask, moves, middle, middle + 1)
+            if score <= middle:
+                high = score
+            else:
+                low = score
+        return low
+
+    def negamax(self, pieces: int, mask: int, moves: int, alpha: int, beta: int) -> int:
+        """
+        Alpha-beta search of a position in which the player to move can't win with their next move.
+        :return: the score of the position if it is in (alpha, beta), otherwise a bound beyond the window
+        """
+        self.nodes += 1
+        opponent = pieces ^ mask
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        opponent_wins = winning_cells(opponent, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):  # two threats can't both be blocked
+                return -((BOARD_CELLS - moves) // 2)
+            possible = forced
+        # don't play below a cell where the opponent would win
+        possible &= ~(opponent_wins >> 1)
+        if not possible:
+            return -((BOARD_CELLS - moves) // 2)
+        if moves >= BOARD_CELLS - 2:
+            return 0
+
+        # the opponent can't win with their next move: the score is at least the loss after it
+        low = -((BOARD_CELLS - 2 - moves) // 2)
+        # the player can't win with this move: the score is at most the win after it
+        high = (BOARD_CELLS - 1 - moves) // 2
+        key = pieces + mask
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            _, value, bound, _ = entry
+            if bound == UPPER_BOUND:
+                high = min(high, int(value))
+            else:
+                low = max(low, int(value))
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        children = []
+        for col in CENTER_FIRST:
+            move = possible & COLUMN_MASKS[col]
+            if move:
+                # moves creating more threats are searched first, center first among equals
+                children.append((-popcount(winning_cells(pieces | move, mask)), len(children), move))
+        children.sort()
+
+        for _, _, move in children:
+            # the player to move changes: the new pieces are the opponent's
+            score = -self.negamax(opponent, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                self.transposition_table.store(key, 0, score, LOWER_BOUND)
+                return score
+            if score > alpha:
+                alpha = score
+        self.transposition_table.store(key, 0, alpha, UPPER_BOUND)
+        return alpha
+
+    def analyze(self, board: np.ndarray, player: BoardPiece) -> np.ndarray:
+        """
+        :param board: a board on which the game isn't over yet
+        :param player: the player to move
+        :return: the score of every column for `player`, NaN for the full columns
+        """
+        pieces = board_to_bitboard(board, player)
+        mask = pieces | board_to_bitboard(board, find_opponent(player))
+        moves = int(np.count_nonzero(board != NO_PLAYER))
+        wins = winning_cells(pieces, mask)
+        scores = np.full(BOARD_COLUMNS, np.nan)
+        for col in range(BOARD_COLUMNS):
+            if mask & TOP_MASKS[col]:
+                continue
+            move = (mask + BOTTOM_MASK) & COLUMN_MASKS[col]
+            if move & wins:
+                scores[col] = (BOARD_CELLS + 1 - moves) // 2
+            else:
+                scores[col] = -self.solve_bitboards(pieces ^ mask, mask | move, moves + 1)
+        return scores
+
+
+def game_result(score: int) -> GameState:
+    """
+    :param score: the score of a position for the player to move
+    :return: IS_WIN, IS_DRAW or IS_LOST for the player to move
+    """
+    if score > 0:
+        return GameState.IS_WIN
+    if score < 0:
+        return GameState.IS_LOST
+    return GameState.IS_DRAW
+
+
+def distance_to_result(score: int, moves: int) -> int:
+    """
+    :param score: the score of a position for the player to move
+    :param moves: the number of pieces on the board of the position
+    :return: the number of moves still played with perfect play, until the winning move or the last cell of a draw
+    """
+    if score == 0:
+        return BOARD_CELLS - moves
+    # the winner's final piece is their k-th one, with k = (BOARD_CELLS + 2) // 2 - |score|
+    winner_pieces = (BOARD_CELLS + 2) // 2 - abs(score)
+    first_player_wins = (score > 0) == (moves % 2 == 0)
+    last_move = 2 * winner_pieces - 1 if first_player_wins else 2 * winner_pieces
+    return last_move - moves
+
+
+class SolverSavedState(SavedState):
+    """
+    The solver keeps its transposition table from one move to the next.
+    """
+
+    def __init__(self, solver: Optional[Solver] = None):
+        self.solver = Solver() if solver is None else solver
+
+
+def generate_move_solver(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState]
+                         ) -> Tuple[PlayerAction, Optional[SavedState]]:
+    """
+    Generate a perfect move: the column with the best score, the center-most one among equals.
+    Only practical when few cells are left empty, or with the help of an opening book.
+    :param board: the current board state
+    :param player: the current player who should make the next move
+    :param saved_state: the last saved state
+    :return: the next action, the new saved state
+    """
+    if not isinstance(saved_state, SolverSavedState):
+        saved_state = SolverSavedState()
+    scores = saved_state.solver.analyze(board, player)
+    best = np.nanmax(scores)
+    next_move = next(col for col in CENTER_FIRST if scores[col] == best)
+    return np.int8(next_move), saved_state
@@ -0,0 +1,159 @@
+from agents.common import BoardPiece, PlayerAction, NO_PLAYER, PLAYER1, PLAYER2
+from agents.common import BOARD_ROWS, BOARD_COLUMNS, BITBOARD_COLUMN_HEIGHT, BITBOARD_CELLS
+from agents.common import board_to_bitboard, bitboard_connected_four, initialize_game_state
+
+from typing import Optional, List, Tuple
+import numpy as np
+
+COLUMN_MASK = (1 << BOARD_ROWS) - 1
+
+
+class BitBoard(object):
+    """
+    Alternative representation of the game state: one integer per player, used as a 64-bit bitboard
+    (see BITBOARD_CELLS for the bit layout), plus the number of pieces in every column.
+    Moves, win detection and legal move generation only use shifts and masks, so they are much
+    cheaper than the same operations on the (6, 7) ndarray.
+    """
+
+    def __init__(self, player1_pieces: int = 0, player2_pieces: int = 0, heights: Optional[List[int]] = None):
+        self.player1_pieces = player1_pieces
+        self.player2_pieces = player2_pieces
+        self.heights = [0] * BOARD_COLUMNS if heights is None else list(heights)
+
+    @classmethod
+    def from_array(cls, board: np.ndarray) -> 'BitBoard':
+        """
+        Converts an ndarray board into a BitBoard. The conversion is lossless for every board
+        reachable in a game, i.e. in which no piece is floating above an empty cell.
+        :param board: the board state as ndarray
+        :return: the same board state as BitBoard
+        """
+        heights = np.count_nonzero(board != NO_PLAYER, axis=0).tolist()
+        return cls(board_to_bitboard(board, PLAYER1), board_to_bitboard(board, PLAYER2), heights)
+
+    @classmethod
+    def from_key(cls, key: int) -> 'BitBoard':
+        """
+        The inverse of key: a column of height h holds its pieces of PLAYER1 plus 2 ** h - 1 in the key, so the
+        highest set bit of the column plus one is bit h, and the bits below it are the pieces of PLAYER1.
+        :param key: the key of a board
+        :return: the board as BitBoard
+        """
+        player1_pieces = mask = 0
+        heights = []
+        for col in range(BOARD_COLUMNS):
+            column = ((key >> (col * BITBOARD_COLUMN_HEIGHT)) & ((1 << BITBOARD_COLUMN_HEIGHT) - 1)) + 1
+            height = column.bit_length() - 1
+            pieces = (1 << height) - 1
+            player1_pieces |= (column & pieces) << (col * BITBOARD_COLUMN_HEIGHT)
+            mask |= pieces << (col * BITBOARD_COLUMN_HEIGHT)
+            heights.append(height)
+        return cls(player1_pieces, mask ^ player1_pieces, heights)
+
+    def to_array(self) -> np.ndarray:
+        """
+        Converts the BitBoard back into an ndarray board.
+        :return: the board state as ndarray
+        """
+        board = initialize_game_state()
+        board[(BITBOARD_CELLS & np.uint64(self.player1_pieces)) != 0] = PLAYER1
+        board[(BITBOARD_CELLS & np.uint64(self.player2_pieces)) != 0] = PLAYER2
+        return board
+
+    def copy(self) -> 'BitBoard':
+        return BitBoard(self.player1_pieces, self.player2_pieces, self.heights)
+
+    def pieces(self, player: BoardPiece) -> int:
+        """
+        :param player: the player whose pieces are returned
+        :return: the bitboard of the player's pieces
+        """
+        if player == PLAYER1:
+            return self.player1_pieces
+        return self.player2_pieces
+
+    def mask(self) -> int:
+        """
+        :return: the bitboard of all the pieces on the board
+        """
+        return self.player1_pieces | self.player2_pieces
+
+    def can_play(self, action: PlayerAction) -> bool:
+        return self.heights[action] < BOARD_ROWS
+
+    def apply_action(self, action: PlayerAction, player: BoardPiece) -> int:
+        """
+        Drops a piece of `player` in the column `action`.
+        :param action: the column of the move, an integer between (0, 6)
+        :param player: the player making the move
+        :return: the row where the piece landed
+        """
+        action = int(action)
+        row = self.heights[action]
+        if row >= BOARD_ROWS:
+            raise ValueError(f'Column {action} is full')
+        bit = 1 << (action * BITBOARD_COLUMN_HEIGHT + row)
+        if player == PLAYER1:
+            self.player1_pieces |= bit
+        else:
+            self.player2_pieces |= bit
+        self.heights[action] = row + 1
+        return row
+
+    def undo_action(self, action: PlayerAction):
+        """
+        Removes the top piece of the column `action`, i.e. takes back the last move played there.
+        :param action: the column of the move to take back
+        """
+        action = int(action)
+        row = self.heights[action] - 1
+        if row < 0:
+            raise ValueError(f'Column {action} is empty')
+        bit = ~(1 << (action * BITBOARD_COLUMN_HEIGHT + row))
+        self.player1_pieces &= bit
+        self.player2_pieces &= bit
+        self.heights[action] = row
+
+    def connected_four(self, player: BoardPiece) -> bool:
+        return bitboard_connected_four(self.pieces(player))
+
+    def possible_moves(self) -> List[int]:
+        return [col for col in range(BOARD_COLUMNS) if self.heights[col] < BOARD_ROWS]
+
+    def is_full(self) -> bool:
+        return sum(self.heights) == BOARD_ROWS * BOARD_COLUMNS
+
+    def key(self) -> int:
+        """
+        :return: an integer identifying the board: the pieces of PLAYER1 plus all the pieces. A column of height h
+        holds its pieces of PLAYER1 plus 2 ** h - 1, between 2 ** h - 1 and 2 ** (h + 1) - 2, so no two boards have
+        the same key (see from_key), and the key fits in 49 bits.
+        """
+        return self.player1_pieces + (self.player1_pieces | self.player2_pieces)
+
+    def mirror(self) -> 'BitBoard':
+        """
+        :return: a new BitBoard with the board mirrored left to right
+        """
+        player1_pieces = player2_pieces = 0
+        for col in range(BOARD_COLUMNS):
+            shift = (BOARD_COLUMNS - 1 - 2 * col) * BITBOARD_COLUMN_HEIGHT
+            column = COLUMN_MASK << (col * BITBOARD_COLUMN_HEIGHT)
+            if shift >= 0:
+                player1_pieces |= (self.player1_pieces & column) << shift
+                player2_pieces |= (self.player2_pieces & column) << shift
+            else:
+                player1_pieces |= (self.player1_pieces & column) >> -shift
+                player2_pieces |= (self.player2_pieces & column) >> -shift
+        return BitBoard(player1_pieces, player2_pieces, self.heights[::-1])
+
+    def canonical_key(self) -> Tuple[int, bool]:
+        """
+        A board and its mirror image have the same value and mirrored best moves, so they share one key.
+        :return: the smaller of the keys of the board and of its mirror image, and whether it is the mirror's
+        """
+        key, mirror_key = self.key(), self.mirror().key()
+        if mirror_key < key:
+            return mirror_key, True
+        return key, False
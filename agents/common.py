@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, Callable, Tuple
+from typing import Optional, Callable, Tuple, Sequence, List
 import numpy as np
 
 BoardPiece = np.int8  # The data type (dtype) of the board
@@ -11,11 +11,38 @@ BoardPiece_Print = str  # dtype for string representation of BoardPiece
 NO_PLAYER_PRINT = str(' ')
 PLAYER1_PRINT = str('X')
 PLAYER2_PRINT = str('O')
+# maps the bytes of a board to the prints of its pieces
+PIECE_PRINTS = bytes.maketrans(bytes([NO_PLAYER, PLAYER1, PLAYER2]),
+                               (NO_PLAYER_PRINT + PLAYER1_PRINT + PLAYER2_PRINT).encode())
+# and the reverse, any other character being an empty cell
+PRINT_PIECES = bytes(PLAYER1 if c == ord(PLAYER1_PRINT) else PLAYER2 if c == ord(PLAYER2_PRINT) else NO_PLAYER
+                     for c in range(256))
 
 PlayerAction = np.int8  # The column to be played
 
+BOARD_ROWS = 6
+BOARD_COLUMNS = 7
+# Bit layout of a bitboard: the cell board[row, col] is bit (col * BITBOARD_COLUMN_HEIGHT + row). Every column
+# holds one extra (always empty) bit on top, so that shifting a line of pieces never wraps into the next column.
+BITBOARD_COLUMN_HEIGHT = BOARD_ROWS + 1
+BITBOARD_CELLS = np.array(
+    [[1 << (col * BITBOARD_COLUMN_HEIGHT + row) for col in range(BOARD_COLUMNS)] for row in range(BOARD_ROWS)],
+    dtype=np.uint64,
+)
+# shifts that move a piece to its neighbour: vertical, horizontal, main diagonal, second diagonal
+BITBOARD_DIRECTIONS = (1, BITBOARD_COLUMN_HEIGHT, BITBOARD_COLUMN_HEIGHT + 1, BITBOARD_COLUMN_HEIGHT - 1)
+CENTER_FIRST = (3, 2, 4, 1, 5, 0, 6)  # the central columns are part of more windows, so they are usually better
+# the output of pretty_print_board, with a field per cell, from the top row down
+BOARD_TEMPLATE = '|==============|\n' + ('|' + '{} ' * BOARD_COLUMNS + '|\n') * BOARD_ROWS + \
+                 '|==============|\n|0 1 2 3 4 5 6 |'
+
 
 class SavedState:
+    """
+    The information an agent keeps from one of its moves to the next. generate_move receives the
+    state it returned at the previous move of the same player (None at the first move) and returns
+    the state for the next one. Agents subclass it for the data they keep.
+    """
     pass
 
 
@@ -24,6 +51,13 @@ GenMove = Callable[
     Tuple[PlayerAction, Optional[SavedState]]  # Return type of the generate_move function
 ]
 
+# The batch version of GenMove, answering many games at once: the boards have shape (N, 6, 7), the players
+# shape (N,) and the saved states are one per game (None for all of them at the first move).
+GenMoves = Callable[
+    [np.ndarray, np.ndarray, Optional[Sequence[Optional[SavedState]]]],  # Arguments for the generate_moves function
+    Tuple[np.ndarray, List[Optional[SavedState]]]  # Return type of the generate_moves function
+]
+
 
 class GameState(Enum):
     IS_WIN = 1
@@ -60,22 +94,7 @@ def pretty_print_board(board: np.ndarray) -> str:
     :return: string corresponding to board state
     """
 
-    board_str = "|==============|\n"
-
-    for i in range(5, -1, -1):
-        board_str = board_str + '|'
-        for j in range(7):
-            if board[i, j] == PLAYER1:
-                board_str = board_str + PLAYER1_PRINT + ' '
-            elif board[i, j] == PLAYER2:
-                board_str = board_str + PLAYER2_PRINT + ' '
-            else:
-                board_str = board_str + NO_PLAYER_PRINT + ' '
-        board_str = board_str + '|\n'
-    board_str = board_str + "|==============|\n"
-    board_str = board_str + "|0 1 2 3 4 5 6 |"
-
-    return board_str
+    return BOARD_TEMPLATE.format(*board[::-1].astype(BoardPiece).tobytes().translate(PIECE_PRINTS).decode())
 
 
 def string_to_board(pp_board: str) -> np.ndarray:
@@ -88,24 +107,10 @@ def string_to_board(pp_board: str) -> np.ndarray:
     """
 
     start_index = pp_board.find('=|\n') + len('=|\n')
-    elements_nr = 6 * (2 * 7 + 2)
-    board_str = pp_board[start_index: start_index + elements_nr + 4]
-    board_str = board_str.replace("|", "")
-    board_str = board_str.replace("\n", "")
-
-    board = initialize_game_state()
-    string_index = 0
-    for i in range(5, -1, -1):
-        for j in range(7):
-            if board_str[string_index] == PLAYER1_PRINT:
-                board[i, j] = PLAYER1
-            elif board_str[string_index] == PLAYER2_PRINT:
-                board[i, j] = PLAYER2
-            else:
-                board[i, j] = NO_PLAYER
-            string_index += 2
-
-    return board
+    line_length = 2 * BOARD_COLUMNS + 3  # the borders, a piece and a space per column, the end of line
+    cells = ''.join([pp_board[start_index + i * line_length + 1: start_index + (i + 1) * line_length - 2: 2]
+                     for i in range(BOARD_ROWS - 1, -1, -1)])
+    return np.frombuffer(cells.encode().translate(PRINT_PIECES), BoardPiece).reshape(BOARD_ROWS, BOARD_COLUMNS).copy()
 
 
 def apply_player_action(
@@ -120,14 +125,12 @@ def apply_player_action(
     :param copy: flag that copies the board before the action
     :return: board state after the action was made by the player
     """
-    action = np.int(action)
-    if np.int(action) < 0 or np.int(action) > 6:
+    action = int(action)
+    if action < 0 or action > 6:
         raise ValueError
-    i = 0
-    while i <= 5 and board[i, action] != 0:
-        i += 1
-    if i <= 5:
-        row = i
+    empty_rows = np.flatnonzero(board[:, action] == NO_PLAYER)
+    if len(empty_rows) > 0:
+        row = empty_rows[0]
         col = action
     else:
         return board
@@ -180,35 +183,54 @@ def connected_four(
     Returns True if there are four adjacent pieces equal to `player` arranged
     in either a horizontal, vertical, or diagonal line. Returns False otherwise.
     If desired, the last action taken (i.e. last column played) can be provided
-    for potential speed optimisation.
+    for potential speed optimisation: then the player can only have won with the top piece
+    of that column, assuming that no four were connected before that move.
     :param board: the current state of the board
     :param player: the player who checks if they have 4 piesces connected
-    :param last_action:
+    :param last_action: the last column played, or None for checking the whole board
     :return: boolean that says if there are 4 connected pieces
     """
 
-    for i in range(6):
-        if connected_four_line(board[i, :], player):
-            return True
+    if not bitboard_connected_four(board_to_bitboard(board, player)):
+        return False
+    # the only four can be the one made by the last move, which the player made if they own its piece
+    return last_action is None or top_piece(board, last_action) == player
 
-    for j in range(7):
-        if connected_four_line(board[:, j], player):
-            return True
 
-    # main diagonals orientation
-    main_diagonals = generate_main_diagonals(board)
+def top_piece(board: np.ndarray, action: PlayerAction) -> BoardPiece:
+    """
+    :param board: the board state as ndarray
+    :param action: a column
+    :return: the top piece of the column, NO_PLAYER if it is empty
+    """
+    column = board[:, int(action)]
+    height = np.count_nonzero(column)  # the pieces are stacked from row 0, and NO_PLAYER is 0
+    return column[height - 1] if height else NO_PLAYER
 
-    for d in main_diagonals:
-        if connected_four_line(np.array(d), player):
-            return True
 
-    # second diagonal orientation
-    second_diagonals = generate_second_diagnals(board)
+def board_to_bitboard(board: np.ndarray, player: BoardPiece) -> int:
+    """
+    Encodes the pieces of `player` as a bitboard: an integer in which the bit
+    (col * BITBOARD_COLUMN_HEIGHT + row) is set if board[row, col] == player.
+    :param board: the board state as ndarray
+    :param player: the player whose pieces are encoded
+    :return: the bitboard of the player's pieces
+    """
+    return int(np.dot(BITBOARD_CELLS.ravel(), (board == player).ravel()))
 
-    for d in second_diagonals:
-        if connected_four_line(np.array(d), player):
-            return True
 
+def bitboard_connected_four(pieces: int) -> bool:
+    """
+    Returns True if the bitboard `pieces` contains four adjacent pieces in a horizontal, vertical or diagonal line.
+    For every direction, the pieces having a neighbour are found with one shift; the pieces starting a pair of
+    such pairs are the starts of a line of four.
+    :param pieces: the bitboard of one player's pieces
+    :return: boolean that says if there are 4 connected pieces
+    """
+    for shift in BITBOARD_DIRECTIONS:
+        pairs = pieces & (pieces >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
     return False
 
 
@@ -239,21 +261,28 @@ def check_end_state(
     Returns the current game state for the current `player`, i.e. has their last
     action won (GameState.IS_WIN) or drawn (GameState.IS_DRAW) the game,
     or is play still on-going (GameState.STILL_PLAYING)?
+    If the last action is provided, only the player who made it, the owner of the top
+    piece of that column, can have won (see connected_four).
     :param board: current state of the board
     :param player: player that requires the state check
-    :param last_action:
+    :param last_action: the last column played, or None for checking the whole board
     :return: the GameState
     """
 
-    if connected_four(board, player):
-        return GameState.IS_WIN
-    if player == PLAYER1:
-        opponent = PLAYER2
+    if last_action is not None:
+        last_player = top_piece(board, last_action)
+        if last_player != NO_PLAYER and bitboard_connected_four(board_to_bitboard(board, last_player)):
+            return GameState.IS_WIN if last_player == player else GameState.IS_LOST
     else:
-        opponent = PLAYER1
-    if connected_four(board, opponent):
-        return GameState.IS_LOST
-    if NO_PLAYER in board:
+        if connected_four(board, player):
+            return GameState.IS_WIN
+        if player == PLAYER1:
+            opponent = PLAYER2
+        else:
+            opponent = PLAYER1
+        if connected_four(board, opponent):
+            return GameState.IS_LOST
+    if np.count_nonzero(board[-1]) < BOARD_COLUMNS:  # the board is full when its top row is
         return GameState.STILL_PLAYING
     return GameState.IS_DRAW
 
@@ -275,8 +304,4 @@ def possible_moves(board: np.ndarray):
     :param board: the current board
     :return: a list of legal moves
     """
-    next_move = []
-    for i in range(7):
-        if np.any(board[:, i] == NO_PLAYER):
-            next_move.append(i)
-    return next_move
+    return np.flatnonzero(np.any(board == NO_PLAYER, axis=0)).tolist()
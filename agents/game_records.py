@@ -0,0 +1,175 @@
+from agents.common import BoardPiece, PlayerAction, NO_PLAYER, PLAYER1, PLAYER2
+from agents.common import BOARD_ROWS, BOARD_COLUMNS, BITBOARD_COLUMN_HEIGHT, BITBOARD_CELLS
+from agents.bitboard import BitBoard
+
+from typing import Optional, NamedTuple, Iterator, Sequence
+import os
+import numpy as np
+
+RECORDS_MAGIC = b'C4GR'
+RECORDS_VERSION = 1
+RECORDS_HEADER = np.dtype([('magic', 'S4'), ('version', '<u4')])
+GAME_HEADER = np.dtype([('moves', 'u1'), ('winner', 'i1'), ('flags', 'u1')])
+GAME_TIMES = 1  # flag of the games stored with the time of every move
+# UNPACKED_MOVES[byte] are the two moves packed in a byte by pack_moves
+UNPACKED_MOVES = np.stack([np.arange(256) & 15, np.arange(256) >> 4], axis=1).astype(np.uint8)
+
+# DECODED_COLUMNS[code] are the pieces of a column, from the bottom up, whose code in a position key is `code`
+# (see BitBoard.key); the codes above 2 ** 7 - 2 are not used
+_COLUMN_CODE_BITS = (1 << BITBOARD_COLUMN_HEIGHT) - 1
+_COLUMN_SHIFTS = (np.arange(BOARD_COLUMNS) * BITBOARD_COLUMN_HEIGHT).astype(np.uint64)
+DECODED_COLUMNS = np.zeros((_COLUMN_CODE_BITS + 1, BOARD_ROWS), BoardPiece)
+for _code in range(_COLUMN_CODE_BITS):
+    _height = (_code + 1).bit_length() - 1
+    for _row in range(_height):
+        DECODED_COLUMNS[_code, _row] = PLAYER1 if (_code + 1) >> _row & 1 else PLAYER2
+
+
+def encode_positions(boards: np.ndarray) -> np.ndarray:
+    """
+    Encodes boards into 64-bit keys, the keys of BitBoard: the pieces of PLAYER1 plus all the pieces, which also
+    give the height of every column. Only the boards reachable in a game, without floating pieces, are encoded.
+    :param boards: the board states, shape (N, 6, 7)
+    :return: the keys, shape (N,) and dtype uint64
+    """
+    boards = np.asarray(boards)
+    player1_pieces = np.where(boards == PLAYER1, BITBOARD_CELLS, np.uint64(0)).sum(axis=(1, 2), dtype=np.uint64)
+    pieces = np.where(boards != NO_PLAYER, BITBOARD_CELLS, np.uint64(0)).sum(axis=(1, 2), dtype=np.uint64)
+    return player1_pieces + pieces
+
+
+def decode_positions(keys: np.ndarray) -> np.ndarray:
+    """
+    The inverse of encode_positions.
+    :param keys: the keys, shape (N,)
+    :return: the board states, shape (N, 6, 7)
+    """
+    keys = np.asarray(keys, np.uint64)
+    codes = (keys[:, None] >> _COLUMN_SHIFTS) & np.uint64(_COLUMN_CODE_BITS)
+    return DECODED_COLUMNS[codes.astype(np.intp)].transpose(0, 2, 1).copy()
+
+
+def position_keys(moves: Sequence[int]) -> np.ndarray:
+    """
+    :param moves: the moves of a game from the empty board, PLAYER1 playing first
+    :return: the keys of the positions of the game, from the empty board to the last move, shape (len(moves) + 1,)
+    """
+    bitboard = BitBoard()
+    keys = [bitboard.key()]
+    for ply, move in enumerate(moves):
+        bitboard.apply_action(PlayerAction(move), PLAYER1 if ply % 2 == 0 else PLAYER2)
+        keys.append(bitboard.key())
+    return np.array(keys, np.uint64)
+
+
+def pack_moves(moves: np.ndarray) -> bytes:
+    """
+    :param moves: the columns played, shape (n,) and dtype uint8
+    :return: the moves packed two per byte, the first one in the low half, (n + 1) // 2 bytes
+    """
+    padded = np.zeros(len(moves) + len(moves) % 2, np.uint8)
+    padded[:len(moves)] = moves
+    return (padded[0::2] | padded[1::2] << 4).tobytes()
+
+
+def unpack_moves(packed: bytes, n_moves: int) -> np.ndarray:
+    """
+    The inverse of pack_moves.
+    """
+    return UNPACKED_MOVES[np.frombuffer(packed, np.uint8)].ravel()[:n_moves]
+
+
+def read_records_header(f, path: str):
+    """
+    Reads the header of a records file, and checks that it is one.
+    """
+    header = np.frombuffer(f.read(RECORDS_HEADER.itemsize), RECORDS_HEADER)
+    if len(header) == 0 or header[0]['magic'] != RECORDS_MAGIC:
+        raise ValueError(f'{path} is not a game records file')
+    if header[0]['version'] != RECORDS_VERSION:
+        raise ValueError(f'{path} has version {header[0]["version"]} of the game records, not {RECORDS_VERSION}')
+
+
+class GameRecord(NamedTuple):
+    """
+    A game played from the empty board, PLAYER1 playing first: its moves, its winner (NO_PLAYER for a draw or an
+    unfinished game) and the time of every move in seconds, if known.
+    """
+    moves: np.ndarray
+    winner: BoardPiece
+    times: Optional[np.ndarray] = None
+
+
+class GameRecordWriter(object):
+    """
+    Appends games to a records file. The file starts with a header (magic, version), followed by the games, each
+    with a header (number of moves, winner, flags), the moves packed two per byte, and with the GAME_TIMES flag the
+    time of every move as little-endian float32. Games are only ever appended, so a file can be read while it is
+    being written, and the files of several runs can be concatenated by skipping the headers after the first one.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: the records file, created if it doesn't exist; the games are appended to an existing one
+        """
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                read_records_header(f, path)
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(np.array([(RECORDS_MAGIC, RECORDS_VERSION)], RECORDS_HEADER).tobytes())
+
+    def write(self, moves: Sequence[int], winner: BoardPiece = NO_PLAYER, times: Optional[Sequence[float]] = None):
+        """
+        Appends a game (see GameRecord).
+        :param moves: the columns played, from the empty board
+        :param winner: the winner of the game, NO_PLAYER for a draw or an unfinished game
+        :param times: the time of every move in seconds, None for not storing them
+        """
+        moves = np.asarray(moves, np.uint8)
+        if len(moves) > BOARD_ROWS * BOARD_COLUMNS or np.any(moves >= BOARD_COLUMNS):
+            raise ValueError(f'a game has at most {BOARD_ROWS * BOARD_COLUMNS} moves between 0 and '
+                             f'{BOARD_COLUMNS - 1}')
+        if times is not None and len(times) != len(moves):
+            raise ValueError('a game needs one time per move')
+        flags = 0 if times is None else GAME_TIMES
+        self.file.write(np.array([(len(moves), winner, flags)], GAME_HEADER).tobytes())
+        self.file.write(pack_moves(moves))
+        if times is not None:
+            self.file.write(np.asarray(times, '<f4').tobytes())
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self) -> 'GameRecordWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_game_records(path: str) -> Iterator[GameRecord]:
+    """
+    Reads the games of a records file lazily, one at a time, so files of any size can be streamed.
+    :param path: the records file
+    :return: an iterator over the games, in the order they were written
+    """
+    with open(path, 'rb') as f:
+        read_records_header(f, path)
+        while True:
+            header_bytes = f.read(GAME_HEADER.itemsize)
+            if not header_bytes:
+                return
+            if len(header_bytes) < GAME_HEADER.itemsize:
+                raise ValueError(f'{path} ends with a truncated game')
+            n_moves, winner, flags = np.frombuffer(header_bytes, GAME_HEADER)[0].tolist()
+            size = (n_moves + 1) // 2 + (4 * n_moves if flags & GAME_TIMES else 0)
+            data = f.read(size)
+            if len(data) < size:
+                raise ValueError(f'{path} ends with a truncated game')
+            moves = unpack_moves(data[:(n_moves + 1) // 2], n_moves)
+            times = np.frombuffer(data[(n_moves + 1) // 2:], '<f4') if flags & GAME_TIMES else None
+            yield GameRecord(moves, BoardPiece(winner), times)
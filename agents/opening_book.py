@@ -0,0 +1,151 @@
+from agents.common import PlayerAction, BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, BOARD_COLUMNS
+from agents.bitboard import BitBoard
+
+from typing import Optional, Union, Dict
+import functools
+import os
+import numpy as np
+
+BOOK_MAGIC = b'C4BK'
+BOOK_HEADER = np.dtype([('magic', 'S4'), ('plies', '<u4'), ('size', '<u4')])
+DEFAULT_BOOK = os.path.join(os.path.dirname(__file__), 'opening_book.bin')
+
+
+class OpeningBook(object):
+    """
+    The best moves of all the positions of the first plies of the game, precomputed by build_opening_book.
+    A position and its mirror image share one entry, under the smaller of their keys (see BitBoard.canonical_key).
+    The entries are kept as two arrays sorted by key, so a lookup is a binary search.
+    The file format is a header (magic, plies, size), then the keys as little-endian uint64, then the moves as uint8.
+    """
+
+    def __init__(self, keys: np.ndarray, moves: np.ndarray, plies: int):
+        order = np.argsort(keys)
+        self.keys = np.asarray(keys, np.uint64)[order]
+        self.moves = np.asarray(moves, np.uint8)[order]
+        self.plies = plies
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, board: np.ndarray) -> Optional[PlayerAction]:
+        """
+        :param board: the current board state
+        :return: the best move of the board, None if the board is not in the book
+        """
+        if np.count_nonzero(board != NO_PLAYER) > self.plies:
+            return None
+        key, mirrored = BitBoard.from_array(board).canonical_key()
+        index = np.searchsorted(self.keys, np.uint64(key))
+        if index == len(self.keys) or self.keys[index] != key:
+            return None
+        move = int(self.moves[index])
+        return PlayerAction(BOARD_COLUMNS - 1 - move if mirrored else move)
+
+    def save(self, path: str):
+        header = np.array([(BOOK_MAGIC, self.plies, len(self.keys))], BOOK_HEADER)
+        with open(path, 'wb') as f:
+            f.write(header.tobytes())
+            f.write(self.keys.astype('<u8').tobytes())
+            f.write(self.moves.tobytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'OpeningBook':
+        with open(path, 'rb') as f:
+            header = np.frombuffer(f.read(BOOK_HEADER.itemsize), BOOK_HEADER)[0]
+            if header['magic'] != BOOK_MAGIC:
+                raise ValueError(f'{path} is not an opening book')
+            size = int(header['size'])
+            keys = np.frombuffer(f.read(8 * size), '<u8')
+            moves = np.frombuffer(f.read(size), np.uint8)
+        return cls(keys, moves, int(header['plies']))
+
+
+@functools.lru_cache(maxsize=None)
+def load_opening_book(path: str = DEFAULT_BOOK) -> Optional[OpeningBook]:
+    """
+    Loads a book once per process.
+    :param path: the book file
+    :return: the book, None if the file doesn't exist
+    """
+    if not os.path.exists(path):
+        return None
+    return OpeningBook.load(path)
+
+
+def book_move(board: np.ndarray, opening_book: Union[OpeningBook, str, None]) -> Optional[PlayerAction]:
+    """
+    Looks up the board in the opening book given to an agent.
+    :param board: the current board state
+    :param opening_book: the book, or the path of its file, or None for no book
+    :return: the best move of the board, None if the board is not in the book
+    """
+    if isinstance(opening_book, str):
+        opening_book = load_opening_book(opening_book)
+    if opening_book is None:
+        return None
+    return opening_book.lookup(board)
+
+
+def book_positions(plies: int) -> Dict[int, BitBoard]:
+    """
+    Enumerates the positions of the first plies of the game, one per pair of mirror images.
+    No game is over before the 7th ply, so they are all still playing up to there.
+    :param plies: the maximal number of pieces on the board
+    :return: the positions by canonical key
+    """
+    level = {BitBoard().key(): BitBoard()}
+    positions = dict(level)
+    for ply in range(plies):
+        player = PLAYER1 if ply % 2 == 0 else PLAYER2
+        next_level = {}
+        for bitboard in level.values():
+            if bitboard.connected_four(PLAYER1) or bitboard.connected_four(PLAYER2):
+                continue
+            for move in bitboard.possible_moves():
+                child = bitboard.copy()
+                child.apply_action(move, player)
+                key, mirrored = child.canonical_key()
+                if key not in next_level:
+                    next_level[key] = child.mirror() if mirrored else child
+        positions.update(next_level)
+        level = next_level
+    return positions
+
+
+def build_opening_book(plies: int, depth: int = 8, verbose: bool = False) -> OpeningBook:
+    """
+    Precomputes the best moves of all the positions up to `plies` pieces with the minimax agent.
+    :param plies: the maximal number of pieces on the board of the positions
+    :param depth: the depth of the minimax search of every position
+    :param verbose: print the progress
+    :return: the new book
+    """
+    from agents.agent_minimax.minimax import generate_move_minimax
+
+    positions = book_positions(plies)
+    keys = np.empty(len(positions), np.uint64)
+    moves = np.empty(len(positions), np.uint8)
+    saved_state = None
+    for i, (key, bitboard) in enumerate(positions.items()):
+        board = bitboard.to_array()
+        player: BoardPiece = PLAYER1 if sum(bitboard.heights) % 2 == 0 else PLAYER2
+        move, saved_state = generate_move_minimax(board, player, saved_state, depth, opening_book=None,
+                                                  solver_empty_cells=0)
+        keys[i], moves[i] = key, move
+        if verbose and (i + 1) % 100 == 0:
+            print(f'{i + 1}/{len(positions)} positions')
+    return OpeningBook(keys, moves, plies)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Precomputes the opening book of the agents.')
+    parser.add_argument('--plies', type=int, default=4, help='the maximal number of pieces of the positions')
+    parser.add_argument('--depth', type=int, default=8, help='the depth of the minimax search of every position')
+    parser.add_argument('--output', default=DEFAULT_BOOK, help='the book file')
+    args = parser.parse_args()
+    book = build_opening_book(args.plies, args.depth, verbose=True)
+    book.save(args.output)
+    print(f'{len(book)} positions written to {args.output}')
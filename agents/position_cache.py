@@ -0,0 +1,137 @@
+from agents.common import PlayerAction, BOARD_COLUMNS
+from agents.bitboard import BitBoard
+
+from typing import Optional, Tuple
+import os
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # no file locks on Windows: the writes are only safe from a single process there
+    fcntl = None
+
+CACHE_MAGIC = b'C4PC'
+CACHE_HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('slots', '<u8')])
+CACHE_VERSION = 1
+SLOT_BYTES = 16
+VALID = 1 << 48  # set in the data of every stored entry, so that an empty slot (all zeros) never matches
+
+
+def pack_entry(value: int, move: int, depth: int) -> int:
+    """
+    Packs an entry into the 64 bit data word of a slot: the value in bits 0-31 (two's complement),
+    the move in bits 32-39, the depth in bits 40-47 and the valid flag in bit 48.
+    """
+    return (value & 0xFFFFFFFF) | ((move & 0xFF) << 32) | ((depth & 0xFF) << 40) | VALID
+
+
+def unpack_entry(data: int) -> Tuple[int, int, int]:
+    """
+    :return: (value, move, depth) of a data word packed by pack_entry
+    """
+    value = data & 0xFFFFFFFF
+    if value >= 1 << 31:
+        value -= 1 << 32
+    return value, (data >> 32) & 0xFF, (data >> 40) & 0xFF
+
+
+class PositionCache(object):
+    """
+    Persistent position -> (value, best move, depth) store, shared by all the processes opening the same file.
+    The file is a fixed-size hash table mapped into memory with numpy.memmap, so lookups don't copy it and the
+    pages are shared between the processes by the operating system.
+    Positions are keyed by BitBoard.canonical_key, so a position and its mirror image share one entry; the moves
+    are stored in the canonical orientation and mirrored back on lookup. The value is the score for the player to
+    move, as computed by the agent that stored it, and the depth is the depth of its search.
+    Every key maps to one slot of two 64 bit words: the data and the check, which is key ^ data. Readers don't lock:
+    a slot being written by another process has a check not matching its data and is read as a miss.
+    Writers lock the slot with fcntl and keep the entry searched deeper.
+    """
+
+    def __init__(self, path: str, slots: int = 2 ** 20):
+        """
+        Opens the cache file, or creates it with `slots` empty slots.
+        :param path: the cache file
+        :param slots: the number of slots of a new file; an existing file keeps its own
+        """
+        self.path = path
+        with open(path, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.lockf(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    f.write(np.array([(CACHE_MAGIC, CACHE_VERSION, slots)], CACHE_HEADER).tobytes())
+                    f.truncate(CACHE_HEADER.itemsize + slots * SLOT_BYTES)
+                f.seek(0)
+                header = np.frombuffer(f.read(CACHE_HEADER.itemsize), CACHE_HEADER)[0]
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(f, fcntl.LOCK_UN)
+        if header['magic'] != CACHE_MAGIC or header['version'] != CACHE_VERSION:
+            raise ValueError(f'{path} is not a position cache')
+        self.slots = int(header['slots'])
+        # column 0 is the data, column 1 the check
+        self.table = np.memmap(path, np.uint64, 'r+', CACHE_HEADER.itemsize, (self.slots, 2))
+        self.file = open(path, 'r+b')
+
+    def close(self):
+        self.table.flush()
+        self.file.close()
+        del self.table
+
+    def probe_key(self, key: int) -> Optional[Tuple[int, int, int]]:
+        """
+        :param key: the canonical key of a position
+        :return: (value, move, depth) of the stored entry, None if the position is not stored
+        """
+        data, check = self.table[key % self.slots].tolist()
+        if not data & VALID or data ^ check != key:
+            return None
+        return unpack_entry(data)
+
+    def store_key(self, key: int, value: int, move: int, depth: int):
+        """
+        Stores an entry, unless its slot holds an entry searched deeper.
+        :param key: the canonical key of a position
+        :param value: the score of the position for the player to move
+        :param move: the best move, in the canonical orientation
+        :param depth: the depth of the search, at most 255
+        """
+        slot = key % self.slots
+        offset = CACHE_HEADER.itemsize + slot * SLOT_BYTES
+        if fcntl is not None:
+            fcntl.lockf(self.file, fcntl.LOCK_EX, SLOT_BYTES, offset)
+        try:
+            old_data, old_check = self.table[slot].tolist()
+            if old_data & VALID and unpack_entry(old_data)[2] > depth:
+                return
+            data = pack_entry(value, move, min(depth, 0xFF))
+            self.table[slot, 0] = data
+            self.table[slot, 1] = data ^ key
+        finally:
+            if fcntl is not None:
+                fcntl.lockf(self.file, fcntl.LOCK_UN, SLOT_BYTES, offset)
+
+    def probe(self, board: np.ndarray) -> Optional[Tuple[int, PlayerAction, int]]:
+        """
+        :param board: a board state
+        :return: (value, move, depth) of the stored entry, with the move for `board`; None if the board is not stored
+        """
+        key, mirrored = BitBoard.from_array(board).canonical_key()
+        entry = self.probe_key(key)
+        if entry is None:
+            return None
+        value, move, depth = entry
+        return value, PlayerAction(BOARD_COLUMNS - 1 - move if mirrored else move), depth
+
+    def store(self, board: np.ndarray, value: int, move: PlayerAction, depth: int):
+        """
+        :param board: a board state
+        :param value: the score of the board for the player to move
+        :param move: the best move of the board
+        :param depth: the depth of the search
+        """
+        key, mirrored = BitBoard.from_array(board).canonical_key()
+        move = int(move)
+        self.store_key(key, int(value), BOARD_COLUMNS - 1 - move if mirrored else move, depth)
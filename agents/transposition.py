@@ -0,0 +1,90 @@
+from typing import Optional, Tuple
+import numpy as np
+
+# bound types of a stored value
+EXACT = 0  # the value is the exact minimax value of the position
+LOWER_BOUND = 1  # the search failed high (beta cut-off): the exact value is at least the stored value
+UPPER_BOUND = 2  # the search failed low: the exact value is at most the stored value
+
+
+class TranspositionTable(object):
+    """
+    Bounded hash table storing the results of previous searches (of minimax and of the solver), so that positions
+    reached through a different move order are not searched again.
+    The entries live in preallocated arrays whose total size is given by `memory_bytes`. Every key maps to
+    one slot; when two keys collide, the replacement policy decides which entry is kept:
+    'depth' keeps the entry searched deeper (ties go to the new one), 'always' keeps the newest entry.
+    """
+    ENTRY_BYTES = 8 + 8 + 2 + 1 + 1  # key, value, depth, bound type, best move
+
+    def __init__(self, memory_bytes: int = 2 ** 24, replacement: str = 'depth'):
+        if replacement not in ('depth', 'always'):
+            raise ValueError(f'Unknown replacement policy {replacement}')
+        self.replacement = replacement
+        self.size = max(1, memory_bytes // self.ENTRY_BYTES)
+        self.keys = np.zeros(self.size, np.uint64)
+        self.values = np.zeros(self.size, np.float64)
+        self.depths = np.full(self.size, -1, np.int16)  # -1 marks an empty slot
+        self.bounds = np.zeros(self.size, np.int8)
+        self.moves = np.full(self.size, -1, np.int8)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+        self.rejections = 0
+
+    def probe(self, key: int) -> Optional[Tuple[int, float, int, int]]:
+        """
+        Looks up a position in the table.
+        :param key: the hash of the position
+        :return: (depth, value, bound type, best move) of the stored entry, None if the position is not stored
+        """
+        slot = key % self.size
+        depth = int(self.depths[slot])
+        if depth < 0 or int(self.keys[slot]) != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return depth, float(self.values[slot]), int(self.bounds[slot]), int(self.moves[slot])
+
+    def store(self, key: int, depth: int, value: float, bound: int, move: int = -1):
+        """
+        Stores the result of a search, unless the replacement policy keeps the entry already in the slot.
+        :param key: the hash of the position
+        :param depth: the depth the position was searched at
+        :param value: the value found by the search
+        :param bound: the bound type of the value (EXACT, LOWER_BOUND or UPPER_BOUND)
+        :param move: the best move found by the search, -1 if unknown
+        """
+        slot = key % self.size
+        stored_depth = int(self.depths[slot])
+        if stored_depth >= 0 and int(self.keys[slot]) != key:
+            if self.replacement == 'depth' and stored_depth > depth:
+                self.rejections += 1
+                return
+            self.replacements += 1
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.depths[slot] = depth
+        self.bounds[slot] = bound
+        self.moves[slot] = move
+        self.stores += 1
+
+    def clear(self):
+        self.depths.fill(-1)
+
+    def stats(self) -> dict:
+        """
+        :return: the usage statistics of the table, for sizing it to the search depth
+        """
+        probes = self.hits + self.misses
+        return {
+            'size': self.size,
+            'filled': int(np.count_nonzero(self.depths >= 0)),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / probes if probes else 0.,
+            'stores': self.stores,
+            'replacements': self.replacements,
+            'rejections': self.rejections,
+        }
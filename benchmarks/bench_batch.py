@@ -0,0 +1,61 @@
+import time
+from typing import Sequence
+
+import numpy as np
+
+from agents.common import PLAYER1, PLAYER2, BoardPiece, initialize_game_state, apply_player_action
+from agents.common import check_end_state, possible_moves, GameState
+from agents.agent_minimax.minimax import generate_move_minimax
+from agents.agent_minimax.batch import generate_moves_minimax
+from agents.agent_mcts.mcts import generate_move_mcts
+from agents.agent_mcts.batch import generate_moves_mcts
+
+
+def random_positions(n_boards: int, n_moves: int = 10, seed: int = 0):
+    """
+    :return: n_boards boards reached by n_moves random moves in running games, and the players to move
+    """
+    rng = np.random.default_rng(seed)
+    boards = []
+    while len(boards) < n_boards:
+        board = initialize_game_state()
+        for ply in range(n_moves):
+            player = PLAYER1 if ply % 2 == 0 else PLAYER2
+            move = rng.choice(possible_moves(board))
+            apply_player_action(board, move, player)
+            if check_end_state(board, player, move) != GameState.STILL_PLAYING:
+                break
+        else:
+            boards.append(board)
+    players = np.full(n_boards, PLAYER1 if n_moves % 2 == 0 else PLAYER2, BoardPiece)
+    return np.stack(boards), players
+
+
+def bench_batch(batch_sizes: Sequence[int] = (1, 10, 100), depth: int = 4, trials: int = 200) -> dict:
+    """
+    Measures the moves per second of the batch move generation against one call per board, for the minimax agent
+    (with `depth`) and the MCTS agent (with `trials` simulations per move).
+    :return: for every agent and batch size, the moves per second of the separate calls and of the batch
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        boards, players = random_positions(batch_size)
+        for name, generate_move, generate_moves, kwargs in (
+                ('minimax', generate_move_minimax, generate_moves_minimax, {'depth': depth}),
+                ('mcts', generate_move_mcts, generate_moves_mcts, {'trials': trials})):
+            t0 = time.perf_counter()
+            for board, player in zip(boards, players):
+                generate_move(board, player, None, opening_book=None, **kwargs)
+            single = batch_size / (time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            generate_moves(boards, players, None, opening_book=None, **kwargs)
+            batch = batch_size / (time.perf_counter() - t0)
+            results[name, batch_size] = single, batch
+    return results
+
+
+if __name__ == "__main__":
+    moves = bench_batch()
+    print("agent    batch  single moves/s  batch moves/s  speedup")
+    for (name, batch_size), (single, batch) in moves.items():
+        print(f"{name:7s}  {batch_size:5d}  {single:14.1f}  {batch:13.1f}  {batch / single:7.2f}")
@@ -0,0 +1,44 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence
+
+import numpy as np
+
+from agents.common import PLAYER1, initialize_game_state
+from agents.agent_mcts.mcts import mcts_algorithm, parallel_mcts_algorithm
+
+
+def bench_mcts_parallel(time_budget: float = 2., worker_counts: Optional[Sequence[int]] = None) -> dict:
+    """
+    Measures the playouts per second of the root-parallel MCTS from the empty board, for a growing number of
+    worker processes. The pools are started before the measurement, so only the search itself is timed.
+    :param time_budget: the time in seconds every search may take
+    :param worker_counts: the numbers of workers to measure, powers of 2 up to the number of cores if None
+    :return: the playouts per second for every number of workers (1 is the single process search)
+    """
+    board = initialize_game_state()
+    if worker_counts is None:
+        worker_counts = [2 ** i for i in range(int(np.log2(os.cpu_count() or 1)) + 1)]
+
+    t0 = time.perf_counter()
+    _, simulations = mcts_algorithm(board, PLAYER1, None, time_budget=time_budget)
+    results = {1: simulations / (time.perf_counter() - t0)}
+
+    for workers in worker_counts:
+        if workers == 1:
+            continue
+        with ProcessPoolExecutor(workers) as executor:
+            list(executor.map(abs, range(workers)))  # starts the processes
+            t0 = time.perf_counter()
+            _, _, simulations = parallel_mcts_algorithm(board, PLAYER1, None, time_budget, workers, seed=0,
+                                                        executor=executor)
+            results[workers] = simulations / (time.perf_counter() - t0)
+    return results
+
+
+if __name__ == "__main__":
+    playouts = bench_mcts_parallel()
+    print("workers  playouts/s  speedup")
+    for workers, rate in playouts.items():
+        print(f"{workers:7d}  {rate:10.0f}  {rate / playouts[1]:7.2f}")
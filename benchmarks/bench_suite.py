@@ -0,0 +1,243 @@
+import json
+import platform
+import random
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from agents.common import BoardPiece, PLAYER1, PLAYER2, NO_PLAYER, PlayerAction
+from agents.common import string_to_board, apply_player_action, connected_four, check_end_state, possible_moves
+from agents.agent_minimax.minimax import compute_score_2, minimax_algorithm
+from agents.agent_mcts.mcts import mcts_algorithm
+
+# fixed positions of every phase of the game, none of them finished
+POSITION_STRINGS = {
+    'opening': [
+        '''|==============|
+|              |
+|              |
+|              |
+|              |
+|        X   O |
+|        O   X |
+|==============|
+|0 1 2 3 4 5 6 |''',
+        '''|==============|
+|              |
+|              |
+|              |
+|              |
+|  X       X   |
+|X O O   X O   |
+|==============|
+|0 1 2 3 4 5 6 |''',
+    ],
+    'midgame': [
+        '''|==============|
+|              |
+|              |
+|          O   |
+|O         O   |
+|O   O X   X O |
+|X X X O   X X |
+|==============|
+|0 1 2 3 4 5 6 |''',
+        '''|==============|
+|      O       |
+|      O       |
+|      X     O |
+|      X X   X |
+|  X   O O X X |
+|X X O X O O O |
+|==============|
+|0 1 2 3 4 5 6 |''',
+    ],
+    'near_endgame': [
+        '''|==============|
+|          X X |
+|    O     X X |
+|X   X   O O X |
+|O O O   O X O |
+|O X X O X O X |
+|O O X O X X O |
+|==============|
+|0 1 2 3 4 5 6 |''',
+        '''|==============|
+|  X     O O   |
+|  O X   O O O |
+|O X O   X X X |
+|X X O   O X X |
+|X O X O X O O |
+|X X O O O X X |
+|==============|
+|0 1 2 3 4 5 6 |''',
+    ],
+}
+
+
+def benchmark_positions() -> Dict[str, List[np.ndarray]]:
+    return {phase: [string_to_board(s) for s in strings] for phase, strings in POSITION_STRINGS.items()}
+
+
+def player_to_move(board: np.ndarray) -> BoardPiece:
+    return PLAYER1 if np.count_nonzero(board != NO_PLAYER) % 2 == 0 else PLAYER2
+
+
+def ops_per_second(func: Callable, calls: Sequence[tuple], min_time: float = 0.2, repeats: int = 3) -> float:
+    """
+    Measures how many times per second `func` runs, going through the argument tuples of `calls`
+    until at least `min_time` seconds passed. The best of several repeats is kept, as the others were
+    slowed down by something else.
+    :param func: the measured function
+    :param calls: the arguments of the calls
+    :param min_time: the minimal duration of every repeat, in seconds
+    :param repeats: the number of repeats
+    :return: the calls per second
+    """
+    best = 0.
+    for _ in range(repeats):
+        n_calls = 0
+        t0 = time.perf_counter()
+        while True:
+            for args in calls:
+                func(*args)
+            n_calls += len(calls)
+            elapsed = time.perf_counter() - t0
+            if elapsed >= min_time:
+                break
+        best = max(best, n_calls / elapsed)
+    return best
+
+
+def bench_common(positions: Dict[str, List[np.ndarray]], min_time: float = 0.2) -> dict:
+    """
+    :return: the calls per second of the primitives of agents.common (and of the minimax heuristic),
+    for every phase of the game
+    """
+    results = {}
+    for phase, boards in positions.items():
+        moves = [(board, PlayerAction(possible_moves(board)[0]), player_to_move(board)) for board in boards]
+        played = [(apply_player_action(board, move, player, copy=True), player, move) for board, move, player in moves]
+        results[phase] = {
+            'apply_player_action': ops_per_second(lambda b, m, p: apply_player_action(b, m, p, copy=True), moves,
+                                                  min_time),
+            'connected_four': ops_per_second(lambda b, p, m: connected_four(b, p), played, min_time),
+            'connected_four_last_action': ops_per_second(connected_four, played, min_time),
+            'check_end_state': ops_per_second(lambda b, p, m: check_end_state(b, p), played, min_time),
+            'possible_moves': ops_per_second(possible_moves, [(board,) for board in boards], min_time),
+            'compute_score_2': ops_per_second(compute_score_2, [(board, player_to_move(board)) for board in boards],
+                                              min_time),
+        }
+    return results
+
+
+def bench_minimax(positions: Dict[str, List[np.ndarray]], depth: int = 5) -> dict:
+    """
+    :return: the nodes per second of minimax_algorithm for every phase of the game, and the nodes searched
+    """
+    results = {}
+    for phase, boards in positions.items():
+        total_nodes, elapsed = 0, 0.
+        for board in boards:
+            player = player_to_move(board)
+            nodes = [0] * (depth + 1)
+            t0 = time.perf_counter()
+            minimax_algorithm(board, player, player, depth, nodes=nodes)
+            elapsed += time.perf_counter() - t0
+            total_nodes += sum(nodes)
+        results[phase] = {'nodes': total_nodes, 'nodes_per_second': total_nodes / elapsed}
+    return results
+
+
+def bench_mcts(positions: Dict[str, List[np.ndarray]], trials: int = 1000) -> dict:
+    """
+    :return: the playouts per second of mcts_algorithm for every phase of the game
+    """
+    results = {}
+    for phase, boards in positions.items():
+        simulations, elapsed = 0, 0.
+        for board in boards:
+            t0 = time.perf_counter()
+            _, n = mcts_algorithm(board, player_to_move(board), trials)
+            elapsed += time.perf_counter() - t0
+            simulations += n
+        results[phase] = {'playouts_per_second': simulations / elapsed}
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(quick: bool = False, seed: int = 0) -> dict:
+    """
+    Runs all the benchmarks on the fixed positions, with seeded random numbers.
+    :param quick: shorter measurements and searches, for a smoke test
+    :param seed: the seed of the random playouts
+    :return: the results with the environment they were measured in, ready to be written as JSON
+    """
+    np.random.seed(seed)
+    random.seed(seed)
+    positions = benchmark_positions()
+    return {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'common': bench_common(positions, 0.02 if quick else 0.2),
+        'minimax': bench_minimax(positions, 3 if quick else 5),
+        'mcts': bench_mcts(positions, 50 if quick else 1000),
+    }
+
+
+def compare(baseline: dict, results: dict, tolerance: float = 0.1) -> List[str]:
+    """
+    Compares the rates of two runs of bench_suite.
+    :param baseline: the earlier results
+    :param results: the new results
+    :param tolerance: the relative slowdown reported as a regression
+    :return: a line for every rate that dropped by more than the tolerance
+    """
+    regressions = []
+    for group in ('common', 'minimax', 'mcts'):
+        for phase, rates in results[group].items():
+            for name, rate in rates.items():
+                if name == 'nodes':
+                    continue
+                old_rate = baseline.get(group, {}).get(phase, {}).get(name)
+                if old_rate and rate < (1. - tolerance) * old_rate:
+                    regressions.append(f'{group}.{phase}.{name}: {old_rate:.0f} -> {rate:.0f} '
+                                       f'({rate / old_rate - 1.:+.0%})')
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Benchmarks the primitives and the search engines.')
+    parser.add_argument('--output', default=None, help='the JSON file of the results, stdout if not given')
+    parser.add_argument('--compare', default=None, help='the JSON file of earlier results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='the slowdown reported as a regression')
+    parser.add_argument('--quick', action='store_true', help='short measurements, for a smoke test')
+    args = parser.parse_args()
+
+    results = bench_suite(args.quick)
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for line in regressions:
+            print(f'regression: {line}', file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,519 @@
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor
+from typing import Optional, Sequence, Dict, List, Tuple
+
+import numpy as np
+
+from agents.common import PlayerAction, BoardPiece, SavedState, PLAYER1, PLAYER2, NO_PLAYER, BOARD_COLUMNS
+from agents.common import GameState, initialize_game_state, apply_player_action, check_end_state, find_opponent
+from agents.common import possible_moves, CENTER_FIRST
+from agents.transposition import TranspositionTable
+from agents.agent_minimax.minimax import MinimaxSavedState, generate_move_minimax
+from tournament import Agent, default_agents
+
+LATENCY_WINDOW = 10000  # the number of recent moves the latency percentiles are computed from
+# the memory of the transposition table of a minimax game: a server keeps the saved states of all its games, and a
+# depth 4 search stores far fewer positions than the default table holds
+SESSION_TABLE_BYTES = 2 ** 20
+
+# the saved states of the agents by session id, in the worker process of the sessions (see GameServer)
+_saved_states: Dict[int, Optional[SavedState]] = {}
+
+
+def agent_move(agent: Agent, board: np.ndarray, player: BoardPiece, session_id: int, reset: bool = False
+               ) -> Tuple[int, float]:
+    """
+    Runs the move function of an agent in the worker process of a session, with the saved state the agent left
+    there at its previous move of the session.
+    :param reset: whether the saved state is dropped first
+    :return: the move, the time the move function took in seconds
+    """
+    if reset:
+        _saved_states.pop(session_id, None)
+    t0 = time.perf_counter()
+    action, _saved_states[session_id] = agent.generate_move(board, player, _saved_states.get(session_id),
+                                                            *agent.args, **agent.kwargs)
+    return int(action), time.perf_counter() - t0
+
+
+def drop_saved_state(session_id: int):
+    _saved_states.pop(session_id, None)
+
+
+def request_int(request: dict, field: str) -> int:
+    """
+    :return: the integer field of a request
+    :raises ValueError: if the field is missing or isn't an integer
+    """
+    value = request.get(field)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f'{field} must be an integer, not {value!r}')
+    return value
+
+
+def generate_move_minimax_session(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState],
+                                  *args, **kwargs) -> Tuple[PlayerAction, Optional[SavedState]]:
+    """
+    generate_move_minimax, with a transposition table of SESSION_TABLE_BYTES.
+    """
+    if saved_state is None:
+        saved_state = MinimaxSavedState(TranspositionTable(SESSION_TABLE_BYTES))
+    return generate_move_minimax(board, player, saved_state, *args, **kwargs)
+
+
+def server_agents() -> List[Agent]:
+    """
+    :return: the agents of tournament.default_agents, with the smaller saved states of a server
+    """
+    return [agent._replace(generate_move=generate_move_minimax_session) if agent.name == 'minimax' else agent
+            for agent in default_agents()]
+
+
+class GameSession(object):
+    """
+    One game between a client and an agent of the server. The moves of a session are played one at a time,
+    under its lock, by the worker the session is pinned to, which keeps the agent's saved state.
+    """
+
+    def __init__(self, session_id: int, agent: Agent, agent_player: BoardPiece, worker: int):
+        self.session_id = session_id
+        self.agent = agent
+        self.agent_player = agent_player
+        self.worker = worker
+        self.board = initialize_game_state()
+        self.moves = []
+        self.reset_saved_state = False  # whether the next move drops the saved state, after a timeout
+        self.state = 'playing'  # then 'won', 'lost' or 'draw', for the client
+        self.lock = asyncio.Lock()
+
+    def play(self, action: int, player: BoardPiece) -> bool:
+        """
+        Plays a move and updates the state of the game.
+        :return: whether the move was legal; an illegal move doesn't change the board
+        """
+        if not 0 <= action < BOARD_COLUMNS or self.board[-1, action] != NO_PLAYER:
+            return False
+        apply_player_action(self.board, PlayerAction(action), player)
+        self.moves.append(action)
+        end_state = check_end_state(self.board, player, PlayerAction(action))
+        if end_state == GameState.IS_WIN:
+            self.state = 'lost' if player == self.agent_player else 'won'
+        elif end_state == GameState.IS_DRAW:
+            self.state = 'draw'
+        return True
+
+    def reply(self, **fields) -> dict:
+        return dict(ok=True, session=self.session_id, moves=self.moves, state=self.state, **fields)
+
+
+class AgentError(Exception):
+    """
+    An agent move failed: the move function raised an exception, or the worker process running it died.
+    The game can't go on without the agent's move.
+    """
+
+    def __init__(self, session: GameSession, message: str):
+        super().__init__(message)
+        self.session = session
+
+
+class ServerMetrics(object):
+    """
+    The counters of a server. The latency of a move is the time from the client's request to the reply, including
+    the wait for a free worker; the compute time is the time of the agent's move function alone.
+    Both are kept for the last LATENCY_WINDOW moves.
+    """
+
+    def __init__(self):
+        self.sessions = 0
+        self.total_sessions = 0
+        self.moves = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.errors = 0
+        self.queue_depth = 0  # the moves submitted to the workers and not finished yet
+        self.max_queue_depth = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.compute_times = deque(maxlen=LATENCY_WINDOW)
+        self.start = time.monotonic()
+
+    def snapshot(self, percentiles: Sequence[float] = (50, 90, 99)) -> dict:
+        """
+        :return: the counters and the percentiles of the latencies and compute times, in milliseconds
+        """
+        snapshot = {'uptime': time.monotonic() - self.start, 'sessions': self.sessions,
+                    'total_sessions': self.total_sessions, 'moves': self.moves, 'timeouts': self.timeouts,
+                    'rejected': self.rejected, 'errors': self.errors, 'queue_depth': self.queue_depth,
+                    'max_queue_depth': self.max_queue_depth}
+        for name, times in (('latency', self.latencies), ('compute', self.compute_times)):
+            values = (np.percentile(times, percentiles) * 1000.).tolist() if times else [None] * len(percentiles)
+            snapshot.update({f'{name}_p{p:g}_ms': value for p, value in zip(percentiles, values)})
+        return snapshot
+
+
+class GameServer(object):
+    """
+    A game service hosting many concurrent games between clients and the agents, on an asyncio event loop.
+    The move functions are CPU-bound, so they run in a pool of worker processes; the event loop only handles the
+    connections and the game rules. Requests are JSON objects, one per line, answered by one JSON line each:
+
+    {"op": "new", "agent": name, "first": "client" or "agent"} starts a game (the agent's first move is played
+    right away if it plays first) and answers {"ok": true, "session": id, "moves": [...], "state": "playing"}
+    {"op": "move", "session": id, "column": c} plays the client's move, then the agent's, and answers with the
+    moves and the state of the game ("playing", "won", "lost" or "draw", for the client)
+    {"op": "close", "session": id} ends a game, {"op": "metrics"} answers the ServerMetrics snapshot
+
+    Errors are answered by {"ok": false, "error": message}. A session belongs to the connection that started it and
+    is closed with it, when the game is over, or when an agent move fails (its function raises an exception, or its
+    worker process dies and is replaced by a new one).
+    Every worker is a process of its own, and every session is pinned to one of them, the one with the fewest
+    sessions when it starts. The worker keeps the agent's saved state of the session between its moves, so the
+    saved states (the transposition table of minimax, the tree of MCTS) are never sent between processes.
+    An agent move taking longer than the move timeout is replaced by the center-most legal move, and the agent's
+    saved state is dropped. A move arriving when max_pending moves are already waiting for the workers is rejected
+    with the "busy" error, so an overloaded server answers at once instead of timing out every move.
+    """
+
+    def __init__(self, agents: Sequence[Agent], workers: Optional[int] = None, move_timeout: float = 5.,
+                 max_pending: int = 64, executors: Optional[Sequence[Executor]] = None):
+        """
+        :param agents: the agents the clients can play against, with distinct names
+        :param workers: the number of worker processes, the number of cores if None
+        :param move_timeout: the time in seconds an agent move may take, waiting for a worker included
+        :param max_pending: the number of moves that may wait for or run in the workers at once
+        :param executors: the workers running the moves, each running one move at a time and in the order they were
+        submitted; `workers` single process pools are started if None
+        """
+        self.agents = {agent.name: agent for agent in agents}
+        self.move_timeout = move_timeout
+        self.max_pending = max_pending
+        self.own_executors = executors is None
+        if executors is None:
+            executors = [self.new_worker() for _ in range(workers or os.cpu_count())]
+        self.executors = list(executors)
+        self.worker_sessions = [0] * len(self.executors)  # the number of open sessions of every worker
+        self.metrics = ServerMetrics()
+        self.session_ids = itertools.count(1)
+        self.connections = set()  # the tasks serving the open connections
+
+    @staticmethod
+    def new_worker() -> Executor:
+        # forked workers would inherit the sockets of the connections open at the time, keeping them open
+        return ProcessPoolExecutor(1, multiprocessing.get_context('forkserver'))
+
+    async def start_workers(self):
+        """
+        Starts the worker processes, which are otherwise started by their first moves.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(executor, time.sleep, 0.) for executor in self.executors])
+
+    def close(self):
+        if self.own_executors:
+            for executor in self.executors:
+                executor.shutdown(cancel_futures=True)
+
+    def busy(self) -> bool:
+        return self.metrics.queue_depth >= self.max_pending
+
+    async def play_agent_move(self, session: GameSession) -> bool:
+        """
+        Plays the agent's move of a session, computed by the session's worker.
+        :return: whether the move timed out
+        :raises AgentError: if the move failed
+        """
+        loop = asyncio.get_running_loop()
+
+        def finished(_):
+            # the move may run on after a timeout, and keeps its worker busy until it finishes
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self.move_finished)
+
+        executor = self.executors[session.worker]
+        try:
+            future = executor.submit(agent_move, session.agent, session.board.copy(), session.agent_player,
+                                     session.session_id, session.reset_saved_state)
+            session.reset_saved_state = False
+            self.metrics.queue_depth += 1
+            self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self.metrics.queue_depth)
+            future.add_done_callback(finished)
+            action, compute_time = await asyncio.wait_for(asyncio.wrap_future(future), self.move_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            # the worker runs the moves in order, so the next one starts after this one stored its state
+            session.reset_saved_state = True
+            legal = possible_moves(session.board)
+            session.play(next(col for col in CENTER_FIRST if col in legal), session.agent_player)
+            return True
+        except Exception as error:
+            if isinstance(error, BrokenExecutor) and self.own_executors and self.executors[session.worker] is executor:
+                # the worker process died with the saved states of its sessions, which start over in a new one
+                executor.shutdown(wait=False)
+                self.executors[session.worker] = self.new_worker()
+            raise AgentError(session, f'the agent {session.agent.name} failed: {error!r}') from error
+        self.metrics.compute_times.append(compute_time)
+        if not session.play(action, session.agent_player):
+            session.state = 'won'  # an illegal move loses the game, as in the tournament
+        return False
+
+    def move_finished(self):
+        self.metrics.queue_depth -= 1
+
+    def reject(self) -> dict:
+        self.metrics.rejected += 1
+        return {'ok': False, 'error': 'busy'}
+
+    async def new_session(self, request: dict, sessions: Dict[int, GameSession]) -> dict:
+        name, first = request.get('agent'), request.get('first', 'client')
+        if not isinstance(name, str):
+            raise ValueError(f'agent must be a string, not {name!r}')
+        if first not in ('client', 'agent'):
+            raise ValueError(f'first must be "client" or "agent", not {first!r}')
+        agent = self.agents.get(name)
+        if agent is None:
+            return {'ok': False, 'error': f'unknown agent {name!r}, one of {sorted(self.agents)}'}
+        agent_first = first == 'agent'
+        if agent_first and self.busy():
+            return self.reject()
+        worker = self.worker_sessions.index(min(self.worker_sessions))
+        session = GameSession(next(self.session_ids), agent, PLAYER1 if agent_first else PLAYER2, worker)
+        self.worker_sessions[worker] += 1
+        sessions[session.session_id] = session
+        self.metrics.sessions += 1
+        self.metrics.total_sessions += 1
+        async with session.lock:
+            timeout = await self.play_agent_move(session) if agent_first else False
+            return session.reply(player=int(find_opponent(session.agent_player)), timeout=timeout)
+
+    async def move(self, request: dict, session: GameSession) -> dict:
+        t0 = time.monotonic()
+        column = request_int(request, 'column')
+        async with session.lock:
+            if session.state != 'playing':
+                return {'ok': False, 'error': 'the game is over'}
+            if self.busy():
+                return self.reject()
+            if not session.play(column, find_opponent(session.agent_player)):
+                return {'ok': False, 'error': f'illegal move {column!r}'}
+            timeout = False
+            if session.state == 'playing':
+                timeout = await self.play_agent_move(session)
+            self.metrics.moves += 1
+            self.metrics.latencies.append(time.monotonic() - t0)
+            return session.reply(timeout=timeout)
+
+    async def handle_request(self, request: dict, sessions: Dict[int, GameSession]) -> dict:
+        """
+        Answers one request of a connection.
+        :param request: the decoded request
+        :param sessions: the sessions of the connection, by id
+        :return: the reply; a failed agent move is answered by an error, and ends its session
+        :raises ValueError: if a field of the request has the wrong type
+        """
+        op = request.get('op')
+        try:
+            if op == 'new':
+                return await self.new_session(request, sessions)
+            if op == 'metrics':
+                return dict(ok=True, **self.metrics.snapshot())
+            if op not in ('move', 'close'):
+                return {'ok': False, 'error': f'unknown op {op!r}'}
+            session = sessions.get(request_int(request, 'session'))
+            if session is None:
+                return {'ok': False, 'error': f'unknown session {request["session"]!r}'}
+            if op == 'close':
+                self.close_session(session, sessions)
+                return {'ok': True, 'session': session.session_id}
+            reply = await self.move(request, session)
+        except AgentError as error:
+            self.metrics.errors += 1
+            self.close_session(error.session, sessions)
+            return {'ok': False, 'error': str(error), 'session': error.session.session_id}
+        if session.state != 'playing':
+            self.close_session(session, sessions)
+        return reply
+
+    def close_session(self, session: GameSession, sessions: Dict[int, GameSession]):
+        if sessions.pop(session.session_id, None) is not None:
+            self.metrics.sessions -= 1
+            self.worker_sessions[session.worker] -= 1
+            try:
+                self.executors[session.worker].submit(drop_saved_state, session.session_id)
+            except RuntimeError:  # the server is shutting down
+                pass
+
+    async def handle_stream(self, reader: asyncio.StreamReader, writer):
+        """
+        Serves the requests of one connection, one at a time, until the client closes it.
+        """
+        sessions = {}
+        self.connections.add(asyncio.current_task())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('a request is a JSON object')
+                    reply = await self.handle_request(request, sessions)
+                except ValueError as error:
+                    self.metrics.errors += 1
+                    reply = {'ok': False, 'error': str(error)}
+                writer.write((json.dumps(reply) + '\n').encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session in list(sessions.values()):
+                self.close_session(session, sessions)
+            self.connections.discard(asyncio.current_task())
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.AbstractServer:
+        """
+        Starts serving TCP connections.
+        :param port: the port, 0 for any free port (see server.sockets[0].getsockname())
+        :return: the asyncio server
+        """
+        return await asyncio.start_server(self.handle_stream, host, port)
+
+    async def stop(self, tcp_server: asyncio.AbstractServer, timeout: float = 1.):
+        """
+        Stops accepting connections, and waits for the open ones to be closed by their clients.
+        :param timeout: the time in seconds after which the open connections are closed by the server
+        """
+        tcp_server.close()
+        if self.connections:
+            _, running = await asyncio.wait(self.connections, timeout=timeout)
+            for task in running:
+                task.cancel()
+        await tcp_server.wait_closed()
+
+    async def serve_stdio(self):
+        """
+        Serves a single client speaking on stdin and stdout, e.g. for local testing.
+        """
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+        writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+        await self.handle_stream(reader, writer)
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, message: dict) -> dict:
+    writer.write((json.dumps(message) + '\n').encode())
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def simulated_client(host: str, port: int, agent: str, games: int, seed: int) -> Tuple[List[float], int]:
+    """
+    A client playing random legal moves against an agent of the server, one game after the other.
+    :return: the latencies of the client's moves in seconds, the number of replies with an error
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    latencies, errors = [], 0
+    try:
+        for game in range(games):
+            reply = await request(reader, writer, {'op': 'new', 'agent': agent,
+                                                   'first': 'agent' if game % 2 else 'client'})
+            if not reply['ok']:
+                errors += 1
+                continue
+            session, board = reply['session'], initialize_game_state()
+            while reply['ok'] and reply['state'] == 'playing':
+                board = initialize_game_state()
+                for ply, column in enumerate(reply['moves']):
+                    apply_player_action(board, PlayerAction(column), PLAYER1 if ply % 2 == 0 else PLAYER2)
+                t0 = time.monotonic()
+                reply = await request(reader, writer, {'op': 'move', 'session': session,
+                                                       'column': rng.choice(possible_moves(board))})
+                latencies.append(time.monotonic() - t0)
+            if not reply['ok']:
+                errors += 1
+                await request(reader, writer, {'op': 'close', 'session': session})
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return latencies, errors
+
+
+async def load_test(host: str, port: int, clients: int = 10, games: int = 2, agent: str = 'random',
+                    seed: Optional[int] = None) -> dict:
+    """
+    Simulates many clients playing at the same time against a server.
+    :param host: the host of the server
+    :param port: the port of the server
+    :param clients: the number of concurrent clients, each with its own connection
+    :param games: the number of games of every client
+    :param agent: the name of the agent the clients play against
+    :param seed: the seed of the clients' random moves, None for a random one
+    :return: the moves per second, the client side latency percentiles in milliseconds, the number of replies with
+    an error and the server metrics at the end
+    """
+    seeds = np.random.SeedSequence(seed).generate_state(clients)
+    t0 = time.monotonic()
+    results = await asyncio.gather(*[simulated_client(host, port, agent, games, int(client_seed))
+                                     for client_seed in seeds])
+    elapsed = time.monotonic() - t0
+    latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+    reader, writer = await asyncio.open_connection(host, port)
+    metrics = await request(reader, writer, {'op': 'metrics'})
+    writer.close()
+    await writer.wait_closed()
+    p50, p90, p99 = np.percentile(latencies, (50, 90, 99)) * 1000. if latencies else (np.nan,) * 3
+    return {'moves': len(latencies), 'elapsed': elapsed, 'moves_per_second': len(latencies) / elapsed,
+            'latency_p50_ms': p50, 'latency_p90_ms': p90, 'latency_p99_ms': p99,
+            'errors': sum(errors for _, errors in results), 'server': metrics}
+
+
+async def main(args):
+    server = GameServer(server_agents(), args.workers, args.timeout, args.max_pending)
+    try:
+        if args.command == 'serve' and args.stdio:
+            await server.serve_stdio()
+            return
+        tcp_server = await server.start(args.host, args.port)
+        host, port = tcp_server.sockets[0].getsockname()[:2]
+        if args.command == 'serve':
+            print(f'serving on {host}:{port}', file=sys.stderr)
+            async with tcp_server:
+                await tcp_server.serve_forever()
+        else:
+            await server.start_workers()
+            results = await load_test(host, port, args.clients, args.games, args.agent, args.seed)
+            await server.stop(tcp_server)
+            print(json.dumps(results, indent=2))
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serves games against the agents, or load tests the server.')
+    parser.add_argument('command', choices=('serve', 'load'),
+                        help='serve: run the server; load: run a server and simulated clients playing against it')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='the port of the server, 0 for any free port')
+    parser.add_argument('--stdio', action='store_true', help='serve one client on stdin and stdout instead of TCP')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='the number of worker processes')
+    parser.add_argument('--timeout', type=float, default=5., help='the time in seconds an agent move may take')
+    parser.add_argument('--max-pending', type=int, default=64, help='the moves that may wait for the workers')
+    parser.add_argument('--clients', type=int, default=10, help='load: the number of concurrent clients')
+    parser.add_argument('--games', type=int, default=2, help='load: the number of games of every client')
+    parser.add_argument('--agent', default='random', help='load: the agent the clients play against')
+    parser.add_argument('--seed', type=int, default=None, help='load: the seed of the clients')
+    asyncio.run(main(parser.parse_args()))
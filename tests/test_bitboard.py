@@ -0,0 +1,113 @@
+import numpy as np
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, PlayerAction, GameState
+
+b1 = np.empty((6, 7), dtype=BoardPiece)
+b1.fill(NO_PLAYER)
+b1[0, 1] = PLAYER2
+b1[1, 1] = PLAYER2
+b1[0, 2] = PLAYER2
+b1[2, 2] = PLAYER2
+b1[1, 3] = PLAYER2
+b1[1, 4] = PLAYER2
+b1[1, 2] = PLAYER1
+b1[3, 2] = PLAYER1
+b1[0, 3] = PLAYER1
+b1[2, 3] = PLAYER1
+b1[3, 3] = PLAYER1
+b1[0, 4] = PLAYER1
+b1[2, 4] = PLAYER1
+'''|==============|
+|              |
+|              |
+|    X X       |
+|    O X X     |
+|  O X O O     |
+|  O O X X     |
+|==============|
+|0 1 2 3 4 5 6 |'''
+
+
+def test_from_array_to_array():
+    from agents.bitboard import BitBoard
+
+    bitboard = BitBoard.from_array(b1)
+    assert bitboard.heights == [0, 2, 4, 4, 3, 0, 0]
+    assert np.all(bitboard.to_array() == b1)
+    assert bitboard.to_array().dtype == BoardPiece
+
+
+def test_apply_undo_action():
+    from agents.bitboard import BitBoard
+    from agents.common import apply_player_action
+
+    bitboard = BitBoard.from_array(b1)
+    row = bitboard.apply_action(PlayerAction(2), PLAYER2)
+    assert row == 4
+    assert np.all(bitboard.to_array() == apply_player_action(b1, PlayerAction(2), PLAYER2, copy=True))
+
+    bitboard.undo_action(PlayerAction(2))
+    assert np.all(bitboard.to_array() == b1)
+
+
+def test_connected_four():
+    from agents.bitboard import BitBoard
+
+    bitboard = BitBoard.from_array(b1)
+    assert not bitboard.connected_four(PLAYER1)
+    assert not bitboard.connected_four(PLAYER2)
+    # completes the row (0, 3), (0, 4), (0, 5), (0, 6)
+    bitboard.apply_action(PlayerAction(5), PLAYER1)
+    assert not bitboard.connected_four(PLAYER1)
+    bitboard.apply_action(PlayerAction(6), PLAYER1)
+    assert bitboard.connected_four(PLAYER1)
+    assert not bitboard.connected_four(PLAYER2)
+
+    # lines must not wrap around from the top of one column to the bottom of the next one
+    bitboard = BitBoard()
+    for player in (PLAYER2, PLAYER2, PLAYER2, PLAYER1, PLAYER1, PLAYER1):
+        bitboard.apply_action(PlayerAction(0), player)
+    bitboard.apply_action(PlayerAction(1), PLAYER1)
+    assert not bitboard.connected_four(PLAYER1)
+
+
+def test_possible_moves():
+    from agents.bitboard import BitBoard
+    from agents.common import possible_moves
+
+    bitboard = BitBoard.from_array(b1)
+    for _ in range(6):
+        bitboard.apply_action(PlayerAction(5), PLAYER1)
+    assert 5 not in bitboard.possible_moves()
+    assert bitboard.possible_moves() == possible_moves(bitboard.to_array())
+    assert not bitboard.is_full()
+
+
+def test_key_and_mirror():
+    from agents.bitboard import BitBoard
+
+    bitboard = BitBoard.from_array(b1)
+    mirror = bitboard.mirror()
+    assert np.all(mirror.to_array() == b1[:, ::-1])
+    assert mirror.heights == bitboard.heights[::-1]
+    assert mirror.mirror().key() == bitboard.key()
+    assert mirror.key() != bitboard.key()
+    assert bitboard.canonical_key()[0] == mirror.canonical_key()[0]
+    assert bitboard.canonical_key()[1] != mirror.canonical_key()[1]
+
+    # the key tells apart the boards with the same pieces of PLAYER1
+    other = bitboard.copy()
+    other.apply_action(PlayerAction(6), PLAYER2)
+    assert other.key() != bitboard.key()
+    assert BitBoard().key() == 0
+
+
+def test_from_key():
+    from agents.bitboard import BitBoard
+
+    bitboard = BitBoard.from_array(b1)
+    from_key = BitBoard.from_key(bitboard.key())
+    assert np.all(from_key.to_array() == b1)
+    assert from_key.heights == bitboard.heights
+    assert from_key.player2_pieces == bitboard.player2_pieces
+    full = BitBoard.from_array(np.full((6, 7), PLAYER2, BoardPiece))
+    assert BitBoard.from_key(full.key()).heights == [6] * 7
@@ -150,6 +150,30 @@ def test_connect_four():
     assert not connected_four(b4, PLAYER2)
 
 
+def test_connect_four_last_action():
+    from agents.common import connected_four
+
+    # b2 is won by the row (1, 1), (1, 2), (1, 3), (1, 4); the top piece of column 4 is an X
+    assert connected_four(b2, PLAYER2, PlayerAction(1))
+    assert not connected_four(b2, PLAYER2, PlayerAction(4))
+    # b3 is won by the column 3 of X
+    assert connected_four(b3, PLAYER1, PlayerAction(3))
+    assert not connected_four(b3, PLAYER2, PlayerAction(3))
+    # b4 is won by the diagonal (0, 5), (1, 4), (2, 3), (3, 2)
+    assert connected_four(b4, PLAYER1, PlayerAction(5))
+    assert connected_four(b4, PLAYER1, PlayerAction(2))
+    assert not connected_four(b4, PLAYER1, PlayerAction(1))
+    assert not connected_four(b1, PLAYER1, PlayerAction(0))
+
+
+def test_top_piece():
+    from agents.common import top_piece
+
+    assert top_piece(b1, PlayerAction(0)) == NO_PLAYER
+    assert top_piece(b3, PlayerAction(3)) == PLAYER1
+    assert top_piece(b4, PlayerAction(1)) == PLAYER2
+
+
 def test_check_end_state():
     from agents.common import check_end_state
 
@@ -161,6 +185,16 @@ def test_check_end_state():
     assert check_end_state(b5, PLAYER2) == GameState.IS_DRAW
 
 
+def test_check_end_state_last_action():
+    from agents.common import check_end_state
+
+    assert check_end_state(b1, PLAYER1, PlayerAction(3)) == GameState.STILL_PLAYING
+    assert check_end_state(b2, PLAYER2, PlayerAction(1)) == GameState.IS_WIN
+    assert check_end_state(b2, PLAYER1, PlayerAction(1)) == GameState.IS_LOST
+    assert check_end_state(b3, PLAYER1, PlayerAction(3)) == GameState.IS_WIN
+    assert check_end_state(b5, PLAYER1, PlayerAction(0)) == GameState.IS_DRAW
+
+
 def test_pretty_print_board():
     from agents.common import pretty_print_board
     assert pretty_print_board(b4) == "|==============|\n" \
@@ -0,0 +1,94 @@
+import numpy as np
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, PlayerAction, GameState
+
+b1 = np.empty((6, 7), dtype=BoardPiece)
+b1.fill(NO_PLAYER)
+b1[0, 1] = PLAYER2
+b1[1, 1] = PLAYER2
+b1[0, 2] = PLAYER2
+b1[2, 2] = PLAYER2
+b1[1, 3] = PLAYER2
+b1[1, 4] = PLAYER2
+b1[1, 2] = PLAYER1
+b1[3, 2] = PLAYER1
+b1[0, 3] = PLAYER1
+b1[2, 3] = PLAYER1
+b1[3, 3] = PLAYER1
+b1[0, 4] = PLAYER1
+b1[2, 4] = PLAYER1
+'''|==============|
+|              |
+|              |
+|    X X       |
+|    O X X     |
+|  O X O O     |
+|  O O X X     |
+|==============|
+|0 1 2 3 4 5 6 |'''
+
+
+def find_line_score(line: np.ndarray, player: BoardPiece) -> int:
+    """
+    Scores the windows of one line of the board, one window at a time, as a reference for the vectorized evaluator.
+    """
+    scores = {1: 1, 2: 10, 3: 50, 4: 1000}
+    line_score = 0
+    for first in range(len(line) - 3):
+        window = line[first:first + 4]
+        mine, theirs = np.count_nonzero(window == player), np.count_nonzero((window != player) & (window != NO_PLAYER))
+        if mine and not theirs:
+            line_score += scores[mine]
+        elif theirs and not mine:
+            line_score -= scores[theirs]
+    return line_score
+
+
+def test_windows():
+    from agents.agent_minimax.evaluation import WINDOWS
+
+    assert WINDOWS.shape == (69, 4)
+    assert len({tuple(sorted(w)) for w in WINDOWS}) == 69
+
+
+def test_evaluate_board():
+    from agents.agent_minimax.evaluation import evaluate_board
+
+    lines = [b1[i, :] for i in range(6)] + [b1[:, j] for j in range(7)]
+    lines += [np.diagonal(b1, k) for k in range(-2, 4)] + [np.diagonal(b1[:, ::-1], k) for k in range(-2, 4)]
+    for player in (PLAYER1, PLAYER2):
+        assert evaluate_board(b1, player) == sum(find_line_score(line, player) for line in lines)
+    assert evaluate_board(b1, PLAYER1) == -evaluate_board(b1, PLAYER2)
+    assert evaluate_board(np.zeros((6, 7), BoardPiece), PLAYER1) == 0
+
+
+def test_evaluate_boards():
+    from agents.agent_minimax.evaluation import evaluate_board, evaluate_boards
+
+    b2 = b1.copy()
+    b2[0, 5] = PLAYER1
+    boards = np.stack([b1, b2, b1])
+    scores = evaluate_boards(boards, np.array([PLAYER1, PLAYER1, PLAYER2]))
+    assert list(scores) == [evaluate_board(b1, PLAYER1), evaluate_board(b2, PLAYER1), evaluate_board(b1, PLAYER2)]
+    assert list(evaluate_boards(boards, PLAYER2)) == [evaluate_board(b, PLAYER2) for b in boards]
+
+
+def test_incremental_evaluator():
+    from agents.agent_minimax.evaluation import evaluate_board, IncrementalEvaluator
+    from agents.common import apply_player_action
+
+    evaluator = IncrementalEvaluator(b1)
+    assert evaluator.evaluate(PLAYER1) == evaluate_board(b1, PLAYER1)
+
+    board = b1.copy()
+    made = []
+    for col, player in ((0, PLAYER1), (2, PLAYER2), (5, PLAYER1), (2, PLAYER1), (6, PLAYER2)):
+        row = np.count_nonzero(board[:, col] != NO_PLAYER)
+        apply_player_action(board, PlayerAction(col), player)
+        evaluator.make(row, col, player)
+        made.append((row, col, player))
+        assert evaluator.evaluate(PLAYER1) == evaluate_board(board, PLAYER1)
+        assert evaluator.evaluate(PLAYER2) == evaluate_board(board, PLAYER2)
+
+    for row, col, player in reversed(made):
+        evaluator.unmake(row, col, player)
+    assert evaluator.evaluate(PLAYER1) == evaluate_board(b1, PLAYER1)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, PlayerAction
+from agents.common import initialize_game_state, apply_player_action
+
+MOVES = [3, 3, 2, 2, 1, 1, 0]  # PLAYER1 wins on the bottom row
+
+
+def test_encode_decode_positions():
+    from agents.game_records import encode_positions, decode_positions, position_keys
+    from agents.bitboard import BitBoard
+
+    keys = position_keys(MOVES)
+    assert len(keys) == len(MOVES) + 1
+    boards = [initialize_game_state()]
+    for ply, move in enumerate(MOVES):
+        boards.append(apply_player_action(boards[-1], PlayerAction(move), PLAYER1 if ply % 2 == 0 else PLAYER2,
+                                          copy=True))
+    boards = np.array(boards)
+    assert keys.dtype == np.uint64
+    assert np.all(encode_positions(boards) == keys)
+    assert encode_positions(boards)[-1] == BitBoard.from_array(boards[-1]).key()
+    assert np.all(decode_positions(keys) == boards)
+    full = np.full((1, 6, 7), PLAYER2, BoardPiece)
+    assert np.all(decode_positions(encode_positions(full)) == full)
+
+
+def test_pack_moves():
+    from agents.game_records import pack_moves, unpack_moves
+
+    for moves in ([], [6], MOVES):
+        packed = pack_moves(np.array(moves, np.uint8))
+        assert len(packed) == (len(moves) + 1) // 2
+        assert unpack_moves(packed, len(moves)).tolist() == moves
+
+
+def test_game_records(tmp_path):
+    from agents.game_records import GameRecordWriter, read_game_records
+
+    path = str(tmp_path / 'games.c4gr')
+    with GameRecordWriter(path) as writer:
+        writer.write(MOVES, PLAYER1, [0.5] * len(MOVES))
+        writer.write([0, 1])
+    # the games are appended to the existing file
+    with GameRecordWriter(path) as writer:
+        writer.write([6] * 6, NO_PLAYER, [0.25] * 6)
+
+    games = read_game_records(path)
+    game = next(games)
+    assert game.moves.tolist() == MOVES
+    assert game.winner == PLAYER1
+    assert np.all(game.times == 0.5)
+    game = next(games)
+    assert game.moves.tolist() == [0, 1] and game.winner == NO_PLAYER and game.times is None
+    game = next(games)
+    assert game.moves.tolist() == [6] * 6 and game.times.tolist() == [0.25] * 6
+    assert next(games, None) is None
+
+
+def test_game_records_errors(tmp_path):
+    from agents.game_records import GameRecordWriter, read_game_records
+
+    path = str(tmp_path / 'games.c4gr')
+    with GameRecordWriter(path) as writer:
+        with pytest.raises(ValueError):
+            writer.write([7])
+        with pytest.raises(ValueError):
+            writer.write([0, 1], PLAYER1, [1.])
+        writer.write(MOVES, PLAYER1)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:-1])
+    with pytest.raises(ValueError):
+        list(read_game_records(path))
+
+    other = str(tmp_path / 'other.bin')
+    with open(other, 'wb') as f:
+        f.write(b'C4BK' + bytes(8))
+    with pytest.raises(ValueError):
+        list(read_game_records(other))
+    with pytest.raises(ValueError):
+        GameRecordWriter(other)
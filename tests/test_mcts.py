@@ -1,6 +1,7 @@
 import numpy as np
 from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, PlayerAction, GameState
-from agents.agent_mcts.mcts import MCTSNode
+from agents.agent_mcts.tree import MCTSTree
+from agents.bitboard import BitBoard
 
 b1 = np.empty((6, 7), dtype=BoardPiece)
 b1.fill(NO_PLAYER)
@@ -27,33 +28,40 @@ b1[2, 4] = PLAYER1
 |==============|
 |0 1 2 3 4 5 6 |'''
 
-parent_node = MCTSNode(b1, PLAYER2)
-parent_node.plays = 20
-parent_node.wins = 10
 
-b2 = b1.copy()
-b2[0, 0] = PLAYER2
-child_1 = MCTSNode(b2, PLAYER1, parent_node)
-child_1.plays = 10
-child_1.wins = 1
+def sample_tree():
+    """
+    Builds a tree whose root has the board b1 with PLAYER2 to move, the children of the columns 0 and 5,
+    and the child of the column 0 below the first child.
+    """
+    tree = MCTSTree.from_array(b1, PLAYER2)
+    tree.plays[0] = 20
+    tree.wins[0] = 10
 
-b3 = b1.copy()
-b3[0, 5] = PLAYER2
-child_2 = MCTSNode(b3, PLAYER1, parent_node)
-child_2.plays = 10
-child_2.wins = 9
+    b2 = b1.copy()
+    b2[0, 0] = PLAYER2
+    child_1 = tree.add_node(0, 0, PLAYER1, BitBoard.from_array(b2))
+    tree.plays[child_1] = 10
+    tree.wins[child_1] = 1
 
-b4 = b2.copy()
-b4[1, 0] = PLAYER1
-grandchild_1 = MCTSNode(b4, PLAYER2, child_1)
-child_1.children.append(grandchild_1)
+    b3 = b1.copy()
+    b3[0, 5] = PLAYER2
+    child_2 = tree.add_node(0, 5, PLAYER1, BitBoard.from_array(b3))
+    tree.plays[child_2] = 10
+    tree.wins[child_2] = 9
+
+    b4 = b2.copy()
+    b4[1, 0] = PLAYER1
+    grandchild_1 = tree.add_node(child_1, 0, PLAYER2, BitBoard.from_array(b4))
+    return tree, child_1, child_2, grandchild_1
 
 
 def test_ucb1():
     from agents.agent_mcts.mcts import upper_confidence_bound_1
 
-    s1 = upper_confidence_bound_1(child_1.wins, child_1.plays, child_1.parent.plays)
-    s2 = upper_confidence_bound_1(child_2.wins, child_2.plays, child_2.parent.plays)
+    tree, child_1, child_2, _ = sample_tree()
+    s1 = upper_confidence_bound_1(tree.wins[child_1], tree.plays[child_1], tree.plays[0])
+    s2 = upper_confidence_bound_1(tree.wins[child_2], tree.plays[child_2], tree.plays[0])
     assert s1 < s2
 
 
@@ -61,57 +69,259 @@ def test_run_simulation():
     from agents.agent_mcts.mcts import run_simulation
     from agents.common import check_end_state
 
+    tree = MCTSTree.from_array(b1, PLAYER2)
     for _ in range(10):
-        final_board, game_status = run_simulation(parent_node, parent_node.player)
-        assert check_end_state(final_board, parent_node.player) == game_status
-        assert game_status == GameState.IS_WIN or game_status == GameState.IS_LOST
+        final_board, game_status = run_simulation(tree, 0, PLAYER2)
+        assert check_end_state(final_board.to_array(), PLAYER2) == game_status
         assert game_status != GameState.STILL_PLAYING
 
 
 def test_do_expansion():
     from agents.agent_mcts.mcts import do_expansion
-    expanded_node = do_expansion(parent_node)
-    assert np.all(expanded_node.board == child_1.board)
-    assert expanded_node.player == child_1.player
-    assert expanded_node.parent == child_1.parent
+
+    tree = MCTSTree.from_array(b1, PLAYER2)
+    expanded_node = do_expansion(tree, 0)
+    b2 = b1.copy()
+    b2[0, 0] = PLAYER2
+    assert np.all(tree.board(expanded_node) == b2)
+    assert tree.player[expanded_node] == PLAYER1
+    assert tree.parent[expanded_node] == 0
+    assert tree.move[expanded_node] == 0
 
     # 1, 2, 3, 4
     for _ in range(4):
-        do_expansion(parent_node)
+        do_expansion(tree, 0)
+
+    expanded_node_5 = do_expansion(tree, 0)
+    b3 = b1.copy()
+    b3[0, 5] = PLAYER2
+    assert np.all(tree.board(expanded_node_5) == b3)
+    assert tree.player[expanded_node_5] == PLAYER1
+    assert tree.parent[expanded_node_5] == 0
+    assert tree.children(0) == [1, 2, 3, 4, 5, 6]
+
+    do_expansion(tree, 0)
+    assert tree.untried[0] == 0
+    # a fully expanded node is not expanded again
+    assert do_expansion(tree, 0) == 0
 
-    expanded_node_5 = do_expansion(parent_node)
-    assert np.all(expanded_node_5.board == child_2.board)
-    assert expanded_node_5.player == child_2.player
-    assert expanded_node_5.parent == child_2.parent
+
+def test_do_expansion_finished_game():
+    from agents.agent_mcts.mcts import do_expansion, run_simulation
+
+    # PLAYER1 wins by playing the column 6 on b3
+    b3 = b1.copy()
+    b3[0, 5] = PLAYER1
+    b3[0, 6] = PLAYER1
+    tree = MCTSTree.from_array(b3, PLAYER2)
+    assert tree.untried[0] == 0
+    assert do_expansion(tree, 0) == 0
+    final_board, game_status = run_simulation(tree, 0, PLAYER2)
+    assert game_status == GameState.IS_LOST
 
 
 def test_do_selection():
     from agents.agent_mcts.mcts import do_selection, do_expansion
 
-    parent_node_1 = MCTSNode(b1, PLAYER2)
-    for _ in parent_node_1.children_index:
-        do_expansion(parent_node_1)
-    assert do_selection(parent_node_1) == parent_node_1.children[0]
+    tree_1 = MCTSTree.from_array(b1, PLAYER2)
+    for _ in range(7):
+        do_expansion(tree_1, 0)
+    assert do_selection(tree_1) == tree_1.children(0)[0]
 
-    parent_node_2 = MCTSNode(b1, PLAYER2)
-    for i in parent_node_2.children_index:
-        n = do_expansion(parent_node_2)
+    tree_2 = MCTSTree.from_array(b1, PLAYER2)
+    for i in range(7):
+        n = do_expansion(tree_2, 0)
         if i == 4:
-            n.wins = 2
-            n.wins = 2
-        print(i)
-    assert do_selection(parent_node_2) == parent_node_2.children[4]
+            tree_2.wins[n] = 2
+    assert do_selection(tree_2) == tree_2.children(0)[4]
+
+    # a node with unexpanded columns is a leaf
+    tree, child_1, child_2, _ = sample_tree()
+    assert do_selection(tree) == 0
 
 
 def test_back_propagate_statistics():
     from agents.agent_mcts.mcts import back_propagate_statistics
 
-    back_propagate_statistics(grandchild_1, PLAYER1)
-    assert grandchild_1.wins == 0
-    assert grandchild_1.plays == 2
-    assert child_1.wins == 2
-    assert child_1.plays == 11
-    assert parent_node.plays == 21
-    assert parent_node.wins == 10
-    assert child_2.wins == 9
-    assert child_2.plays == 10
+    tree, child_1, child_2, grandchild_1 = sample_tree()
+    back_propagate_statistics(tree, grandchild_1, PLAYER1)
+    assert tree.wins[grandchild_1] == 0
+    assert tree.plays[grandchild_1] == 2
+    assert tree.wins[child_1] == 2
+    assert tree.plays[child_1] == 11
+    assert tree.plays[0] == 21
+    assert tree.wins[0] == 10
+    assert tree.wins[child_2] == 9
+    assert tree.plays[child_2] == 10
+
+
+def test_mcts_algorithm():
+    import time
+    from agents.agent_mcts.mcts import mcts_algorithm
+
+    mcts_tree, simulations = mcts_algorithm(b1, PLAYER1, 50)
+    assert simulations == 50
+    assert mcts_tree.plays[0] == 51
+
+    t0 = time.monotonic()
+    mcts_tree, simulations = mcts_algorithm(b1, PLAYER1, None, time_budget=0.2)
+    assert time.monotonic() - t0 < 0.5
+    assert simulations > 0
+    assert mcts_tree.plays[0] == simulations + 1
+
+    mcts_tree, simulations = mcts_algorithm(b1, PLAYER1, 10, time_budget=10.)
+    assert simulations == 10
+
+
+def test_mcts_algorithm_memory_budget():
+    from agents.agent_mcts.mcts import mcts_algorithm
+
+    mcts_tree, simulations = mcts_algorithm(b1, PLAYER1, 100, memory_bytes=10 * MCTSTree.NODE_BYTES)
+    assert simulations == 100
+    assert mcts_tree.size <= 10
+    assert mcts_tree.plays[0] == 101
+
+
+def test_generate_move_mcts():
+    from agents.agent_mcts.mcts import generate_move_mcts
+
+    next_move, saved_state = generate_move_mcts(b1, PLAYER1, None, trials=None, time_budget=0.2)
+    assert 0 <= next_move <= 6
+
+
+def test_find_subtree():
+    from agents.agent_mcts.mcts import mcts_algorithm, find_subtree
+    from agents.common import apply_player_action
+
+    mcts_tree, _ = mcts_algorithm(b1, PLAYER1, 200)
+    child = mcts_tree.child(0, 3)
+    grandchild = mcts_tree.children(child)[0]
+    board = apply_player_action(b1, PlayerAction(3), PLAYER1, copy=True)
+    board = apply_player_action(board, PlayerAction(mcts_tree.move[grandchild]), PLAYER2)
+
+    subtree = find_subtree(mcts_tree, 0, board, PLAYER1)
+    assert subtree.plays[0] == mcts_tree.plays[grandchild]
+    assert np.all(subtree.board(0) == board)
+    assert find_subtree(mcts_tree, 0, board, PLAYER2) is None
+
+
+def test_generate_move_mcts_tree_reuse():
+    from agents.agent_mcts.mcts import generate_move_mcts, mcts_algorithm, find_subtree, MCTSSavedState
+    from agents.common import apply_player_action
+
+    next_move, saved_state = generate_move_mcts(b1, PLAYER1, None, trials=300)
+    assert isinstance(saved_state, MCTSSavedState)
+    played_node = saved_state.node
+    assert saved_state.mcts_tree.move[played_node] == next_move
+    reply_node = saved_state.mcts_tree.children(played_node)[0]
+    reply = saved_state.mcts_tree.move[reply_node]
+    reply_plays = saved_state.mcts_tree.plays[reply_node]
+    assert reply_plays > 1
+
+    board = apply_player_action(b1, next_move, PLAYER1, copy=True)
+    board = apply_player_action(board, PlayerAction(reply), PLAYER2)
+    mcts_tree = find_subtree(saved_state.mcts_tree, played_node, board, PLAYER1, 1)
+    assert mcts_tree.plays[0] == reply_plays
+    # the search continues from the statistics of the reply's node
+    mcts_tree, simulations = mcts_algorithm(board, PLAYER1, 10, mcts_tree=mcts_tree)
+    assert mcts_tree.plays[0] == reply_plays + 10
+
+    next_move, saved_state = generate_move_mcts(board, PLAYER1, saved_state, trials=10)
+    assert 0 <= next_move <= 6
+
+
+def test_generate_move_mcts_mirrored_tree_reuse():
+    from agents.agent_mcts.mcts import generate_move_mcts, mcts_algorithm, MCTSSavedState
+    from agents.common import apply_player_action, initialize_game_state
+
+    board = initialize_game_state()
+    mcts_tree, _ = mcts_algorithm(board, PLAYER1, 300)
+    # only the left half of the symmetric boards is expanded
+    assert [mcts_tree.move[c] for c in mcts_tree.children(0)] == [0, 1, 2, 3]
+    center = mcts_tree.child(0, 3)
+    assert all(mcts_tree.move[c] <= 3 for c in mcts_tree.children(center))
+    reply_node = mcts_tree.child(center, 2)
+    reply_plays = mcts_tree.plays[reply_node]
+
+    # the reply in column 4 is found as the mirror image of the reply in column 2
+    apply_player_action(board, PlayerAction(3), PLAYER1)
+    apply_player_action(board, PlayerAction(4), PLAYER2)
+    next_move, saved_state = generate_move_mcts(board, PLAYER1, MCTSSavedState(mcts_tree, center), trials=10,
+                                                opening_book=None)
+    assert saved_state.mirrored
+    assert saved_state.mcts_tree.plays[0] == reply_plays + 10
+    # the move is mirrored back to the orientation of the board
+    assert saved_state.mcts_tree.move[saved_state.node] == 6 - next_move
+
+
+def test_parallel_mcts_algorithm():
+    from concurrent.futures import ProcessPoolExecutor
+    from agents.agent_mcts.mcts import parallel_mcts_algorithm, root_statistics
+
+    plays, wins, simulations = root_statistics(b1, PLAYER1, 50, None, 1)
+    assert simulations == 50
+    # every simulation went through one child of the root, which started with 1 play
+    assert plays.sum() == 50 + 7
+
+    plays, wins, simulations = parallel_mcts_algorithm(b1, PLAYER1, 50, workers=2, seed=1)
+    assert simulations == 100
+    assert plays.sum() == 100 + 2 * 7
+    assert np.all(wins <= plays)
+
+    # the same seed gives the same statistics, in any process pool
+    with ProcessPoolExecutor(2) as executor:
+        plays_2, wins_2, _ = parallel_mcts_algorithm(b1, PLAYER1, 50, workers=2, seed=1, executor=executor)
+    assert np.all(plays == plays_2)
+    assert np.all(wins == wins_2)
+
+
+def test_generate_move_mcts_parallel():
+    from agents.agent_mcts.mcts import generate_move_mcts
+
+    next_move, saved_state = generate_move_mcts(b1, PLAYER1, None, trials=100, workers=2)
+    assert 0 <= next_move <= 6
+
+
+def test_mcts_algorithm_simulations_per_leaf():
+    from agents.agent_mcts.mcts import mcts_algorithm
+
+    mcts_tree, simulations = mcts_algorithm(b1, PLAYER1, 400, simulations_per_leaf=8)
+    assert simulations == 400
+    assert mcts_tree.plays[0] == 401
+    children = mcts_tree.children(0)
+    assert mcts_tree.plays[children].sum() == 400 + len(children)
+
+
+def test_generate_move_mcts_simulations_per_leaf():
+    from agents.agent_mcts.mcts import generate_move_mcts, root_statistics
+
+    next_move, saved_state = generate_move_mcts(b1, PLAYER1, None, trials=320, simulations_per_leaf=32)
+    assert 0 <= next_move <= 6
+    assert saved_state.mcts_tree.plays[0] == 321
+    plays, wins, simulations = root_statistics(b1, PLAYER1, 64, None, 1, simulations_per_leaf=16)
+    assert simulations == 64 and plays.sum() == 64 + np.count_nonzero(plays)
+
+
+def test_mcts_algorithm_profiling(capsys):
+    from agents.agent_mcts.mcts import mcts_algorithm
+    from agents.agent_mcts.profiling import PHASES
+
+    collected = []
+    mcts_tree, simulations = mcts_algorithm(b1, PLAYER1, 200, profiling=collected.append)
+    stats, = collected
+    assert stats.iterations == stats.simulations == 200
+    assert stats.tree_size == mcts_tree.size
+    assert 0 < stats.expansions <= mcts_tree.size
+    assert 1 <= stats.mean_selection_depth <= stats.max_selection_depth
+    assert 0 < stats.mean_playout_length <= 42 - 13
+    assert stats.playouts_per_second > 0
+    assert 0 < sum(stats.phase_times.values()) <= stats.elapsed
+    assert set(stats.as_dict()) >= {f'{phase}_time' for phase in PHASES}
+
+    mcts_algorithm(b1, PLAYER1, 20, profiling=collected.append, simulations_per_leaf=4)
+    assert collected[1].simulations == 20
+    assert collected[1].iterations == 5
+    assert collected[1].playouts == 0
+
+    mcts_algorithm(b1, PLAYER1, 10, profiling=True)
+    assert 'Simulations: 10' in capsys.readouterr().out
@@ -0,0 +1,90 @@
+import numpy as np
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, PlayerAction
+
+b1 = np.empty((6, 7), dtype=BoardPiece)
+b1.fill(NO_PLAYER)
+b1[0, 1] = PLAYER2
+b1[1, 1] = PLAYER2
+b1[0, 2] = PLAYER2
+b1[2, 2] = PLAYER2
+b1[1, 3] = PLAYER2
+b1[1, 4] = PLAYER2
+b1[1, 2] = PLAYER1
+b1[3, 2] = PLAYER1
+b1[0, 3] = PLAYER1
+b1[2, 3] = PLAYER1
+b1[3, 3] = PLAYER1
+b1[0, 4] = PLAYER1
+b1[2, 4] = PLAYER1
+'''|==============|
+|              |
+|              |
+|    X X       |
+|    O X X     |
+|  O X O O     |
+|  O O X X     |
+|==============|
+|0 1 2 3 4 5 6 |'''
+
+b2 = np.empty((6, 7), dtype=BoardPiece)
+b2.fill(NO_PLAYER)
+b2[0:3, 0] = PLAYER1
+b2[0:2, 6] = PLAYER2
+b2[0, 5] = PLAYER2
+b2[1:6, 3] = [PLAYER1, PLAYER2, PLAYER1, PLAYER2, PLAYER1]
+b2[0, 3] = PLAYER2
+'''|==============|
+|      X       |
+|      O       |
+|      X       |
+|X     O       |
+|X     X     O |
+|X     O   O O |
+|==============|
+|0 1 2 3 4 5 6 |'''
+
+
+def test_batch_mcts_algorithm():
+    from agents.agent_mcts.batch import batch_mcts_algorithm
+    from agents.agent_mcts.tree import MCTSTree
+
+    mcts_trees = [MCTSTree.from_array(b1, PLAYER1), MCTSTree.from_array(b1, PLAYER2), MCTSTree.from_array(b2, PLAYER1)]
+    simulations = batch_mcts_algorithm(mcts_trees, [PLAYER1, PLAYER2, PLAYER1], 50)
+    assert simulations == 50
+    assert all(mcts_tree.plays[0] == 51 for mcts_tree in mcts_trees)
+
+    simulations = batch_mcts_algorithm(mcts_trees, [PLAYER1, PLAYER2, PLAYER1], 40, simulations_per_leaf=4)
+    assert simulations == 40
+    assert all(mcts_tree.plays[0] == 91 for mcts_tree in mcts_trees)
+    # every simulation went through one child of the root, which started with 1 play
+    assert all(mcts_tree.plays[mcts_tree.children(0)].sum() == 90 + mcts_tree.n_children[0]
+               for mcts_tree in mcts_trees)
+
+
+def test_generate_moves_mcts():
+    from agents.agent_mcts.batch import generate_moves_mcts
+    from agents.agent_mcts.mcts import MCTSSavedState
+    from agents.common import apply_player_action
+
+    np.random.seed(0)
+    boards = np.stack([b1, b2, b1])
+    players = np.array([PLAYER1, PLAYER1, PLAYER2])
+    actions, saved_states = generate_moves_mcts(boards, players, None, trials=300, opening_book=None)
+    assert actions.shape == (3,)
+    assert all(0 <= action <= 6 for action in actions)
+    assert actions[1] == 0  # the win in column 0
+    assert all(isinstance(saved_state, MCTSSavedState) for saved_state in saved_states)
+
+    # the next search continues the tree of the reply
+    saved_state = saved_states[0]
+    reply_node = saved_state.mcts_tree.children(saved_state.node)[0]
+    reply_plays = saved_state.mcts_tree.plays[reply_node]
+    board = apply_player_action(b1, actions[0], PLAYER1, copy=True)
+    apply_player_action(board, PlayerAction(saved_state.mcts_tree.move[reply_node]), PLAYER2)
+    actions, saved_states = generate_moves_mcts(board[None], PLAYER1, [saved_state], trials=10, opening_book=None)
+    assert saved_states[0].mcts_tree.plays[0] == reply_plays + 10
+
+    # the empty board is answered by the opening book, which keeps the saved state
+    actions, saved_states = generate_moves_mcts(np.zeros((1, 6, 7), BoardPiece), PLAYER1, [saved_state], trials=10)
+    assert actions[0] == 3
+    assert saved_states[0] is saved_state
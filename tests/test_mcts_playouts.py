@@ -0,0 +1,97 @@
+import numpy as np
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, PlayerAction, GameState
+
+b1 = np.empty((6, 7), dtype=BoardPiece)
+b1.fill(NO_PLAYER)
+b1[0, 1] = PLAYER2
+b1[1, 1] = PLAYER2
+b1[0, 2] = PLAYER2
+b1[2, 2] = PLAYER2
+b1[1, 3] = PLAYER2
+b1[1, 4] = PLAYER2
+b1[1, 2] = PLAYER1
+b1[3, 2] = PLAYER1
+b1[0, 3] = PLAYER1
+b1[2, 3] = PLAYER1
+b1[3, 3] = PLAYER1
+b1[0, 4] = PLAYER1
+b1[2, 4] = PLAYER1
+'''|==============|
+|              |
+|              |
+|    X X       |
+|    O X X     |
+|  O X O O     |
+|  O O X X     |
+|==============|
+|0 1 2 3 4 5 6 |'''
+
+b2 = b1.copy()
+b2[1, 2] = PLAYER2
+'''|==============|
+|              |
+|              |
+|    X X       |
+|    O X X     |
+|  O O O O     |
+|  O O X X     |
+|==============|
+|0 1 2 3 4 5 6 |'''
+
+
+def test_bitboards_connected_four():
+    from agents.agent_mcts.playouts import bitboards_connected_four
+    from agents.common import board_to_bitboard, bitboard_connected_four
+
+    pieces = np.array([board_to_bitboard(b, p) for b in (b1, b2) for p in (PLAYER1, PLAYER2)], np.uint64)
+    assert list(bitboards_connected_four(pieces)) == [bitboard_connected_four(int(p)) for p in pieces]
+    assert list(bitboards_connected_four(pieces)) == [False, False, False, True]
+
+
+def test_random_playouts():
+    from agents.agent_mcts.playouts import random_playouts
+    from agents.bitboard import BitBoard
+
+    n_games = 200
+    bitboard = BitBoard.from_array(b1)
+    winners = random_playouts(np.full(n_games, bitboard.player1_pieces, np.uint64),
+                              np.full(n_games, bitboard.player2_pieces, np.uint64),
+                              np.tile(bitboard.heights, (n_games, 1)), np.full(n_games, PLAYER1))
+    assert winners.shape == (n_games,)
+    assert np.all(np.isin(winners, [NO_PLAYER, PLAYER1, PLAYER2]))
+    assert np.any(winners == PLAYER1)
+    assert np.any(winners == PLAYER2)
+
+    # a finished game is not played further
+    bitboard = BitBoard.from_array(b2)
+    winners = random_playouts(np.array([bitboard.player1_pieces], np.uint64),
+                              np.array([bitboard.player2_pieces], np.uint64), [bitboard.heights], [PLAYER1])
+    assert winners[0] == PLAYER2
+
+
+def test_random_playouts_win_rate():
+    from agents.agent_mcts.playouts import random_playouts
+    from agents.agent_mcts.mcts import run_simulation
+    from agents.agent_mcts.tree import MCTSTree
+    from agents.bitboard import BitBoard
+
+    # the vectorized playouts play the same random games as run_simulation
+    np.random.seed(0)
+    n_games = 2000
+    bitboard = BitBoard.from_array(b1)
+    winners = random_playouts(np.full(n_games, bitboard.player1_pieces, np.uint64),
+                              np.full(n_games, bitboard.player2_pieces, np.uint64),
+                              np.tile(bitboard.heights, (n_games, 1)), np.full(n_games, PLAYER1))
+    tree = MCTSTree(bitboard, PLAYER1)
+    results = [run_simulation(tree, 0, PLAYER1)[1] for _ in range(n_games)]
+    win_rate = np.mean(winners == PLAYER1)
+    assert abs(win_rate - np.mean([r == GameState.IS_WIN for r in results])) < 0.06
+
+
+def test_bitboards_heights():
+    from agents.agent_mcts.playouts import bitboards_heights
+    from agents.bitboard import BitBoard
+
+    bitboards = [BitBoard.from_array(b) for b in (b1, b2, np.zeros_like(b1))]
+    pieces = np.array([bitboard.mask() for bitboard in bitboards], np.uint64)
+    assert bitboards_heights(pieces).tolist() == [bitboard.heights for bitboard in bitboards]
@@ -0,0 +1,62 @@
+import numpy as np
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, PlayerAction, GameState
+from agents.agent_mcts.tree import MCTSTree
+
+
+def test_add_node():
+    from agents.bitboard import BitBoard
+    from agents.common import initialize_game_state
+
+    # on the symmetric empty board, only the left half of the moves is expanded
+    assert MCTSTree(BitBoard(), PLAYER1).untried[0] == 0b0001111
+
+    bitboard = BitBoard()
+    bitboard.apply_action(PlayerAction(0), PLAYER2)
+    tree = MCTSTree(bitboard, PLAYER1, initial_capacity=2)
+    assert tree.size == 1
+    assert tree.untried[0] == 0b1111111
+    for col in range(7):
+        child_board = bitboard.copy()
+        child_board.apply_action(PlayerAction(col), PLAYER1)
+        assert tree.add_node(0, col, PLAYER2, child_board) == col + 1
+    # the arrays grew from 2 to 8 nodes
+    assert tree.capacity == 8
+    assert tree.children(0) == [1, 2, 3, 4, 5, 6, 7]
+    assert tree.first_child[0] == 1
+    assert tree.n_children[0] == 7
+    assert tree.child(0, 3) == 4
+    assert tree.parent[4] == 0
+    board = initialize_game_state()
+    board[0, 0] = PLAYER2
+    board[0, 3] = PLAYER1
+    assert np.all(tree.board(4) == board)
+    assert tree.bitboard(4).heights == [1, 0, 0, 1, 0, 0, 0]
+
+
+def test_memory_budget():
+    from agents.bitboard import BitBoard
+
+    # the root and the block of its 7 children fit, the children of a child don't
+    tree = MCTSTree(BitBoard(0, 1, [1, 0, 0, 0, 0, 0, 0]), PLAYER1, memory_bytes=10 * MCTSTree.NODE_BYTES)
+    assert tree.add_node(0, 0, PLAYER2, BitBoard()) == 1
+    assert tree.add_node(0, 1, PLAYER2, BitBoard()) == 2
+    assert tree.size == 8
+    assert tree.add_node(1, 0, PLAYER1, BitBoard()) == -1
+    assert tree.size == 8
+
+
+def test_subtree():
+    from agents.agent_mcts.mcts import mcts_algorithm
+
+    tree, _ = mcts_algorithm(np.zeros((6, 7), BoardPiece), PLAYER1, 300)
+    child = tree.child(0, 2)
+    subtree = tree.subtree(child)
+    assert subtree.plays[0] == tree.plays[child]
+    assert subtree.parent[0] == -1
+    assert np.all(subtree.board(0) == tree.board(child))
+    assert [subtree.move[c] for c in subtree.children(0)] == [tree.move[c] for c in tree.children(child)]
+    # the links are remapped to the new node numbers
+    for node in range(subtree.size):
+        for c in subtree.children(node):
+            assert subtree.parent[c] == node
+            assert subtree.plays[c] <= subtree.plays[node]
@@ -150,3 +150,78 @@ def test_minimax_algorithm():
     score4 = minimax_algorithm(b1, PLAYER1, PLAYER1, 2)
     assert score4 < 1000
     assert score4 > -1000
+
+
+def test_minimax_algorithm_transposition_table():
+    from agents.agent_minimax.minimax import minimax_algorithm
+    from agents.transposition import TranspositionTable
+
+    table = TranspositionTable()
+    score = minimax_algorithm(b1, PLAYER1, PLAYER1, 3, transposition_table=table)
+    assert score == minimax_algorithm(b1, PLAYER1, PLAYER1, 3)
+    assert table.stats()['stores'] > 0
+    # the second search is answered from the table
+    assert score == minimax_algorithm(b1, PLAYER1, PLAYER1, 3, transposition_table=table)
+    assert table.stats()['hits'] > 0
+
+
+def test_generate_move_minimax():
+    from agents.agent_minimax.minimax import generate_move_minimax
+
+    # column 6 wins for PLAYER1 and must be blocked by PLAYER2
+    next_move, saved_state = generate_move_minimax(b3, PLAYER1, None, 2)
+    assert next_move == 6
+    next_move, saved_state = generate_move_minimax(b3, PLAYER2, None, 2)
+    assert next_move == 6
+
+
+def test_generate_move_minimax_time_budget():
+    import time
+    from agents.agent_minimax.minimax import generate_move_minimax
+
+    t0 = time.monotonic()
+    next_move, saved_state = generate_move_minimax(b3, PLAYER1, None, time_budget=0.5)
+    assert time.monotonic() - t0 < 1.
+    assert next_move == 6
+
+
+def test_minimax_algorithm_restores_board():
+    from agents.agent_minimax.minimax import minimax_algorithm
+    from agents.transposition import TranspositionTable
+
+    board = b1.copy()
+    minimax_algorithm(board, PLAYER1, PLAYER1, 3, transposition_table=TranspositionTable())
+    assert np.all(board == b1)
+
+    # only the legal moves are searched: a board with full columns gives the same score as without them
+    full = b1.copy()
+    full[:, 5] = [PLAYER1, PLAYER2, PLAYER2, PLAYER1, PLAYER2, PLAYER1]
+    score = minimax_algorithm(full, PLAYER2, PLAYER2, 2)
+    assert np.all(full[:, 5] == [PLAYER1, PLAYER2, PLAYER2, PLAYER1, PLAYER2, PLAYER1])
+    assert score == minimax_algorithm(full, PLAYER2, PLAYER2, 2, transposition_table=TranspositionTable())
+
+
+def test_minimax_algorithm_move_ordering():
+    from agents.agent_minimax.minimax import minimax_algorithm
+    from agents.agent_minimax.ordering import MoveOrdering
+
+    # the ordering changes how much is pruned, not the score
+    plain_nodes = [0] * 5
+    score = minimax_algorithm(b1, PLAYER1, PLAYER1, 4, nodes=plain_nodes)
+    ordered_nodes = [0] * 5
+    assert score == minimax_algorithm(b1, PLAYER1, PLAYER1, 4, ordering=MoveOrdering(), nodes=ordered_nodes)
+    assert plain_nodes[4] == ordered_nodes[4] == 1
+    assert sum(ordered_nodes) < sum(plain_nodes)
+
+
+def test_generate_move_minimax_saved_state():
+    from agents.agent_minimax.minimax import generate_move_minimax, MinimaxSavedState
+
+    next_move, saved_state = generate_move_minimax(b1, PLAYER1, None, 3)
+    assert isinstance(saved_state, MinimaxSavedState)
+    assert len(saved_state.search_nodes) == 1
+    assert len(saved_state.search_nodes[0]) == 3
+    table = saved_state.transposition_table
+    # the table and the ordering are reused for the next move
+    next_move, saved_state2 = generate_move_minimax(b1, PLAYER2, saved_state, 3)
+    assert saved_state2.transposition_table is table
@@ -0,0 +1,106 @@
+import numpy as np
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2
+
+b1 = np.empty((6, 7), dtype=BoardPiece)
+b1.fill(NO_PLAYER)
+b1[0, 1] = PLAYER2
+b1[1, 1] = PLAYER2
+b1[0, 2] = PLAYER2
+b1[2, 2] = PLAYER2
+b1[1, 3] = PLAYER2
+b1[1, 4] = PLAYER2
+b1[1, 2] = PLAYER1
+b1[3, 2] = PLAYER1
+b1[0, 3] = PLAYER1
+b1[2, 3] = PLAYER1
+b1[3, 3] = PLAYER1
+b1[0, 4] = PLAYER1
+b1[2, 4] = PLAYER1
+'''|==============|
+|              |
+|              |
+|    X X       |
+|    O X X     |
+|  O X O O     |
+|  O O X X     |
+|==============|
+|0 1 2 3 4 5 6 |'''
+
+b2 = np.empty((6, 7), dtype=BoardPiece)
+b2.fill(NO_PLAYER)
+b2[0:3, 0] = PLAYER1
+b2[0:2, 6] = PLAYER2
+b2[0, 5] = PLAYER2
+b2[1:6, 3] = [PLAYER1, PLAYER2, PLAYER1, PLAYER2, PLAYER1]
+b2[0, 3] = PLAYER2
+'''|==============|
+|      X       |
+|      O       |
+|      X       |
+|X     O       |
+|X     X     O |
+|X     O   O O |
+|==============|
+|0 1 2 3 4 5 6 |'''
+
+
+def test_window_codes():
+    from agents.agent_minimax.batch import window_codes, WINDOW_CODE_SCORES
+    from agents.agent_minimax.evaluation import evaluate_board
+
+    codes = window_codes(np.stack([b1, b2]))
+    assert codes.shape == (2, 70)
+    assert np.all(codes[:, -1] == 0)
+    assert WINDOW_CODE_SCORES[codes[0]].sum() == evaluate_board(b1, PLAYER1)
+    assert WINDOW_CODE_SCORES[codes[1]].sum() == evaluate_board(b2, PLAYER1)
+
+
+def test_batch_negamax():
+    from agents.agent_minimax.batch import batch_negamax
+    from agents.agent_minimax.negamax import NegamaxSearch, INF
+
+    boards = np.stack([b1, b1, b2])
+    players = np.array([PLAYER1, PLAYER2, PLAYER1])
+    for depth in (1, 3):
+        move_scores = batch_negamax(boards, players, depth)
+        assert move_scores.shape == (3, 7)
+        for board, player, scores in zip(boards, players, move_scores):
+            for move in range(7):
+                if board[-1, move] != NO_PLAYER:
+                    assert scores[move] == -INF
+                    continue
+                # the same scores as the alpha-beta search
+                search = NegamaxSearch(board, player)
+                search.make(move)
+                assert scores[move] == -search.negamax(depth - 1, -INF, INF)
+
+
+def test_generate_moves_minimax():
+    from agents.agent_minimax.batch import generate_moves_minimax
+    from agents.agent_minimax.minimax import generate_move_minimax
+    from agents.common import initialize_game_state
+
+    boards = np.stack([b1, b2, b1, initialize_game_state()])
+    players = np.array([PLAYER1, PLAYER1, PLAYER2, PLAYER1])
+    actions, saved_states = generate_moves_minimax(boards, players, None, 3)
+    assert actions.shape == (4,)
+    assert len(saved_states) == 4
+    assert actions[1] == 0  # the win in column 0
+    for board, player, action in zip(boards[:3], players, actions):
+        expected, _ = generate_move_minimax(board, player, None, 3, opening_book=None)
+        assert action == expected
+    # the empty board is answered by the opening book, which keeps the saved state
+    assert actions[3] == 3
+    assert saved_states[3] is None
+
+
+def test_generate_moves_minimax_chunks(monkeypatch):
+    from agents.agent_minimax import batch
+
+    boards = np.stack([b1, b2, b1, b2, b1])
+    players = np.array([PLAYER1, PLAYER1, PLAYER2, PLAYER2, PLAYER1])
+    expected, _ = batch.generate_moves_minimax(boards, players, None, 3, opening_book=None)
+    # two boards per chunk
+    monkeypatch.setattr(batch, 'BATCH_LEAVES', 2 * 7 ** 3)
+    actions, _ = batch.generate_moves_minimax(boards, players, None, 3, opening_book=None)
+    assert np.all(actions == expected)
@@ -0,0 +1,77 @@
+import numpy as np
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, find_opponent
+
+b1 = np.empty((6, 7), dtype=BoardPiece)
+b1.fill(NO_PLAYER)
+b1[0, 1] = PLAYER2
+b1[1, 1] = PLAYER2
+b1[0, 2] = PLAYER2
+b1[2, 2] = PLAYER2
+b1[1, 3] = PLAYER2
+b1[1, 4] = PLAYER2
+b1[1, 2] = PLAYER1
+b1[3, 2] = PLAYER1
+b1[0, 3] = PLAYER1
+b1[2, 3] = PLAYER1
+b1[3, 3] = PLAYER1
+b1[0, 4] = PLAYER1
+b1[2, 4] = PLAYER1
+
+
+def full_width_negamax(search, depth):
+    # reference: the negamax value without any pruning
+    from agents.agent_minimax.negamax import WIN_SCORE
+
+    lost = search.bitboard.connected_four(find_opponent(search.player))
+    moves = search.bitboard.possible_moves()
+    if depth == 0 or lost or not moves:
+        return search.evaluator.evaluate(search.player) - (WIN_SCORE * (depth + 1) if lost else 0)
+    scores = []
+    for move in moves:
+        row = search.make(move)
+        scores.append(-full_width_negamax(search, depth - 1))
+        search.unmake(move, row)
+    return max(scores)
+
+
+def test_negamax():
+    from agents.agent_minimax.negamax import NegamaxSearch, INF
+    from agents.transposition import TranspositionTable
+    from agents.agent_minimax.ordering import MoveOrdering
+
+    for player in (PLAYER1, PLAYER2):
+        expected = full_width_negamax(NegamaxSearch(b1, player), 3)
+        assert NegamaxSearch(b1, player).negamax(3, -INF, INF) == expected
+        search = NegamaxSearch(b1, player, TranspositionTable(), MoveOrdering())
+        assert search.negamax(3, -INF, INF) == expected
+        # the position is restored after the search
+        assert np.all(search.bitboard.to_array() == b1)
+        assert search.player == player
+
+
+def test_search_root_and_aspiration():
+    from agents.agent_minimax.negamax import NegamaxSearch
+
+    move, score = NegamaxSearch(b1, PLAYER1).search_root(4, list(range(7)))
+    # a good or a bad guess only changes the window, not the result
+    for guess in (score, score + 1000, score - 1000):
+        assert NegamaxSearch(b1, PLAYER1).search_aspiration(4, list(range(7)), guess) == (move, score)
+
+
+def test_negamax_symmetry():
+    from agents.agent_minimax.negamax import NegamaxSearch, INF
+    from agents.transposition import TranspositionTable
+    from agents.common import initialize_game_state
+
+    board = initialize_game_state()
+    search = NegamaxSearch(board, PLAYER1)
+    assert search.key == search.mirror_key
+    table = TranspositionTable()
+    search = NegamaxSearch(board, PLAYER1, table)
+    assert search.negamax(3, -INF, INF) == full_width_negamax(NegamaxSearch(board, PLAYER1), 3)
+    # the right half of the empty board is not searched, even if it comes first
+    assert search.search_root(3, [6, 5, 4, 3, 2, 1, 0])[0] <= 3
+    # a board and its mirror image share their entries
+    mirror = NegamaxSearch(b1[:, ::-1], PLAYER1, table)
+    assert mirror.key == NegamaxSearch(b1, PLAYER1).mirror_key
+    assert NegamaxSearch(b1, PLAYER1, table).negamax(3, -INF, INF) == mirror.negamax(3, -INF, INF)
@@ -0,0 +1,51 @@
+import numpy as np
+from agents.common import PLAYER1, PLAYER2, PlayerAction, initialize_game_state, apply_player_action
+
+
+def test_book_positions():
+    from agents.opening_book import book_positions
+
+    # mirror images are merged: 7 first moves give 4 positions
+    assert [len(book_positions(plies)) for plies in range(4)] == [1, 5, 30, 151]
+
+
+def test_opening_book(tmp_path):
+    from agents.opening_book import build_opening_book, OpeningBook
+
+    book = build_opening_book(2, depth=2)
+    assert len(book) == 30
+    board = initialize_game_state()
+    assert book.lookup(board) is not None
+    apply_player_action(board, PlayerAction(1), PLAYER1)
+    move = book.lookup(board)
+    # the mirrored board gets the mirrored move
+    assert book.lookup(board[:, ::-1]) == 6 - move
+    apply_player_action(board, PlayerAction(1), PLAYER2)
+    apply_player_action(board, PlayerAction(1), PLAYER1)
+    assert book.lookup(board) is None
+
+    path = str(tmp_path / 'book.bin')
+    book.save(path)
+    loaded = OpeningBook.load(path)
+    assert loaded.plies == 2
+    assert np.all(loaded.keys == book.keys)
+    assert np.all(loaded.moves == book.moves)
+
+
+def test_agents_use_opening_book():
+    from agents.opening_book import OpeningBook
+    from agents.agent_minimax import generate_move as generate_move_minimax
+    from agents.agent_mcts import generate_move as generate_move_mcts
+    from agents.bitboard import BitBoard
+
+    # a book that always plays column 0 on the empty board
+    book = OpeningBook(np.array([BitBoard().key()], np.uint64), np.array([0]), 0)
+    board = initialize_game_state()
+    assert generate_move_minimax(board, PLAYER1, None, opening_book=book)[0] == 0
+    assert generate_move_mcts(board, PLAYER1, None, trials=10, opening_book=book)[0] == 0
+    # a book move doesn't search, both agents keep their saved state
+    saved_state = object()
+    assert generate_move_minimax(board, PLAYER1, saved_state, opening_book=book)[1] is saved_state
+    assert generate_move_mcts(board, PLAYER1, saved_state, opening_book=book)[1] is saved_state
+    # outside of the book, the agents search
+    assert generate_move_minimax(board, PLAYER1, None, 1, opening_book=None)[0] == 3
@@ -0,0 +1,37 @@
+from agents.common import PLAYER1, PLAYER2
+
+
+def test_order_static():
+    from agents.agent_minimax.ordering import MoveOrdering, CENTER_FIRST
+
+    ordering = MoveOrdering()
+    assert ordering.order(list(range(7)), 0, PLAYER1) == list(CENTER_FIRST)
+    assert ordering.order([0, 1, 6], 0, PLAYER1) == [1, 0, 6]
+    # the transposition table move goes first
+    assert ordering.order(list(range(7)), 0, PLAYER1, 6)[0] == 6
+    assert MoveOrdering(static_order=range(7)).order([6, 3, 0], 0, PLAYER1) == [0, 3, 6]
+
+
+def test_order_killers_and_history():
+    from agents.agent_minimax.ordering import MoveOrdering
+
+    ordering = MoveOrdering()
+    ordering.update(0, 5, PLAYER1, 1)
+    ordering.update(6, 5, PLAYER1, 1)
+    # the killer moves of the ply come first, then the history scores
+    assert sorted(ordering.order(list(range(7)), 5, PLAYER1)[:2]) == [0, 6]
+    assert ordering.order(list(range(7)), 4, PLAYER1)[:3] == [0, 6, 3]
+    # the history is kept per player
+    assert ordering.order(list(range(7)), 4, PLAYER2)[0] == 3
+    ordering.update(1, 5, PLAYER1, 1)
+    assert ordering.killers[5] == [1, 6]
+
+    ordering.update(5, 4, PLAYER1, 4)
+    ordering.new_search()
+    assert ordering.killers[5] == []
+    assert ordering.history[0][5] == 8
+    assert ordering.order(list(range(7)), 5, PLAYER1)[0] == 5
+
+    no_killers = MoveOrdering(killers=False, history=False)
+    no_killers.update(0, 5, PLAYER1, 1)
+    assert no_killers.order(list(range(7)), 5, PLAYER1)[0] == 3
@@ -0,0 +1,92 @@
+import numpy as np
+from agents.common import PLAYER1, PLAYER2, PlayerAction, initialize_game_state, apply_player_action
+
+
+def store_in_other_process(path, value):
+    from agents.position_cache import PositionCache
+
+    cache = PositionCache(path)
+    cache.store(initialize_game_state(), value, PlayerAction(3), 5)
+    cache.close()
+
+
+def test_pack_entry():
+    from agents.position_cache import pack_entry, unpack_entry
+
+    for value, move, depth in ((0, 0, 0), (-900000, 6, 12), (123, 3, 255)):
+        assert unpack_entry(pack_entry(value, move, depth)) == (value, move, depth)
+
+
+def test_position_cache(tmp_path):
+    from agents.position_cache import PositionCache
+    from agents.bitboard import BitBoard
+
+    path = str(tmp_path / 'cache.bin')
+    cache = PositionCache(path, slots=1024)
+    board = initialize_game_state()
+    assert cache.probe(board) is None
+    cache.store(board, -12, PlayerAction(3), 4)
+    assert cache.probe(board) == (-12, 3, 4)
+
+    # mirrored boards share their entry
+    apply_player_action(board, PlayerAction(1), PLAYER1)
+    cache.store(board, 7, PlayerAction(2), 4)
+    assert cache.probe(board[:, ::-1]) == (7, 4, 4)
+    # a shallower search doesn't replace a deeper one
+    cache.store(board, 8, PlayerAction(1), 2)
+    assert cache.probe(board) == (7, 2, 4)
+
+    # a slot whose check doesn't match its data, as during a write, is a miss
+    apply_player_action(board, PlayerAction(1), PLAYER2)
+    cache.store(board, 1, PlayerAction(0), 1)
+    key, _ = BitBoard.from_array(board).canonical_key()
+    cache.table[key % cache.slots, 1] ^= np.uint64(1)
+    assert cache.probe(board) is None
+    cache.close()
+
+    # the file keeps its size and the entries of other processes are seen
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(1) as pool:
+        pool.submit(store_in_other_process, path, 42).result()
+    cache = PositionCache(path, slots=16)
+    assert cache.slots == 1024
+    assert cache.probe(initialize_game_state()) == (42, 3, 5)
+    cache.close()
+
+
+def test_agents_use_position_cache(tmp_path):
+    from agents.position_cache import PositionCache
+    from agents.agent_minimax import generate_move as generate_move_minimax
+    from agents.agent_mcts.mcts import generate_move_mcts, warm_start
+    from agents.agent_mcts.tree import MCTSTree
+
+    cache = PositionCache(str(tmp_path / 'cache.bin'), slots=1024)
+    board = initialize_game_state()
+    apply_player_action(board, PlayerAction(0), PLAYER1)
+    apply_player_action(board, PlayerAction(0), PLAYER2)
+    apply_player_action(board, PlayerAction(0), PLAYER1)
+    apply_player_action(board, PlayerAction(0), PLAYER2)
+    apply_player_action(board, PlayerAction(6), PLAYER1)
+
+    move, saved_state = generate_move_minimax(board, PLAYER2, None, 3, opening_book=None, position_cache=cache)
+    assert cache.probe(board)[1:] == (move, 3)
+    # the cached move is played without searching
+    cache.store(board, 0, PlayerAction(5), 3)
+    move, saved_state = generate_move_minimax(board, PLAYER2, None, 3, opening_book=None, position_cache=cache)
+    assert move == 5
+    assert saved_state.search_nodes == []
+    # a deeper search still searches
+    move, saved_state = generate_move_minimax(board, PLAYER2, None, 4, opening_book=None, position_cache=cache)
+    assert len(saved_state.search_nodes) == 1
+
+    tree = MCTSTree.from_array(board, PLAYER2)
+    warm_start(tree, PlayerAction(5), 30)
+    child = tree.child(0, 5)
+    assert tree.plays[child] == tree.wins[child] + 1 == 31
+    assert tree.plays[0] == 31
+    _, cached_move, cached_depth = cache.probe(board)
+    assert cached_depth == 4
+    move, saved_state = generate_move_mcts(board, PLAYER2, None, trials=10, opening_book=None,
+                                           position_cache=cache)
+    assert saved_state.mcts_tree.plays[saved_state.mcts_tree.child(0, cached_move)] > 40
+    cache.close()
@@ -32,3 +32,12 @@ def test_generate_move_random():
 
     next_move, saved_state = generate_move_random(b1, PLAYER1, None)
     assert next_move in range(6)
+
+
+def test_generate_moves_random():
+    from agents.agent_random.random import generate_moves_random
+
+    actions, saved_states = generate_moves_random(np.stack([b1, b1, b1]), np.array([PLAYER1, PLAYER2, PLAYER1]))
+    assert actions.shape == (3,)
+    assert np.all((0 <= actions) & (actions <= 6))
+    assert saved_states == [None, None, None]
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+
+
+def first_column(board, player, saved_state):
+    return np.int8(0), saved_state
+
+
+class CountingState(object):
+    """
+    A saved state that can't be pickled, so it can only stay in the worker process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.moves = 0
+
+
+def counting_move(board, player, saved_state):
+    # plays the columns 0, 1, 2... in turn, as long as the saved state is kept between the moves
+    saved_state = CountingState() if saved_state is None else saved_state
+    saved_state.moves += 1
+    return np.int8(saved_state.moves - 1), saved_state
+
+
+def slow_move(board, player, saved_state):
+    time.sleep(0.5)
+    return np.int8(0), saved_state
+
+
+def failing_move(board, player, saved_state):
+    raise RuntimeError('no move')
+
+
+def crashing_move(board, player, saved_state):
+    os._exit(1)
+
+
+def test_game_session():
+    from server import GameSession
+    from tournament import Agent
+    from agents.common import PLAYER1, PLAYER2
+
+    session = GameSession(1, Agent('first', first_column), PLAYER1, 0)
+    assert not session.play(7, PLAYER2)
+    for _ in range(3):
+        assert session.play(0, PLAYER1)
+        assert session.play(1, PLAYER2)
+    assert session.state == 'playing'
+    assert session.play(0, PLAYER1)
+    assert session.state == 'lost'
+    assert session.reply()['moves'] == [0, 1, 0, 1, 0, 1, 0]
+
+
+def test_handle_request():
+    from server import GameServer
+    from tournament import Agent
+
+    async def play():
+        server = GameServer([Agent('first', first_column)], executors=[ThreadPoolExecutor(1)])
+        sessions = {}
+        reply = await server.handle_request({'op': 'new', 'agent': 'first', 'first': 'agent'}, sessions)
+        assert reply['ok'] and reply['moves'] == [0] and reply['state'] == 'playing'
+        session = reply['session']
+        assert not (await server.handle_request({'op': 'new', 'agent': 'unknown'}, sessions))['ok']
+        assert not (await server.handle_request({'op': 'move', 'session': session, 'column': 9}, sessions))['ok']
+        assert not (await server.handle_request({'op': 'move', 'session': 99, 'column': 1}, sessions))['ok']
+        for _ in range(3):
+            reply = await server.handle_request({'op': 'move', 'session': session, 'column': 1}, sessions)
+        # the agent connected four in column 0
+        assert reply['moves'] == [0, 1, 0, 1, 0, 1, 0]
+        assert reply['state'] == 'lost'
+        assert session not in sessions
+        metrics = await server.handle_request({'op': 'metrics'}, sessions)
+        server.executors[0].shutdown()
+        return metrics
+
+    metrics = asyncio.run(play())
+    assert metrics['moves'] == 3
+    assert metrics['sessions'] == 0 and metrics['total_sessions'] == 1
+    assert metrics['queue_depth'] == 0 and metrics['max_queue_depth'] == 1
+    assert metrics['latency_p50_ms'] > 0.
+
+
+def test_move_timeout_and_busy():
+    from server import GameServer
+    from tournament import Agent
+
+    async def play():
+        server = GameServer([Agent('slow', slow_move)], move_timeout=0.05, executors=[ThreadPoolExecutor(1)])
+        sessions = {}
+        reply = await server.handle_request({'op': 'new', 'agent': 'slow', 'first': 'agent'}, sessions)
+        # the center-most column replaced the agent's move
+        assert reply['timeout'] and reply['moves'] == [3]
+        server.max_pending = 1  # the slow move still runs
+        busy = await server.handle_request({'op': 'move', 'session': reply['session'], 'column': 2}, sessions)
+        server.executors[0].shutdown()
+        return busy, server.metrics
+
+    busy, metrics = asyncio.run(play())
+    assert busy == {'ok': False, 'error': 'busy'}
+    assert metrics.timeouts == 1 and metrics.rejected == 1
+
+
+def test_load_test():
+    from server import GameServer, load_test
+    from tournament import Agent
+    from agents.agent_random.random import generate_move_random
+
+    async def run():
+        server = GameServer([Agent('random', generate_move_random)], executors=[ThreadPoolExecutor(1)])
+        tcp_server = await server.start()
+        results = await load_test('127.0.0.1', tcp_server.sockets[0].getsockname()[1], clients=3, games=2, seed=0)
+        await server.stop(tcp_server)
+        server.executors[0].shutdown()
+        return results
+
+    results = asyncio.run(run())
+    assert results['moves'] > 0 and results['errors'] == 0
+    assert results['server']['moves'] == results['moves']
+    assert results['server']['total_sessions'] == 6 and results['server']['sessions'] == 0
+
+
+def test_saved_states_stay_in_workers():
+    from server import GameServer
+    from tournament import Agent
+
+    async def play():
+        server = GameServer([Agent('counting', counting_move)], workers=2)
+        sessions = {}
+        try:
+            replies = [await server.handle_request({'op': 'new', 'agent': 'counting', 'first': 'agent'}, sessions)
+                       for _ in range(2)]
+            for _ in range(2):
+                for reply in replies:
+                    reply.update(await server.handle_request({'op': 'move', 'session': reply['session'],
+                                                              'column': 6}, sessions))
+            return replies, [session.worker for session in sessions.values()], server.metrics
+        finally:
+            server.close()
+
+    replies, workers, metrics = asyncio.run(play())
+    assert sorted(workers) == [0, 1]
+    for reply in replies:
+        assert reply['moves'] == [0, 6, 1, 6, 2]
+    assert metrics.errors == 0 and metrics.timeouts == 0
+
+
+def test_invalid_requests():
+    from server import GameServer
+    from tournament import Agent
+
+    async def run():
+        server = GameServer([Agent('first', first_column)], executors=[ThreadPoolExecutor(1)])
+        sessions = {}
+        session = (await server.handle_request({'op': 'new', 'agent': 'first'}, sessions))['session']
+        for request in ({'op': 'move', 'session': [1], 'column': 0}, {'op': 'close', 'session': str(session)},
+                        {'op': 'move', 'session': session, 'column': '0'},
+                        {'op': 'move', 'session': session, 'column': True}, {'op': 'move', 'session': session},
+                        {'op': 'new', 'agent': ['first']}, {'op': 'new', 'agent': 'first', 'first': 1}):
+            with pytest.raises(ValueError):
+                await server.handle_request(request, sessions)
+        assert list(sessions) == [session]
+
+        tcp_server = await server.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', tcp_server.sockets[0].getsockname()[1])
+        replies = []
+        for message in ({'op': 'move', 'session': [1]}, {'op': 'new', 'agent': 'first'}, {'op': 'metrics'}):
+            writer.write((json.dumps(message) + '\n').encode())
+            replies.append(json.loads(await reader.readline()))
+        writer.close()
+        await server.stop(tcp_server)
+        server.executors[0].shutdown()
+        return replies
+
+    invalid, new, metrics = asyncio.run(run())
+    # the connection outlives an invalid request
+    assert not invalid['ok'] and 'session' in invalid['error']
+    assert new['ok']
+    assert metrics['errors'] == 1
+
+
+def test_agent_failure():
+    from server import GameServer
+    from tournament import Agent
+
+    async def play():
+        server = GameServer([Agent('failing', failing_move), Agent('first', first_column)],
+                            executors=[ThreadPoolExecutor(1)])
+        sessions = {}
+        failed = await server.handle_request({'op': 'new', 'agent': 'failing', 'first': 'agent'}, sessions)
+        assert not sessions
+        session = (await server.handle_request({'op': 'new', 'agent': 'failing'}, sessions))['session']
+        failed_move = await server.handle_request({'op': 'move', 'session': session, 'column': 3}, sessions)
+        assert not sessions
+        reply = await server.handle_request({'op': 'new', 'agent': 'first', 'first': 'agent'}, sessions)
+        server.executors[0].shutdown()
+        return failed, failed_move, reply, server.metrics
+
+    failed, failed_move, reply, metrics = asyncio.run(play())
+    for error in (failed, failed_move):
+        assert not error['ok'] and 'no move' in error['error']
+    assert reply['ok'] and reply['moves'] == [0]
+    assert metrics.errors == 2 and metrics.sessions == 1 and metrics.queue_depth == 0
+
+
+def test_worker_crash():
+    from server import GameServer
+    from tournament import Agent
+
+    async def play():
+        server = GameServer([Agent('crashing', crashing_move), Agent('first', first_column)], workers=1)
+        sessions = {}
+        try:
+            crashed = await server.handle_request({'op': 'new', 'agent': 'crashing', 'first': 'agent'}, sessions)
+            # the dead worker was replaced
+            reply = await server.handle_request({'op': 'new', 'agent': 'first', 'first': 'agent'}, sessions)
+            return crashed, reply, server.metrics
+        finally:
+            server.close()
+
+    crashed, reply, metrics = asyncio.run(play())
+    assert not crashed['ok'] and 'crashing' in crashed['error']
+    assert reply['ok'] and reply['moves'] == [0]
+    assert metrics.errors == 1
@@ -0,0 +1,92 @@
+import numpy as np
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, GameState
+
+# b5: PLAYER2 wins by playing column 3, 9 cells are left
+b5 = np.full((6, 7), NO_PLAYER, dtype=BoardPiece)
+b5[:, 0] = [PLAYER1, PLAYER2, PLAYER1, PLAYER2, PLAYER1, PLAYER2]
+b5[:, 1] = [PLAYER2, PLAYER1, PLAYER2, PLAYER1, PLAYER2, PLAYER1]
+b5[:, 2] = [PLAYER1, PLAYER2, PLAYER1, PLAYER2, PLAYER1, PLAYER2]
+b5[:, 4] = [PLAYER2, PLAYER1, PLAYER2, PLAYER1, PLAYER2, PLAYER1]
+b5[:4, 5] = [PLAYER1, PLAYER2, PLAYER2, PLAYER1]
+b5[0, 3] = PLAYER2
+b5[1, 3] = PLAYER1
+b5[:3, 6] = [PLAYER1, PLAYER2, PLAYER2]
+'''|==============|
+|O X O   X     |
+|X O X   O     |
+|O X O   X X   |
+|X O X   O O O |
+|O X O X X O O |
+|X O X O O X X |
+|==============|
+|0 1 2 3 4 5 6 |'''
+
+
+def test_winning_cells():
+    from agents.common import board_to_bitboard
+    from agents.agent_solver.solver import winning_cells
+
+    board = np.full((6, 7), NO_PLAYER, dtype=BoardPiece)
+    board[0, :3] = PLAYER1
+    pieces = board_to_bitboard(board, PLAYER1)
+    # the cell completing the row, but not the occupied ones
+    assert winning_cells(pieces, pieces) == 1 << (3 * 7)
+    board[0, 3] = PLAYER2
+    mask = pieces | board_to_bitboard(board, PLAYER2)
+    assert winning_cells(pieces, mask) == 0
+
+
+def test_solve():
+    from agents.agent_solver.solver import Solver, SOLVER_TABLE_BYTES
+    from agents.transposition import TranspositionTable
+
+    solver = Solver()
+    assert solver.transposition_table.size == SOLVER_TABLE_BYTES // TranspositionTable.ENTRY_BYTES
+    # PLAYER2 wins with their 17th piece
+    assert solver.solve(b5, PLAYER2) == 22 - 17
+    # PLAYER1 must block column 3 for a draw
+    scores = solver.analyze(b5, PLAYER1)
+    assert scores[3] == 0
+    assert scores[5] < 0
+    assert np.all(np.isnan(scores[[0, 1, 2, 4]]))
+    assert solver.solve(b5, PLAYER1) == 0
+
+
+def test_game_result_and_distance():
+    from agents.agent_solver.solver import game_result, distance_to_result
+
+    assert game_result(6) == GameState.IS_WIN
+    assert game_result(0) == GameState.IS_DRAW
+    assert game_result(-1) == GameState.IS_LOST
+    # b5 has 33 pieces: the 34th wins
+    assert distance_to_result(5, 33) == 1
+    # the opponent wins with the move after the next one
+    assert distance_to_result(-4, 33) == 2
+    assert distance_to_result(0, 33) == 9
+    assert distance_to_result(18, 0) == 7
+
+
+def test_generate_move_solver():
+    from agents.agent_solver import generate_move
+    from agents.agent_solver.solver import SolverSavedState
+
+    next_move, saved_state = generate_move(b5, PLAYER2, None)
+    assert next_move == 3
+    assert isinstance(saved_state, SolverSavedState)
+    # PLAYER1 must block
+    next_move, saved_state = generate_move(b5, PLAYER1, saved_state)
+    assert next_move == 3
+
+
+def test_agents_switch_to_solver():
+    from agents.agent_minimax import generate_move as generate_move_minimax
+    from agents.agent_mcts import generate_move as generate_move_mcts
+    from agents.agent_solver.solver import SolverSavedState
+
+    next_move, saved_state = generate_move_minimax(b5, PLAYER1, None, 1)
+    assert isinstance(saved_state, SolverSavedState)
+    next_move, saved_state = generate_move_minimax(b5, PLAYER1, None, 1, solver_empty_cells=0)
+    assert not isinstance(saved_state, SolverSavedState)
+    next_move, saved_state = generate_move_mcts(b5, PLAYER1, None, trials=10)
+    assert isinstance(saved_state, SolverSavedState)
+    assert next_move == 3
@@ -0,0 +1,67 @@
+import json
+import numpy as np
+
+
+def test_play_game():
+    from tournament import Agent, play_game
+    from agents.agent_random.random import generate_move_random
+
+    agent_1, agent_2 = Agent('a', generate_move_random), Agent('b', generate_move_random)
+    record = play_game(agent_1, agent_2, 7)
+    assert record['player1'] == 'a'
+    assert record['winner'] in ('a', 'b', None)
+    assert len(record['moves']) == len(record['times'])
+    assert len(record['moves']) <= 42
+    # the seed replays the game
+    assert play_game(agent_1, agent_2, 7)['moves'] == record['moves']
+
+
+def illegal_move(board, player, saved_state):
+    return np.int8(7), saved_state
+
+
+def test_play_game_illegal_move():
+    from tournament import Agent, play_game
+    from agents.agent_random.random import generate_move_random
+
+    record = play_game(Agent('illegal', illegal_move), Agent('random', generate_move_random), 0)
+    assert record['illegal']
+    assert record['winner'] == 'random'
+
+
+def test_elo_ratings():
+    from tournament import elo_ratings
+
+    games = np.array([[0, 10, 10], [10, 0, 10], [10, 10, 0]])
+    ratings = elo_ratings(np.full((3, 3), 5.) * (games > 0), games)
+    assert np.allclose(ratings, 1500.)
+    scores = np.array([[0, 8, 10], [2, 0, 7], [0, 3, 0]], float)
+    ratings = elo_ratings(scores, games)
+    assert ratings[0] > ratings[1] > ratings[2]
+    assert np.isclose(ratings.mean(), 1500.)
+
+
+def test_tournament(tmp_path):
+    from tournament import Agent, tournament
+    from agents.agent_random.random import generate_move_random
+    from agents.agent_minimax.minimax import generate_move_minimax
+
+    agents = [Agent('random', generate_move_random), Agent('minimax', generate_move_minimax, (2,))]
+    output = str(tmp_path / 'games.jsonl')
+    results = tournament(agents, games=4, workers=2, seed=1, output=output)
+    assert results.table.sum() == 2 * 4
+    # the table of one agent mirrors the table of the other one
+    assert np.all(results.table[0, 1] == results.table[1, 0, ::-1])
+    assert results.table[1, 0, 0] >= 3
+    assert results.elo()[1] > results.elo()[0]
+    assert results.latency_percentiles().shape == (2, 3)
+    assert 'minimax' in results.summary()
+
+    with open(output) as f:
+        records = [json.loads(line) for line in f]
+    assert sorted(record['game'] for record in records) == [0, 1, 2, 3]
+    # both agents play first
+    assert {record['player1'] for record in records} == {'random', 'minimax'}
+    # the seed replays the tournament
+    serial = tournament(agents, games=4, workers=1, seed=1)
+    assert np.all(serial.table == results.table)
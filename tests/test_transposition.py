@@ -0,0 +1,81 @@
+import numpy as np
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, PlayerAction, GameState
+
+b1 = np.empty((6, 7), dtype=BoardPiece)
+b1.fill(NO_PLAYER)
+b1[0, 1] = PLAYER2
+b1[1, 1] = PLAYER2
+b1[0, 2] = PLAYER2
+b1[2, 2] = PLAYER2
+b1[1, 3] = PLAYER2
+b1[1, 4] = PLAYER2
+b1[1, 2] = PLAYER1
+b1[3, 2] = PLAYER1
+b1[0, 3] = PLAYER1
+b1[2, 3] = PLAYER1
+b1[3, 3] = PLAYER1
+b1[0, 4] = PLAYER1
+b1[2, 4] = PLAYER1
+'''|==============|
+|              |
+|              |
+|    X X       |
+|    O X X     |
+|  O X O O     |
+|  O O X X     |
+|==============|
+|0 1 2 3 4 5 6 |'''
+
+
+def test_zobrist_hash():
+    from agents.agent_minimax.transposition import zobrist_hash
+    from agents.common import apply_player_action
+
+    key = zobrist_hash(b1, PLAYER1, PLAYER1)
+    assert key == zobrist_hash(b1.copy(), PLAYER1, PLAYER1)
+    assert key != zobrist_hash(b1, PLAYER1, PLAYER2)
+    assert key != zobrist_hash(b1, PLAYER2, PLAYER1)
+
+    # the same position reached by two move orders has the same hash
+    board_1 = apply_player_action(apply_player_action(b1, PlayerAction(0), PLAYER1, copy=True), PlayerAction(6), PLAYER2)
+    board_2 = apply_player_action(apply_player_action(b1, PlayerAction(6), PLAYER2, copy=True), PlayerAction(0), PLAYER1)
+    assert zobrist_hash(board_1, PLAYER1, PLAYER1) == zobrist_hash(board_2, PLAYER1, PLAYER1)
+
+
+def test_probe_store():
+    from agents.transposition import TranspositionTable, EXACT, LOWER_BOUND
+
+    table = TranspositionTable(memory_bytes=100 * TranspositionTable.ENTRY_BYTES)
+    assert table.size == 100
+    assert table.probe(12345) is None
+    table.store(12345, 3, 42., LOWER_BOUND, 4)
+    assert table.probe(12345) == (3, 42., LOWER_BOUND, 4)
+    table.store(12345, 1, 10., EXACT)
+    assert table.probe(12345) == (1, 10., EXACT, -1)
+
+    stats = table.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+    assert stats['stores'] == 2
+    assert stats['filled'] == 1
+
+
+def test_replacement():
+    from agents.transposition import TranspositionTable, EXACT
+
+    # keys 5 and 105 collide in a table of 100 entries
+    table = TranspositionTable(memory_bytes=100 * TranspositionTable.ENTRY_BYTES)
+    table.store(5, 4, 1., EXACT)
+    table.store(105, 2, 2., EXACT)
+    assert table.probe(5) == (4, 1., EXACT, -1)
+    assert table.probe(105) is None
+    table.store(105, 4, 2., EXACT)
+    assert table.probe(105) == (4, 2., EXACT, -1)
+    assert table.stats()['rejections'] == 1
+    assert table.stats()['replacements'] == 1
+
+    table = TranspositionTable(memory_bytes=100 * TranspositionTable.ENTRY_BYTES, replacement='always')
+    table.store(5, 4, 1., EXACT)
+    table.store(105, 2, 2., EXACT)
+    assert table.probe(5) is None
+    assert table.probe(105) == (2, 2., EXACT, -1)
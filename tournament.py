@@ -0,0 +1,205 @@
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, Sequence, NamedTuple, List
+
+import numpy as np
+
+from agents.common import GenMove, PlayerAction, PLAYER1, PLAYER2, NO_PLAYER, BOARD_COLUMNS, GameState
+from agents.common import initialize_game_state, apply_player_action, check_end_state
+
+
+class Agent(NamedTuple):
+    """
+    A player of the tournament: its name, its move function and the extra arguments of the move function.
+    The move function must be a module level function, so that it can be sent to the worker processes.
+    """
+    name: str
+    generate_move: GenMove
+    args: tuple = ()
+    kwargs: dict = {}
+
+
+def play_game(agent_1: Agent, agent_2: Agent, seed: int) -> dict:
+    """
+    Plays one game without any output, agent_1 playing PLAYER1 (first) and agent_2 PLAYER2.
+    The global random states used by the agents (numpy's and the random module's) are seeded with `seed`,
+    so the game can be replayed.
+    An agent playing an illegal move (outside the board or in a full column) loses the game.
+    :param agent_1: the first player
+    :param agent_2: the second player
+    :param seed: the random seed of the game
+    :return: the record of the game: the names of the players, the winner's name (None for a draw),
+    the moves, the time of every move in seconds, and whether the game ended with an illegal move
+    """
+    np.random.seed(seed)
+    random.seed(seed)
+    board = initialize_game_state()
+    saved_state = {PLAYER1: None, PLAYER2: None}
+    agents = {PLAYER1: agent_1, PLAYER2: agent_2}
+    moves, times = [], []
+    winner, illegal = None, False
+    for player in itertools.cycle((PLAYER1, PLAYER2)):
+        agent = agents[player]
+        t0 = time.perf_counter()
+        action, saved_state[player] = agent.generate_move(board.copy(), player, saved_state[player],
+                                                          *agent.args, **agent.kwargs)
+        times.append(time.perf_counter() - t0)
+        action = int(action)
+        moves.append(action)
+        if not 0 <= action < BOARD_COLUMNS or board[-1, action] != NO_PLAYER:
+            winner, illegal = agents[PLAYER2 if player == PLAYER1 else PLAYER1].name, True
+            break
+        apply_player_action(board, PlayerAction(action), player)
+        end_state = check_end_state(board, player, PlayerAction(action))
+        if end_state == GameState.IS_WIN:
+            winner = agent.name
+        if end_state != GameState.STILL_PLAYING:
+            break
+    return {'player1': agent_1.name, 'player2': agent_2.name, 'seed': seed, 'winner': winner, 'moves': moves,
+            'times': times, 'illegal': illegal}
+
+
+def elo_ratings(scores: np.ndarray, games: np.ndarray, iterations: int = 1000, mean: float = 1500.) -> np.ndarray:
+    """
+    Estimates Elo ratings from the results of a round-robin: the maximum likelihood ratings of the logistic
+    Elo model, found by fixed point iterations (the ratings of the Bradley-Terry model, with draws
+    counted as half a win for each player). The ratings are shifted to the given mean.
+    :param scores: scores[i, j] are the points of agent i against agent j (1 per win, 0.5 per draw)
+    :param games: games[i, j] is the number of games between agents i and j
+    :param iterations: the number of iterations
+    :param mean: the mean of the ratings
+    :return: the rating of every agent
+    """
+    # an agent that won or lost all its games has an infinite rating: one virtual draw per pairing keeps it finite
+    played = games > 0
+    scores = scores + 0.5 * played
+    games = games + played
+    strengths = np.ones(len(scores))
+    total_scores = scores.sum(axis=1)
+    for _ in range(iterations):
+        expected_games = games / (strengths[:, None] + strengths[None, :])
+        strengths = total_scores / expected_games.sum(axis=1)
+        strengths /= np.exp(np.log(strengths).mean())
+    ratings = 400. * np.log10(strengths)
+    return ratings - ratings.mean() + mean
+
+
+class TournamentResults(object):
+    """
+    The results of a tournament, updated game by game.
+    table[i, j] holds the wins, draws and losses of agent i against agent j, and latencies[i] the times of
+    all the moves of agent i, in seconds.
+    """
+
+    def __init__(self, names: Sequence[str]):
+        self.names = list(names)
+        self.table = np.zeros((len(names), len(names), 3), np.int64)
+        self.latencies = [[] for _ in names]
+
+    def add_game(self, record: dict):
+        i, j = self.names.index(record['player1']), self.names.index(record['player2'])
+        if record['winner'] is None:
+            self.table[i, j, 1] += 1
+            self.table[j, i, 1] += 1
+        else:
+            winner, loser = (i, j) if record['winner'] == record['player1'] else (j, i)
+            self.table[winner, loser, 0] += 1
+            self.table[loser, winner, 2] += 1
+        self.latencies[i].extend(record['times'][0::2])
+        self.latencies[j].extend(record['times'][1::2])
+
+    def elo(self) -> np.ndarray:
+        return elo_ratings(self.table[:, :, 0] + 0.5 * self.table[:, :, 1], self.table.sum(axis=2))
+
+    def latency_percentiles(self, percentiles: Sequence[float] = (50, 90, 99)) -> np.ndarray:
+        """
+        :return: the percentiles of the move times of every agent, in seconds (NaN for an agent without moves)
+        """
+        return np.array([np.percentile(times, percentiles) if times else np.full(len(percentiles), np.nan)
+                         for times in self.latencies])
+
+    def summary(self) -> str:
+        width = max(len(name) for name in self.names) + 2
+        lines = ['W/D/L'.ljust(width) + ''.join(name.rjust(14) for name in self.names) + 'total'.rjust(14)]
+        for i, name in enumerate(self.names):
+            cells = ['-' if i == j else '/'.join(map(str, self.table[i, j])) for j in range(len(self.names))]
+            lines.append(name.ljust(width) + ''.join(cell.rjust(14) for cell in cells)
+                         + '/'.join(map(str, self.table[i].sum(axis=0))).rjust(14))
+        lines.append('')
+        lines.append('agent'.ljust(width) + 'Elo'.rjust(8) + 'p50 ms'.rjust(10) + 'p90 ms'.rjust(10)
+                     + 'p99 ms'.rjust(10))
+        for name, elo, latency in zip(self.names, self.elo(), 1000. * self.latency_percentiles()):
+            lines.append(name.ljust(width) + f'{elo:8.0f}' + ''.join(f'{t:10.1f}' for t in latency))
+        return '\n'.join(lines)
+
+
+def tournament(agents: Sequence[Agent], games: int = 10, workers: int = 1, seed: Optional[int] = None,
+               output: Optional[str] = None) -> TournamentResults:
+    """
+    Plays a round-robin tournament: every pair of agents plays `games` games, each agent playing first in half
+    of them. The games are played by a pool of worker processes; the record of every game is appended to the
+    output file (one JSON object per line) as soon as it finishes.
+    :param agents: the agents, with distinct names
+    :param games: the number of games of every pair of agents
+    :param workers: the number of worker processes; 1 plays the games in this process
+    :param seed: the seed from which the seeds of the games are derived, None for a random one
+    :param output: the JSON lines file the game records are appended to, None for not writing them
+    :return: the results
+    """
+    pairings = []
+    for agent_1, agent_2 in itertools.combinations(agents, 2):
+        for game in range(games):
+            pairings.append((agent_1, agent_2) if game % 2 == 0 else (agent_2, agent_1))
+    seeds = np.random.SeedSequence(seed).generate_state(len(pairings))
+    results = TournamentResults([agent.name for agent in agents])
+
+    stream = open(output, 'a') if output is not None else None
+    try:
+        def finish(game_index: int, record: dict):
+            results.add_game(record)
+            if stream is not None:
+                stream.write(json.dumps(dict(game=game_index, **record)) + '\n')
+                stream.flush()
+
+        if workers == 1:
+            for index, ((agent_1, agent_2), game_seed) in enumerate(zip(pairings, seeds)):
+                finish(index, play_game(agent_1, agent_2, int(game_seed)))
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                futures = {pool.submit(play_game, agent_1, agent_2, int(game_seed)): index
+                           for index, ((agent_1, agent_2), game_seed) in enumerate(zip(pairings, seeds))}
+                for future in as_completed(futures):
+                    finish(futures[future], future.result())
+    finally:
+        if stream is not None:
+            stream.close()
+    return results
+
+
+def default_agents() -> List[Agent]:
+    from agents.agent_random.random import generate_move_random
+    from agents.agent_minimax.minimax import generate_move_minimax
+    from agents.agent_mcts.mcts import generate_move_mcts
+
+    return [Agent('random', generate_move_random),
+            Agent('minimax', generate_move_minimax, (4,)),
+            Agent('mcts', generate_move_mcts, kwargs={'trials': 1000})]
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description='Plays a round-robin tournament between the agents.')
+    parser.add_argument('agents', nargs='*', help='the names of the agents, all of them by default')
+    parser.add_argument('--games', type=int, default=10, help='the number of games of every pair of agents')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='the number of worker processes')
+    parser.add_argument('--seed', type=int, default=None, help='the seed of the tournament')
+    parser.add_argument('--output', default=None, help='the JSON lines file of the game records')
+    args = parser.parse_args()
+
+    players = [agent for agent in default_agents() if not args.agents or agent.name in args.agents]
+    print(tournament(players, args.games, args.workers, args.seed, args.output).summary())